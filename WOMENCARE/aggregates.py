@@ -0,0 +1,137 @@
+from storage import get_store
+
+USER_STATS_COLLECTION = 'user_stats'
+
+# Most recent questions kept in each user's activity ring
+QUESTION_ACTIVITY_LIMIT = 3
+
+
+def question_activity(question):
+    """Dashboard activity entry for a question"""
+    return {
+        'type': 'question',
+        'question_id': question['id'],
+        'title': f'Question: {(question.get("category") or "general").replace("_", " ").title()}',
+        'description': f'Status: {question["status"].title()}',
+        'timestamp': question['timestamp'],
+        'icon': 'fas fa-question-circle'
+    }
+
+
+def empty_aggregate(user_email):
+    return {
+        'id': user_email,
+        'questions_asked': 0,
+        'questions_answered': 0,
+        'last_cycle_update': None,
+        'recent_questions': []
+    }
+
+
+def push_question_activity(aggregate, question):
+    """Insert or refresh a question in the bounded activity ring, newest first"""
+    ring = [a for a in aggregate['recent_questions'] if a['question_id'] != question['id']]
+    ring.append(question_activity(question))
+    ring.sort(key=lambda a: a['timestamp'], reverse=True)
+    aggregate['recent_questions'] = ring[:QUESTION_ACTIVITY_LIMIT]
+
+
+def summarize_questions(questions):
+    """Build an aggregate from a short list of questions (demo dashboard)"""
+    aggregate = empty_aggregate(None)
+    for question in questions:
+        aggregate['questions_asked'] += 1
+        if question.get('status') == 'answered':
+            aggregate['questions_answered'] += 1
+        push_question_activity(aggregate, question)
+    return aggregate
+
+
+class UserAggregates:
+    """Per-user dashboard counters kept up to date on every write
+
+    Each aggregate is one record in the store keyed by email, so dashboard
+    reads are a single primary-key lookup regardless of how many questions
+    exist. The first read on an empty store backfills from existing questions.
+    """
+
+    def __init__(self, store=None, collection=USER_STATS_COLLECTION):
+        self._store = store
+        self.collection = collection
+        self._backfilled = False
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = get_store()
+        return self._store
+
+    def _update(self, user_email, mutate, in_backfill=True):
+        """Apply a write event to a user's aggregate
+
+        ``in_backfill`` marks events already reflected in the questions table;
+        they are skipped when this very call performed the backfill.
+        """
+        if self.backfill() and in_backfill:
+            return self.store.get(self.collection, user_email)
+        return self.store.upsert(self.collection, user_email, mutate,
+                                 lambda: empty_aggregate(user_email))
+
+    def get(self, user_email):
+        """Return the aggregate for a user, empty if they have no activity"""
+        self.backfill()
+        return self.store.get(self.collection, user_email) or empty_aggregate(user_email)
+
+    def backfill(self):
+        """One-shot build of aggregates from existing questions, True if it ran now"""
+        if self._backfilled:
+            return False
+        built = self.store.initialize(self.collection, self._build_from_questions)
+        self._backfilled = True
+        return built
+
+    def _build_from_questions(self):
+        by_user = {}
+        for question in self.store.all('questions.json'):
+            if question.get('user_email'):
+                by_user.setdefault(question['user_email'], []).append(question)
+        records = []
+        for user_email, user_questions in by_user.items():
+            aggregate = summarize_questions(user_questions)
+            aggregate['id'] = user_email
+            records.append(aggregate)
+        return records
+
+    def record_question(self, question):
+        """Count a newly asked question"""
+        if not question.get('user_email'):
+            return None
+
+        def mutate(aggregate):
+            aggregate['questions_asked'] += 1
+            push_question_activity(aggregate, question)
+        return self._update(question['user_email'], mutate)
+
+    def record_answer(self, question, previous_status):
+        """Count a question moving to answered and refresh its activity entry"""
+        if not question.get('user_email'):
+            return None
+
+        def mutate(aggregate):
+            if previous_status != 'answered' and question.get('status') == 'answered':
+                aggregate['questions_answered'] += 1
+            if any(a['question_id'] == question['id'] for a in aggregate['recent_questions']):
+                push_question_activity(aggregate, question)
+        return self._update(question['user_email'], mutate)
+
+    def record_cycle_update(self, user_email, cycle_data):
+        """Remember when a user last updated their cycle"""
+        if not user_email:
+            return None
+
+        def mutate(aggregate):
+            aggregate['last_cycle_update'] = cycle_data.get('last_updated')
+        return self._update(user_email, mutate, in_backfill=False)
+
+
+user_aggregates = UserAggregates()
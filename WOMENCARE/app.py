@@ -2,36 +2,97 @@ from flask import Flask, render_template, request, jsonify, session, flash, redi
 from datetime import datetime, timedelta
 import json
 import os
+import sys
 import uuid
 from functools import wraps
+from storage import RECORD_COLLECTIONS, atomic_write_json, data_cache, file_lock, file_signature, get_store
+from questions import questions
+from aggregates import empty_aggregate, summarize_questions, user_aggregates
+from scheduler import LeaseConflict, on_duty, scheduler
+from response_cache import ResponseCache
+from cycle_batch import MAX_BATCH_RECORDS, MAX_FORECAST_CYCLES, predict_cycles_batch
+from sessions import FileSessionBackend, SQLiteSessionBackend, ServerSideSessionInterface
+import config
+
+# Shared modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.assets import serve_assets
+from common.metrics import cache_collector, instrument_flask, registry
+from common.profiling import instrument_profiler
 
 app = Flask(__name__)
 app.secret_key = 'womens-health-2024-secret-key'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=30)
 
+# Keep session data on the server, the cookie only carries an opaque id
+if config.SESSION_BACKEND == 'file':
+    session_backend = FileSessionBackend('data/sessions')
+else:
+    session_backend = SQLiteSessionBackend('data/sessions.db')
+app.session_interface = ServerSideSessionInterface(session_backend,
+                                                   lru_size=config.SESSION_LRU_SIZE)
+
+# Number of past cycle entries kept per session
+CYCLE_HISTORY_LIMIT = 24
+
+# Rendered pages that are identical for every visitor
+page_cache = ResponseCache(app)
+
+# Request, template and data file timings plus cache ratios at /metrics
+instrument_flask(app)
+data_file_seconds = registry.histogram(
+    'womencare_data_file_seconds', 'Time to load or save a data file', ('op', 'file'))
+registry.collector(cache_collector('womencare', {'data': data_cache, 'pages': page_cache}))
+
+# Opt-in per-request profiles, a no-op unless a secret or sample rate is set
+instrument_profiler(app, config.PROFILE_DIR, secret=config.PROFILE_SECRET,
+                    sample_rate=config.PROFILE_SAMPLE_RATE,
+                    interval=config.PROFILE_INTERVAL_MS / 1000, fmt=config.PROFILE_FORMAT)
+
+# Hashed, precompressed static files at /assets; templates link them with asset_url()
+assets = serve_assets(app, os.path.join(app.root_path, config.ASSETS_DIR))
+# Cached pages embed hashed asset URLs, so a rebuild must refresh them
+page_cache.depend_on(assets.path)
+
 # Data Management Functions
 def ensure_data_directory():
     """Ensure data directory exists"""
     os.makedirs('data', exist_ok=True)
 
+def read_json_file(filepath):
+    """Parse a JSON file from disk"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 def load_json_data(filename, default_data=None):
-    """Load JSON data from file"""
+    """Load JSON data from file, served read-only from cache while unchanged"""
     ensure_data_directory()
-    filepath = f'data/{filename}'
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        if default_data:
-            save_json_data(filename, default_data)
-        return default_data or []
+    with data_file_seconds.time(op='load', file=filename):
+        if filename in RECORD_COLLECTIONS:
+            store = get_store()
+            return data_cache.get(filename, store.version(filename),
+                                  lambda: store.all(filename))
+        filepath = f'data/{filename}'
+        try:
+            return data_cache.get(filename, file_signature(filepath),
+                                  lambda: read_json_file(filepath))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+    if default_data:
+        save_json_data(filename, default_data)
+    return default_data or []
 
 def save_json_data(filename, data):
     """Save JSON data to file"""
     ensure_data_directory()
-    filepath = f'data/{filename}'
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    data_cache.invalidate(filename)
+    with data_file_seconds.time(op='save', file=filename):
+        if filename in RECORD_COLLECTIONS:
+            get_store().replace_all(filename, data)
+            return
+        filepath = f'data/{filename}'
+        with file_lock(filepath):
+            atomic_write_json(filepath, data)
 
 # Initialize Data
 def initialize_data():
@@ -248,21 +309,26 @@ def initialize_data():
     # Save initial data
     save_json_data('doctors.json', doctors_data)
     save_json_data('menstrual_products.json', products_data)
-    save_json_data('questions.json', [])
+    # Questions live in the record store; only import a legacy questions.json once
+    get_store()
 
 # Routes
 @app.route('/')
+@page_cache.cached(templates=['index.html', 'base.html'])
 def index():
     """Homepage"""
     return render_template('index.html')
 
 @app.route('/menstrual-products')
+@page_cache.cached(templates=['menstrual_products.html', 'base.html'],
+                   data_files=['data/menstrual_products.json'])
 def menstrual_products():
     """Menstrual products guide"""
     products = load_json_data('menstrual_products.json')
     return render_template('menstrual_products.html', products=products)
 
 @app.route('/diet-plan')
+@page_cache.cached(templates=['diet_plan.html', 'base.html'])
 def diet_plan():
     """Diet plans for menstrual health"""
     diet_plans = {
@@ -298,6 +364,7 @@ def diet_plan():
     return render_template('diet_plan.html', diet_plans=diet_plans)
 
 @app.route('/hygiene-tips')
+@page_cache.cached(templates=['hygiene_tips.html', 'base.html'])
 def hygiene_tips():
     """Enhanced hygiene tips with visual categories"""
     hygiene_data = {
@@ -488,7 +555,13 @@ def api_track_cycle():
     }
     
     session['cycle_data'] = cycle_data
+    # Compact history: [last_period, cycle_length, period_length, flow_intensity]
+    history = session.get('cycle_history', [])
+    history.append([cycle_data['last_period'], cycle_data['cycle_length'],
+                    cycle_data['period_length'], cycle_data['flow_intensity']])
+    session['cycle_history'] = history[-CYCLE_HISTORY_LIMIT:]
     session.permanent = True
+    user_aggregates.record_cycle_update(session.get('user_email'), cycle_data)
     
     predictions = calculate_cycle_predictions(cycle_data)
     
@@ -498,6 +571,29 @@ def api_track_cycle():
         'predictions': predictions
     })
 
+@app.route('/api/track-cycle/batch', methods=['POST'])
+def api_track_cycle_batch():
+    """API endpoint to predict cycles for many records at once"""
+    data = request.get_json(silent=True) or {}
+    records = data.get('records')
+    horizon = data.get('horizon', 1)
+    
+    if not isinstance(records, list):
+        return jsonify({'success': False, 'message': "'records' must be a list"}), 400
+    if len(records) > MAX_BATCH_RECORDS:
+        return jsonify({'success': False,
+                        'message': f'At most {MAX_BATCH_RECORDS} records per batch'}), 400
+    if not isinstance(horizon, int) or isinstance(horizon, bool) or not 1 <= horizon <= MAX_FORECAST_CYCLES:
+        return jsonify({'success': False,
+                        'message': f"'horizon' must be between 1 and {MAX_FORECAST_CYCLES}"}), 400
+    
+    predictions = predict_cycles_batch(records, horizon=horizon)
+    return jsonify({
+        'success': True,
+        'count': len(predictions),
+        'predictions': predictions
+    })
+
 @app.route('/ask-doctor', methods=['GET', 'POST'])
 def ask_doctor():
     """Ask a doctor questions"""
@@ -534,9 +630,8 @@ def ask_doctor():
             'is_anonymous': request.form.get('is_anonymous') == 'on'
         }
         
-        questions = load_json_data('questions.json')
-        questions.append(question_data)
-        save_json_data('questions.json', questions)
+        questions.add(question_data)
+        user_aggregates.record_question(question_data)
         
         flash('Your question has been submitted! A doctor will respond within 24-48 hours.', 'success')
         return redirect(url_for('question_submitted', question_id=question_data['id']))
@@ -548,15 +643,13 @@ def ask_doctor():
 @app.route('/question-submitted/<question_id>')
 def question_submitted(question_id):
     """Question submission confirmation"""
-    questions = load_json_data('questions.json')
-    question = next((q for q in questions if q['id'] == question_id), None)
+    question = questions.get(question_id)
     return render_template('question_submitted.html', question=question)
 
 @app.route('/view-answer/<question_id>')
 def view_answer(question_id):
     """View doctor's answer"""
-    questions = load_json_data('questions.json')
-    question = next((q for q in questions if q['id'] == question_id), None)
+    question = questions.get(question_id)
     
     if not question:
         flash('Question not found', 'error')
@@ -564,50 +657,139 @@ def view_answer(question_id):
     
     return render_template('view_answer.html', question=question)
 
+DASHBOARD_PAGE_SIZE = 20
+DASHBOARD_MAX_PAGE_SIZE = 100
+
+def get_page_size():
+    """Read the page size from the query string, clamped to sane bounds"""
+    try:
+        limit = int(request.args.get('limit', DASHBOARD_PAGE_SIZE))
+    except ValueError:
+        limit = DASHBOARD_PAGE_SIZE
+    return min(max(limit, 1), DASHBOARD_MAX_PAGE_SIZE)
+
 @app.route('/doctor-dashboard')
 def doctor_dashboard():
-    """Doctor dashboard to answer questions"""
-    questions = load_json_data('questions.json')
+    """Doctor dashboard to answer questions, one page per status"""
     doctors = load_json_data('doctors.json')
+    limit = get_page_size()
     
-    pending_questions = [q for q in questions if q['status'] == 'pending']
-    answered_questions = [q for q in questions if q['status'] == 'answered']
+    try:
+        pending_questions, pending_next = questions.page(
+            'pending', request.args.get('pending_cursor'), limit)
+        answered_questions, answered_next = questions.page(
+            'answered', request.args.get('answered_cursor'), limit)
+    except ValueError:
+        flash('Invalid page link', 'error')
+        return redirect(url_for('doctor_dashboard'))
     
+    counts = questions.counts()
     return render_template('doctor_dashboard.html',
                          pending_questions=pending_questions,
                          answered_questions=answered_questions,
+                         pending_next_cursor=pending_next,
+                         answered_next_cursor=answered_next,
+                         pending_count=counts.get('pending', 0),
+                         answered_count=counts.get('answered', 0),
                          doctors=doctors)
 
+@app.route('/api/doctor-dashboard/questions')
+def api_doctor_questions():
+    """Paginated question listing for the doctor dashboard"""
+    status = request.args.get('status', 'pending')
+    try:
+        items, next_cursor = questions.page(status, request.args.get('cursor'), get_page_size())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'status': status,
+        'questions': items,
+        'next_cursor': next_cursor,
+        'counts': questions.counts()
+    })
+
 @app.route('/answer-question/<question_id>', methods=['GET', 'POST'])
 def answer_question(question_id):
     """Answer a specific question"""
-    questions = load_json_data('questions.json')
-    question = next((q for q in questions if q['id'] == question_id), None)
+    question = questions.get(question_id)
     
     if not question:
         flash('Question not found', 'error')
         return redirect(url_for('doctor_dashboard'))
     
     if request.method == 'POST':
-        for q in questions:
-            if q['id'] == question_id:
-                q.update({
-                    'status': 'answered',
-                    'answer': request.form.get('answer'),
-                    'answered_by': request.form.get('doctor_name'),
-                    'answer_timestamp': datetime.now().isoformat(),
-                    'follow_up_advice': request.form.get('follow_up_advice'),
-                    'recommendations': request.form.get('recommendations')
-                })
-                break
+        lease = scheduler.holder(question_id)
+        if lease and lease['doctor_name'] != request.form.get('doctor_name'):
+            flash(f"This question is being answered by {lease['doctor_name']}", 'error')
+            return redirect(url_for('doctor_dashboard'))
         
-        save_json_data('questions.json', questions)
+        result = questions.update(question_id, {
+            'status': 'answered',
+            'answer': request.form.get('answer'),
+            'answered_by': request.form.get('doctor_name'),
+            'answer_timestamp': datetime.now().isoformat(),
+            'follow_up_advice': request.form.get('follow_up_advice'),
+            'recommendations': request.form.get('recommendations')
+        })
+        if result is not None:
+            previous, answered = result
+            user_aggregates.record_answer(answered, previous['status'])
+            # Drop the lease row too, expired or not
+            scheduler.release(question_id)
         flash('Answer submitted successfully!', 'success')
         return redirect(url_for('doctor_dashboard'))
     
     return render_template('answer_question.html', question=question)
 
+def find_doctor(doctor_id):
+    """Look up a doctor by id"""
+    return next((d for d in load_json_data('doctors.json') if d['id'] == doctor_id), None)
+
+@app.route('/api/doctors/<int:doctor_id>/next-question', methods=['POST'])
+def api_next_question(doctor_id):
+    """Claim the highest-priority pending question for a doctor"""
+    doctor = find_doctor(doctor_id)
+    if not doctor:
+        return jsonify({'error': 'Doctor not found'}), 404
+    if not doctor.get('is_available', True):
+        return jsonify({'error': 'Doctor is not currently available'}), 403
+    
+    question, lease = scheduler.next_for(doctor)
+    if question is None and not on_duty(doctor):
+        return jsonify({'error': 'Doctor is not available today',
+                        'availability': doctor.get('availability')}), 403
+    return jsonify({'question': question, 'lease': lease})
+
+@app.route('/api/questions/<question_id>/claim', methods=['POST'])
+def api_claim_question(question_id):
+    """Reserve a specific pending question for a doctor"""
+    data = request.get_json(silent=True) or {}
+    doctor = find_doctor(data.get('doctor_id'))
+    if not doctor:
+        return jsonify({'error': 'Doctor not found'}), 404
+    question = questions.get(question_id)
+    if not question or question['status'] != 'pending':
+        return jsonify({'error': 'Question is not pending'}), 404
+    
+    try:
+        lease = scheduler.claim(question_id, doctor)
+    except LeaseConflict as e:
+        return jsonify({'error': str(e), 'lease': e.lease}), 409
+    return jsonify({'question': question, 'lease': lease})
+
+@app.route('/api/questions/<question_id>/release', methods=['POST'])
+def api_release_question(question_id):
+    """Give a claimed question back to the queue"""
+    data = request.get_json(silent=True) or {}
+    try:
+        scheduler.release(question_id, data.get('doctor_id'))
+    except LeaseConflict as e:
+        return jsonify({'error': str(e), 'lease': e.lease}), 409
+    return jsonify({'success': True})
+
 @app.route('/emergency-contacts')
+@page_cache.cached(templates=['emergency_contacts.html', 'base.html'])
 def emergency_contacts():
     """Emergency contacts page"""
     contacts = [
@@ -640,8 +822,9 @@ def emergency_contacts():
     return render_template('emergency_contacts.html', contacts=contacts)
 
 # Utility Functions
-def calculate_cycle_predictions(cycle_data):
+def calculate_cycle_predictions(cycle_data, now=None):
     """Calculate menstrual cycle predictions"""
+    now = now or datetime.now()
     try:
         last_period = datetime.fromisoformat(cycle_data['last_period'])
         cycle_length = cycle_data.get('cycle_length', 28)
@@ -658,7 +841,7 @@ def calculate_cycle_predictions(cycle_data):
         fertile_end = ovulation_date + timedelta(days=1)
         
         # Current cycle day
-        days_since_period = (datetime.now() - last_period).days
+        days_since_period = (now - last_period).days
         current_cycle_day = max(1, days_since_period + 1)
         
         # Menstrual phase
@@ -679,13 +862,14 @@ def calculate_cycle_predictions(cycle_data):
             'fertile_window_end': fertile_end.strftime('%Y-%m-%d'),
             'current_cycle_day': current_cycle_day,
             'current_phase': phase,
-            'days_until_next_period': (next_period - datetime.now()).days
+            'days_until_next_period': (next_period - now).days
         }
     except Exception as e:
         return {}
 
 # Health Quotes API
 @app.route('/api/health-quotes')
+@page_cache.cached()
 def api_health_quotes():
     """API for health quotes"""
     quotes = [
@@ -717,21 +901,22 @@ def user_dashboard():
     """User dashboard with overview of all features"""
     # Get user data from session
     cycle_data = session.get('cycle_data', {})
-    questions = load_json_data('questions.json')
     
     # Filter user's questions
     user_questions = []
     if session.get('user_email'):
-        user_questions = [q for q in questions if q.get('user_email') == session.get('user_email')]
+        user_questions = questions.for_user(session.get('user_email'))
+        aggregate = user_aggregates.get(session.get('user_email'))
     else:
         # For demo, show recent questions
-        user_questions = questions[-5:] if questions else []
+        user_questions = questions.recent(5)
+        aggregate = summarize_questions(user_questions)
     
     # Calculate dashboard stats
-    dashboard_stats = calculate_dashboard_stats(cycle_data, user_questions)
+    dashboard_stats = calculate_dashboard_stats(cycle_data, aggregate)
     
     # Get recent activity
-    recent_activity = get_recent_activity(cycle_data, user_questions)
+    recent_activity = get_recent_activity(cycle_data, aggregate)
     
     return render_template('dashboard.html',
                          cycle_data=cycle_data,
@@ -739,12 +924,12 @@ def user_dashboard():
                          stats=dashboard_stats,
                          recent_activity=recent_activity)
 
-def calculate_dashboard_stats(cycle_data, questions):
-    """Calculate statistics for dashboard"""
+def calculate_dashboard_stats(cycle_data, aggregate):
+    """Calculate statistics for dashboard from the user's maintained aggregate"""
     stats = {
         'cycle_tracked': bool(cycle_data and cycle_data.get('last_period')),
-        'questions_asked': len(questions),
-        'questions_answered': len([q for q in questions if q.get('status') == 'answered']),
+        'questions_asked': aggregate['questions_asked'],
+        'questions_answered': aggregate['questions_answered'],
         'current_phase': 'Not tracked',
         'days_until_next_period': '--',
         'cycle_regularity': 'Not enough data'
@@ -760,7 +945,7 @@ def calculate_dashboard_stats(cycle_data, questions):
     
     return stats
 
-def get_recent_activity(cycle_data, questions):
+def get_recent_activity(cycle_data, aggregate):
     """Get recent user activity"""
     activity = []
     
@@ -774,15 +959,8 @@ def get_recent_activity(cycle_data, questions):
             'icon': 'fas fa-calendar-alt'
         })
     
-    # Add question activity
-    for question in questions[-3:]:  # Last 3 questions
-        activity.append({
-            'type': 'question',
-            'title': f'Question: {question["category"].replace("_", " ").title()}',
-            'description': f'Status: {question["status"].title()}',
-            'timestamp': question['timestamp'],
-            'icon': 'fas fa-question-circle'
-        })
+    # Add question activity, kept as a bounded ring of the latest questions
+    activity.extend(aggregate['recent_questions'])
     
     # Sort by timestamp
     activity.sort(key=lambda x: x['timestamp'], reverse=True)
@@ -792,13 +970,13 @@ def get_recent_activity(cycle_data, questions):
 def api_dashboard_stats():
     """API endpoint for dashboard statistics"""
     cycle_data = session.get('cycle_data', {})
-    questions = load_json_data('questions.json')
     
-    user_questions = []
     if session.get('user_email'):
-        user_questions = [q for q in questions if q.get('user_email') == session.get('user_email')]
+        aggregate = user_aggregates.get(session.get('user_email'))
+    else:
+        aggregate = empty_aggregate(None)
     
-    stats = calculate_dashboard_stats(cycle_data, user_questions)
+    stats = calculate_dashboard_stats(cycle_data, aggregate)
     return jsonify(stats)
 
 @app.route('/debug-products')
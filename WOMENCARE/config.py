@@ -0,0 +1,24 @@
+import os
+
+# Data storage
+# Group concurrent question writes into one commit/fsync (useful under bursty load)
+WRITE_BEHIND = os.environ.get('WOMENCARE_WRITE_BEHIND', '0') == '1'
+WRITE_BEHIND_WINDOW_MS = float(os.environ.get('WOMENCARE_WRITE_BEHIND_WINDOW_MS', '5'))
+
+# Sessions
+# 'sqlite' or 'file'; the cookie only carries an opaque session id
+SESSION_BACKEND = os.environ.get('WOMENCARE_SESSION_BACKEND', 'sqlite')
+SESSION_LRU_SIZE = int(os.environ.get('WOMENCARE_SESSION_LRU_SIZE', '1024'))
+
+# Profiling
+# Requests with a signed X-Profile header (python -m common.profiling SECRET PATH)
+# or picked at PROFILE_SAMPLE_RATE are sampled and written to PROFILE_DIR
+PROFILE_SECRET = os.environ.get('WOMENCARE_PROFILE_SECRET', '')
+PROFILE_SAMPLE_RATE = float(os.environ.get('WOMENCARE_PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.environ.get('WOMENCARE_PROFILE_DIR', 'data/profiles')
+PROFILE_INTERVAL_MS = float(os.environ.get('WOMENCARE_PROFILE_INTERVAL_MS', '5'))
+PROFILE_FORMAT = os.environ.get('WOMENCARE_PROFILE_FORMAT', 'speedscope')  # or 'collapsed'
+
+# Static assets
+# Built with: python -m common.assets WOMENCARE/dist WOMENCARE/static
+ASSETS_DIR = os.environ.get('WOMENCARE_ASSETS_DIR', 'dist')
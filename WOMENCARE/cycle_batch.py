@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+MAX_BATCH_RECORDS = 10000
+MAX_FORECAST_CYCLES = 12
+
+_US_PER_DAY = 86400 * 10**6
+_EPOCH = datetime(1970, 1, 1)
+
+# Before year 1000 strftime('%Y') stops zero-padding (on glibc) while NumPy
+# always writes four digits, so such dates are formatted like the scalar path
+_YEAR_1000_US = (datetime(1000, 1, 1) - _EPOCH) // timedelta(microseconds=1)
+
+
+def _parse(record):
+    """Validate one record with the same rules as calculate_cycle_predictions
+
+    Returns (last_period_us, cycle_length_us, period_length) or None when the
+    scalar function would have returned an empty prediction.
+    """
+    try:
+        last_period = datetime.fromisoformat(record['last_period'])
+        cycle_length = timedelta(days=record.get('cycle_length', 28))
+        period_length = record.get('period_length', 5)
+        # The scalar path fails on timezone-aware dates and non-numeric lengths
+        if last_period.tzinfo is not None or isinstance(period_length, str):
+            return None
+        period_length = float(period_length)
+        # Raises OverflowError exactly where the scalar date arithmetic would
+        last_period + cycle_length - timedelta(days=19)
+    except (KeyError, TypeError, ValueError, AttributeError, OverflowError):
+        return None
+    epoch_us = (last_period - _EPOCH) // timedelta(microseconds=1)
+    return epoch_us, cycle_length // timedelta(microseconds=1), period_length
+
+
+def _dates(values_us):
+    """Format microsecond timestamps as YYYY-MM-DD strings, as strftime would"""
+    dates = np.datetime_as_string(values_us.astype('datetime64[us]').astype('datetime64[D]'))
+    early = values_us < _YEAR_1000_US
+    if early.any():
+        dates = dates.astype(object)
+        for index in zip(*np.nonzero(early)):
+            try:
+                day = _EPOCH + timedelta(microseconds=int(values_us[index]))
+            except OverflowError:
+                continue  # before year 1, only reachable by long negative forecasts
+            dates[index] = day.strftime('%Y-%m-%d')
+    return dates
+
+
+def predict_cycles_batch(records, horizon=1, now=None):
+    """Vectorized calculate_cycle_predictions over many cycle records
+
+    Every record yields exactly what ``calculate_cycle_predictions(record, now)``
+    returns (``{}`` for invalid input). With ``horizon`` > 1 each prediction
+    also carries a ``forecast`` list covering that many upcoming cycles.
+    """
+    now = now or datetime.now()
+    now_us = (now - _EPOCH) // timedelta(microseconds=1)
+
+    parsed = [_parse(r) if isinstance(r, dict) else None for r in records]
+    valid = [i for i, p in enumerate(parsed) if p is not None]
+    results = [{} for _ in records]
+    if not valid:
+        return results
+
+    last_period = np.array([parsed[i][0] for i in valid], dtype=np.int64)
+    cycle_length = np.array([parsed[i][1] for i in valid], dtype=np.int64)
+    period_length = np.array([parsed[i][2] for i in valid], dtype=np.float64)
+
+    # Cycle k (1-based) of the forecast, shape (records, horizon)
+    cycles = np.arange(1, horizon + 1, dtype=np.int64)
+    next_period = last_period[:, None] + cycle_length[:, None] * cycles
+    ovulation = next_period - 14 * _US_PER_DAY
+    fertile_start = ovulation - 5 * _US_PER_DAY
+    fertile_end = ovulation + 1 * _US_PER_DAY
+
+    # timedelta.days floors, as does integer division here
+    days_since_period = (now_us - last_period) // _US_PER_DAY
+    current_cycle_day = np.maximum(1, days_since_period + 1)
+    days_until = (next_period[:, 0] - now_us) // _US_PER_DAY
+
+    phase = np.select(
+        [current_cycle_day <= period_length, current_cycle_day <= 13, current_cycle_day <= 15],
+        ['menstrual', 'follicular', 'ovulation'],
+        default='luteal')
+
+    next_period_s = _dates(next_period)
+    ovulation_s = _dates(ovulation)
+    fertile_start_s = _dates(fertile_start)
+    fertile_end_s = _dates(fertile_end)
+    current_cycle_day = current_cycle_day.tolist()
+    days_until = days_until.tolist()
+    phase = phase.tolist()
+
+    for row, i in enumerate(valid):
+        prediction = {
+            'next_period': str(next_period_s[row, 0]),
+            'ovulation_date': str(ovulation_s[row, 0]),
+            'fertile_window_start': str(fertile_start_s[row, 0]),
+            'fertile_window_end': str(fertile_end_s[row, 0]),
+            'current_cycle_day': current_cycle_day[row],
+            'current_phase': phase[row],
+            'days_until_next_period': days_until[row]
+        }
+        if horizon > 1:
+            prediction['forecast'] = [
+                {
+                    'cycle': k + 1,
+                    'next_period': str(next_period_s[row, k]),
+                    'ovulation_date': str(ovulation_s[row, k]),
+                    'fertile_window_start': str(fertile_start_s[row, k]),
+                    'fertile_window_end': str(fertile_end_s[row, k])
+                }
+                for k in range(horizon)
+            ]
+        results[i] = prediction
+    return results
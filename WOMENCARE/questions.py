@@ -0,0 +1,211 @@
+import base64
+import json
+import threading
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+
+from storage import freeze, get_store
+
+QUESTIONS_COLLECTION = 'questions.json'
+
+# Lower rank is served first in the pending queue
+URGENCY_RANK = {'urgent': 0, 'high': 1, 'normal': 2, 'low': 3}
+
+# Statuses listed newest first; every other status is listed in ascending key order
+DESCENDING_STATUSES = {'answered'}
+
+
+def sort_key(record):
+    """Position of a question within its status listing"""
+    if record.get('status') in DESCENDING_STATUSES:
+        return (record.get('answer_timestamp') or record.get('timestamp') or '', record['id'])
+    rank = URGENCY_RANK.get(record.get('urgency'), URGENCY_RANK['normal'])
+    return (rank, record.get('timestamp') or '', record['id'])
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Turn an opaque cursor back into a sort key, raises ValueError if malformed"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError('invalid cursor') from e
+    if not isinstance(key, list) or not key:
+        raise ValueError('invalid cursor')
+    return tuple(key)
+
+
+class QuestionRepository:
+    """Questions held in memory with id, user_email and status indexes
+
+    The indexes are kept in step with the record store by replaying only the
+    rows written since the last seen collection version, so lookups never scan
+    the archive and writes from other workers are picked up on the next access.
+    """
+
+    def __init__(self, store=None, collection=QUESTIONS_COLLECTION):
+        self._store = store
+        self.collection = collection
+        self._lock = threading.RLock()
+        self._version = -1
+        self._by_id = {}
+        self._by_email = {}
+        self._by_status = {}
+        self._ordered = {}
+        self._ordered_by_category = {}
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = get_store()
+        return self._store
+
+    # Index maintenance
+    def _sync(self):
+        """Apply writes made to the store since the last sync"""
+        with self._lock:
+            if self.store.version(self.collection) == self._version:
+                return
+            version, reset, records = self.store.changes_since(self.collection, self._version)
+            if reset:
+                self._by_id, self._by_email, self._by_status = {}, {}, {}
+                self._ordered, self._ordered_by_category = {}, {}
+            for record in records:
+                self._index(freeze(record))
+            self._version = version
+
+    def _index(self, record):
+        """Insert or replace one record in every index"""
+        question_id = record['id']
+        old = self._by_id.get(question_id)
+        if old is not None:
+            self._unlink(self._by_email, old.get('user_email'), question_id)
+            self._unlink(self._by_status, old.get('status'), question_id)
+            old_key = sort_key(old)
+            self._remove_key(self._ordered.get(old.get('status')), old_key)
+            self._remove_key(self._ordered_by_category.get((old.get('status'), old.get('category'))), old_key)
+        self._by_id[question_id] = record
+        # dicts used as insertion-ordered sets
+        self._by_email.setdefault(record.get('user_email'), {})[question_id] = None
+        self._by_status.setdefault(record.get('status'), {})[question_id] = None
+        key = sort_key(record)
+        insort(self._ordered.setdefault(record.get('status'), []), key)
+        insort(self._ordered_by_category.setdefault((record.get('status'), record.get('category')), []), key)
+
+    @staticmethod
+    def _remove_key(keys, key):
+        if keys:
+            pos = bisect_left(keys, key)
+            if pos < len(keys) and keys[pos] == key:
+                del keys[pos]
+
+    @staticmethod
+    def _unlink(index, key, question_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.pop(question_id, None)
+            if not ids:
+                del index[key]
+
+    # Reads
+    def get(self, question_id):
+        """Return a question by id, or None"""
+        self._sync()
+        return self._by_id.get(question_id)
+
+    def for_user(self, user_email):
+        """Return all questions asked with the given email, oldest first"""
+        self._sync()
+        with self._lock:
+            return [self._by_id[i] for i in self._by_email.get(user_email, ())]
+
+    def with_status(self, status):
+        """Return all questions with the given status, oldest first"""
+        self._sync()
+        with self._lock:
+            return [self._by_id[i] for i in self._by_status.get(status, ())]
+
+    def count_status(self, status):
+        """Return the number of questions with the given status"""
+        self._sync()
+        return len(self._by_status.get(status, ()))
+
+    def categories(self, status):
+        """Return the categories that currently have questions with the given status"""
+        self._sync()
+        with self._lock:
+            return [category for (s, category), keys in self._ordered_by_category.items()
+                    if s == status and keys]
+
+    def first(self, status, category, exclude=()):
+        """Return the first question of a status and category listing not in ``exclude``"""
+        self._sync()
+        with self._lock:
+            for key in self._ordered_by_category.get((status, category), ()):
+                if key[-1] not in exclude:
+                    return self._by_id[key[-1]]
+        return None
+
+    def counts(self):
+        """Return the number of questions per status"""
+        self._sync()
+        with self._lock:
+            return {status: len(ids) for status, ids in self._by_status.items()}
+
+    def page(self, status, cursor=None, limit=20):
+        """Return (questions, next_cursor) for one page of a status listing
+
+        Pending questions come most urgent and oldest first, answered questions
+        most recently answered first. ``next_cursor`` is None on the last page.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        self._sync()
+        with self._lock:
+            keys = self._ordered.get(status, [])
+            try:
+                if status in DESCENDING_STATUSES:
+                    end = bisect_left(keys, after) if after is not None else len(keys)
+                    start = max(end - limit, 0)
+                    selected = keys[start:end][::-1]
+                    has_more = start > 0
+                else:
+                    start = bisect_right(keys, after) if after is not None else 0
+                    selected = keys[start:start + limit]
+                    has_more = start + limit < len(keys)
+            except TypeError as e:
+                # Cursor issued for a different status listing
+                raise ValueError('invalid cursor') from e
+            items = [self._by_id[key[-1]] for key in selected]
+        next_cursor = encode_cursor(selected[-1]) if has_more and selected else None
+        return items, next_cursor
+
+    def recent(self, limit):
+        """Return the most recently added questions, oldest first"""
+        self._sync()
+        with self._lock:
+            ids = list(islice(reversed(self._by_id), max(limit, 0)))
+            return [self._by_id[i] for i in reversed(ids)]
+
+    # Writes
+    def add(self, question):
+        """Persist a new question and index it"""
+        self.store.insert(self.collection, question)
+        self._sync()
+        return self._by_id[question['id']]
+
+    def update(self, question_id, changes):
+        """Persist changes to a question and reindex it
+
+        Returns ``(previous, question)``, or None if the question is missing.
+        """
+        result = self.store.update(self.collection, question_id, changes)
+        if result is None:
+            return None
+        self._sync()
+        return result[0], self._by_id.get(question_id)
+
+
+questions = QuestionRepository()
@@ -0,0 +1,130 @@
+import gzip
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import make_response, request, session
+
+from storage import file_signature
+
+
+class ResponseCache:
+    """Cache of fully rendered responses for pages that are identical for every user
+
+    Entries are keyed by endpoint and rebuilt whenever one of the declared
+    template or data files, or a file every page depends on (see
+    ``depend_on``), changes on disk. Cached bodies are served with a
+    strong ETag and Last-Modified, so repeat visitors get a 304, and are
+    optionally kept gzip-compressed next to the plain bytes.
+    """
+
+    def __init__(self, app, compress=True, compress_min_size=1024, max_age=0):
+        self.app = app
+        self.compress = compress
+        self.compress_min_size = compress_min_size
+        self.max_age = max_age
+        self._entries = {}
+        self._shared_files = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def depend_on(self, path):
+        """Rebuild every cached page when ``path`` changes, e.g. the asset manifest"""
+        self._shared_files.append(path)
+
+    def _template_path(self, name):
+        return os.path.join(self.app.root_path, self.app.template_folder, name)
+
+    def _signature(self, paths):
+        signature = []
+        for path in paths:
+            try:
+                signature.append(file_signature(path))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _build(self, view, args, kwargs, signature):
+        """Run the view once and keep its body if it can be shared"""
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return None, response
+        body = response.get_data()
+        entry = {
+            'signature': signature,
+            'body': body,
+            'gzip_body': None,
+            'content_type': response.content_type,
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'last_modified': datetime.now(timezone.utc).replace(microsecond=0)
+        }
+        if self.compress and len(body) >= self.compress_min_size:
+            entry['gzip_body'] = gzip.compress(body, compresslevel=9, mtime=0)
+        return entry, response
+
+    def _serve(self, entry):
+        use_gzip = entry['gzip_body'] is not None and request.accept_encodings['gzip'] > 0
+        response = make_response(entry['gzip_body'] if use_gzip else entry['body'])
+        response.content_type = entry['content_type']
+        if use_gzip:
+            response.content_encoding = 'gzip'
+            # A strong ETag identifies one exact byte representation
+            response.set_etag(entry['etag'] + '-gzip')
+        else:
+            response.set_etag(entry['etag'])
+        if entry['gzip_body'] is not None:
+            response.vary.add('Accept-Encoding')
+        response.last_modified = entry['last_modified']
+        response.cache_control.public = True
+        response.cache_control.max_age = self.max_age
+        if not self.max_age:
+            response.cache_control.must_revalidate = True
+        return response.make_conditional(request)
+
+    def cached(self, templates=(), data_files=()):
+        """Decorate a view whose output only depends on the given files"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Pending flash messages are per user and rendered into the page
+                if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                    return view(*args, **kwargs)
+
+                paths = ([self._template_path(t) for t in templates] + list(data_files)
+                         + self._shared_files)
+                signature = self._signature(paths)
+                key = request.endpoint
+                entry = self._entries.get(key)
+                if entry is not None and entry['signature'] == signature:
+                    self.hits += 1
+                    return self._serve(entry)
+
+                self.misses += 1
+                entry, response = self._build(view, args, kwargs, signature)
+                if entry is None:
+                    return response
+                with self._lock:
+                    self._entries[key] = entry
+                return self._serve(entry)
+            return wrapper
+        return decorator
+
+    def invalidate(self, endpoint=None):
+        """Drop one cached endpoint, or everything"""
+        with self._lock:
+            if endpoint is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(endpoint, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0
+        }
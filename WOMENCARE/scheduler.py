@@ -0,0 +1,166 @@
+import threading
+import time
+from datetime import date
+
+from questions import URGENCY_RANK, questions as question_repository
+from storage import get_store
+
+LEASES_COLLECTION = 'question_leases'
+
+# How long a claimed question stays reserved for one doctor
+LEASE_SECONDS = 15 * 60
+
+# Candidates tried before giving up when other doctors keep winning the claim
+MAX_CLAIM_ATTEMPTS = 5
+
+# Question categories each specialization is best placed to answer
+SPECIALIZATION_CATEGORIES = {
+    'Gynecologist': {'menstrual_health', 'pcos_pcod', 'hygiene', 'product_advice', 'general_health'},
+    'Nutritionist & Dietitian': {'diet_nutrition', 'pcos_pcod', 'general_health'},
+}
+
+
+def on_duty(doctor, today=None):
+    """Whether today's weekday is in the doctor's ``availability`` list
+
+    Doctors without an availability list are taken to be available every day.
+    """
+    days = doctor.get('availability')
+    if not days:
+        return True
+    weekday = (today or date.today()).strftime('%A')
+    return weekday.lower() in {str(day).lower() for day in days}
+
+
+class LeaseConflict(Exception):
+    """Raised when a question is already claimed by another doctor"""
+
+    def __init__(self, lease):
+        super().__init__(f"Question is being answered by {lease.get('doctor_name')}")
+        self.lease = lease
+
+
+class QuestionScheduler:
+    """Priority queue of pending questions with per-doctor claim leases
+
+    Pending questions are ordered per category by urgency and age in the
+    question repository, so picking the next question only compares the head
+    of each category: most urgent first, then questions matching the doctor's
+    specialization, then oldest. Claims are stored as leases in the record
+    store so two doctors (or two workers) can never hold the same question.
+    """
+
+    def __init__(self, repository=None, store=None, lease_seconds=LEASE_SECONDS):
+        self.repository = repository or question_repository
+        self._store = store
+        self.lease_seconds = lease_seconds
+        self._lock = threading.RLock()
+        self._version = -1
+        self._active = {}
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = get_store()
+        return self._store
+
+    def _sync(self):
+        """Refresh the set of unexpired leases from the store"""
+        now = time.time()
+        with self._lock:
+            if self.store.version(LEASES_COLLECTION) != self._version:
+                version, reset, leases = self.store.changes_since(LEASES_COLLECTION, self._version)
+                if reset:
+                    self._active = {}
+                for lease in leases:
+                    if lease['expires_at'] > now:
+                        self._active[lease['id']] = lease
+                    else:
+                        self._active.pop(lease['id'], None)
+                self._version = version
+            for question_id in [q for q, lease in self._active.items() if lease['expires_at'] <= now]:
+                del self._active[question_id]
+            return dict(self._active)
+
+    def holder(self, question_id):
+        """Return the active lease on a question, or None"""
+        return self._sync().get(question_id)
+
+    def claim(self, question_id, doctor):
+        """Reserve a question for a doctor, raises LeaseConflict if someone else holds it"""
+        now = time.time()
+
+        def mutate(lease):
+            if lease['doctor_id'] not in (None, doctor['id']) and lease['expires_at'] > now:
+                raise LeaseConflict(lease)
+            lease.update({
+                'doctor_id': doctor['id'],
+                'doctor_name': doctor['name'],
+                'claimed_at': now,
+                'expires_at': now + self.lease_seconds
+            })
+
+        lease = self.store.upsert(LEASES_COLLECTION, question_id, mutate,
+                                  lambda: {'id': question_id, 'doctor_id': None, 'expires_at': 0})
+        self._sync()
+        return lease
+
+    def release(self, question_id, doctor_id=None):
+        """Give a question back to the queue; with ``doctor_id`` only its holder may
+
+        The lease row is deleted, so the table only ever holds claims on
+        questions that are still pending.
+        """
+        now = time.time()
+
+        def check(lease):
+            if (doctor_id is not None and lease['doctor_id'] not in (None, doctor_id)
+                    and lease['expires_at'] > now):
+                raise LeaseConflict(lease)
+
+        self.store.delete(LEASES_COLLECTION, question_id, check)
+        self._sync()
+
+    def _candidate(self, doctor, leases):
+        """Best unleased pending question for a doctor, or None"""
+        preferred = SPECIALIZATION_CATEGORIES.get(doctor.get('specialization'), set())
+        best, best_priority = None, None
+        for category in self.repository.categories('pending'):
+            question = self.repository.first('pending', category, exclude=leases)
+            if question is None:
+                continue
+            priority = (URGENCY_RANK.get(question.get('urgency'), URGENCY_RANK['normal']),
+                        0 if category in preferred else 1,
+                        question.get('timestamp') or '')
+            if best_priority is None or priority < best_priority:
+                best, best_priority = question, priority
+        return best
+
+    def next_for(self, doctor, today=None):
+        """Claim and return (question, lease) for a doctor, or (None, None) if the queue is empty
+
+        A doctor who already holds a lease on a pending question gets that
+        question back (with the lease renewed) instead of a new one. Doctors
+        off duty today (see ``on_duty``) are not handed new questions.
+        """
+        leases = self._sync()
+        for question_id, lease in leases.items():
+            question = self.repository.get(question_id)
+            if lease['doctor_id'] == doctor['id'] and question and question.get('status') == 'pending':
+                return question, self.claim(question_id, doctor)
+
+        if not on_duty(doctor, today):
+            return None, None
+        for _ in range(MAX_CLAIM_ATTEMPTS):
+            question = self._candidate(doctor, leases)
+            if question is None:
+                return None, None
+            try:
+                return question, self.claim(question['id'], doctor)
+            except LeaseConflict:
+                # Lost the race to another doctor, look again
+                leases = self._sync()
+        return None, None
+
+
+scheduler = QuestionScheduler()
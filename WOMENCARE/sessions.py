@@ -0,0 +1,258 @@
+import json
+import os
+import random
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SecureCookieSession, SessionInterface
+
+from storage import atomic_write_bytes
+
+_SID_RE = re.compile(r'^[A-Za-z0-9_-]{32,64}$')
+
+# Fraction of saves that also purge expired sessions
+CLEANUP_PROBABILITY = 0.01
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class SQLiteSessionBackend:
+    """Sessions stored as compact JSON rows in a SQLite database"""
+
+    _SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS sessions (
+        sid TEXT PRIMARY KEY,
+        data BLOB NOT NULL,
+        version INTEGER NOT NULL,
+        expires REAL NOT NULL
+    )
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(self._SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def version(self, sid):
+        """Return the stored version of a session, or None"""
+        row = self._connect().execute(
+            'SELECT version FROM sessions WHERE sid = ?', (sid,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, sid):
+        """Return (version, expires, data) of a session, or None"""
+        row = self._connect().execute(
+            'SELECT version, expires, data FROM sessions WHERE sid = ?', (sid,)).fetchone()
+        return (row[0], row[1], json.loads(row[2])) if row else None
+
+    def save(self, sid, data, expires):
+        """Store a session and return its new version"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT INTO sessions (sid, data, version, expires) VALUES (?, ?, 1, ?) '
+                'ON CONFLICT (sid) DO UPDATE SET data = excluded.data, '
+                'version = version + 1, expires = excluded.expires',
+                (sid, _dumps(data), expires))
+            version = conn.execute('SELECT version FROM sessions WHERE sid = ?',
+                                   (sid,)).fetchone()[0]
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return version
+
+    def delete(self, sid):
+        self._connect().execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def cleanup(self):
+        """Remove expired sessions"""
+        self._connect().execute('DELETE FROM sessions WHERE expires <= ?', (time.time(),))
+
+
+class FileSessionBackend:
+    """Sessions stored as one compact JSON file each, versioned by mtime"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, sid + '.json')
+
+    def version(self, sid):
+        try:
+            return os.stat(self._path(sid)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self, sid):
+        path = self._path(sid)
+        try:
+            st = os.stat(path)
+            with open(path, 'rb') as f:
+                record = json.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+        return st.st_mtime_ns, record.get('expires', 0), record.get('data', {})
+
+    def save(self, sid, data, expires):
+        path = self._path(sid)
+        # Session data is cheap to lose, so skip the fsync on every write
+        atomic_write_bytes(path, _dumps({'expires': expires, 'data': data}), fsync=False)
+        return os.stat(path).st_mtime_ns
+
+    def delete(self, sid):
+        try:
+            os.unlink(self._path(sid))
+        except FileNotFoundError:
+            pass
+
+    def cleanup(self):
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'rb') as f:
+                    expired = json.loads(f.read()).get('expires', 0) <= now
+            except (OSError, ValueError):
+                continue
+            if expired:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+
+class ServerSession(SecureCookieSession):
+    """Session whose data lives on the server, the cookie only carries its id"""
+
+    def __init__(self, initial=None, sid=None, new=False, expires=0):
+        super().__init__(initial)
+        self.sid = sid
+        self.new = new
+        self.expires = expires
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface backed by a server-side store with an LRU in front
+
+    The cookie holds a random, unguessable session id, so requests no longer
+    carry, sign and verify the whole session. Cached entries are revalidated
+    against the backend version, so writes from other workers are never missed.
+    Unchanged sessions only have their server-side expiry pushed forward once
+    every ``refresh_interval`` seconds instead of on every request.
+    """
+
+    def __init__(self, backend, lru_size=1024, refresh_interval=3600):
+        self.backend = backend
+        self.lru_size = lru_size
+        self.refresh_interval = refresh_interval
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cache_get(self, sid):
+        with self._lock:
+            entry = self._lru.get(sid)
+            if entry is not None:
+                self._lru.move_to_end(sid)
+            return entry
+
+    def _cache_put(self, sid, version, expires, data):
+        with self._lock:
+            self._lru[sid] = (version, expires, _dumps(data))
+            self._lru.move_to_end(sid)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def _cache_drop(self, sid):
+        with self._lock:
+            self._lru.pop(sid, None)
+
+    def _load(self, sid):
+        """Return (expires, data) of a live session, or None"""
+        entry = self._cache_get(sid)
+        if entry is not None and self.backend.version(sid) == entry[0]:
+            version, expires, payload = entry
+            data = json.loads(payload)
+        else:
+            loaded = self.backend.load(sid)
+            if loaded is None:
+                self._cache_drop(sid)
+                return None
+            version, expires, data = loaded
+            self._cache_put(sid, version, expires, data)
+        if expires <= time.time():
+            return None
+        return expires, data
+
+    def _store(self, session, expires):
+        data = dict(session)
+        version = self.backend.save(session.sid, data, expires)
+        self._cache_put(session.sid, version, expires, data)
+        session.expires = expires
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and _SID_RE.match(sid):
+            loaded = self._load(sid)
+            if loaded is not None:
+                return ServerSession(loaded[1], sid=sid, expires=loaded[0])
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                self._cache_drop(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        cookie_expires = self.get_expiration_time(app, session)
+        # Browser-session cookies still need a bound on the server copy
+        expires = (cookie_expires.timestamp() if cookie_expires
+                   else time.time() + app.permanent_session_lifetime.total_seconds())
+
+        if session.modified or session.new:
+            self._store(session, expires)
+            if random.random() < CLEANUP_PROBABILITY:
+                self.backend.cleanup()
+        elif expires - session.expires > self.refresh_interval:
+            self._store(session, expires)
+        elif not self.should_set_cookie(app, session):
+            return
+
+        response.set_cookie(name, session.sid, expires=cookie_expires, httponly=httponly,
+                            domain=domain, path=path, secure=secure, samesite=samesite)
+        response.vary.add('Cookie')
@@ -0,0 +1,542 @@
+import json
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DATA_DIR = 'data'
+DB_FILENAME = 'womencare.db'
+
+# Collections stored one row per record instead of as a whole JSON file
+RECORD_COLLECTIONS = {'questions.json'}
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS records (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    body TEXT NOT NULL,
+    UNIQUE (collection, id)
+);
+CREATE TABLE IF NOT EXISTS versions (
+    collection TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+# Columns added after the first release of the schema
+_UPGRADES = [
+    ('records', 'rev', 'ALTER TABLE records ADD COLUMN rev INTEGER NOT NULL DEFAULT 0'),
+    ('versions', 'reset_version', 'ALTER TABLE versions ADD COLUMN reset_version INTEGER NOT NULL DEFAULT 0'),
+]
+
+_BUMP_VERSION = '''
+INSERT INTO versions (collection, version) VALUES (?, 1)
+ON CONFLICT (collection) DO UPDATE SET version = version + 1
+'''
+
+
+class RecordStore:
+    """SQLite-backed store keeping each record of a collection in its own row
+
+    Every write bumps a per-collection version and stamps the touched rows with
+    it (``rev``), so readers can cheaply detect and fetch only what changed.
+    """
+
+    def __init__(self, path, write_behind=False, window=0.005, max_batch=256):
+        self.path = path
+        self._local = threading.local()
+        self.write_behind = write_behind
+        self._committer = GroupCommitter(self, window, max_batch) if write_behind else None
+
+    def _connect(self):
+        """Return this thread's connection, creating the schema on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Group commits fsync once per batch, so full durability stays cheap
+            conn.execute('PRAGMA synchronous=FULL' if self.write_behind else 'PRAGMA synchronous=NORMAL')
+            conn.executescript(_SCHEMA)
+            for table, column, ddl in _UPGRADES:
+                columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+                if column not in columns:
+                    try:
+                        conn.execute(ddl)
+                    except sqlite3.OperationalError:
+                        # Added concurrently by another worker
+                        pass
+            conn.execute('CREATE INDEX IF NOT EXISTS records_rev ON records (collection, rev)')
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, conn, collection, reset=False):
+        """Advance the collection version inside the current transaction"""
+        conn.execute(_BUMP_VERSION, (collection,))
+        version = conn.execute('SELECT version FROM versions WHERE collection = ?',
+                               (collection,)).fetchone()[0]
+        if reset:
+            conn.execute('UPDATE versions SET reset_version = ? WHERE collection = ?',
+                         (version, collection))
+        return version
+
+    def meta(self, key):
+        """Decoded value of a ``meta`` row, or None when unset"""
+        row = self._connect().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def all(self, collection):
+        """Return every record of a collection in insertion order"""
+        rows = self._connect().execute(
+            'SELECT body FROM records WHERE collection = ? ORDER BY seq',
+            (collection,))
+        return [json.loads(body) for (body,) in rows]
+
+    def get(self, collection, record_id):
+        """Return a single record by id, or None"""
+        row = self._connect().execute(
+            'SELECT body FROM records WHERE collection = ? AND id = ?',
+            (collection, str(record_id))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def count(self, collection):
+        """Return the number of records in a collection"""
+        return self._connect().execute(
+            'SELECT COUNT(*) FROM records WHERE collection = ?',
+            (collection,)).fetchone()[0]
+
+    def version(self, collection):
+        """Return a counter that changes on every write to the collection"""
+        row = self._connect().execute(
+            'SELECT version FROM versions WHERE collection = ?',
+            (collection,)).fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, collection, version):
+        """Return (version, reset, records) for writes made after ``version``
+
+        ``reset`` is True when the collection was replaced wholesale since then,
+        in which case ``records`` holds the full collection.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            row = conn.execute(
+                'SELECT version, reset_version FROM versions WHERE collection = ?',
+                (collection,)).fetchone()
+            current, reset_version = row if row else (0, 0)
+            reset = reset_version > version
+            rows = conn.execute(
+                'SELECT body FROM records WHERE collection = ? AND rev > ? ORDER BY seq',
+                (collection, -1 if reset else version))
+            records = [json.loads(body) for (body,) in rows]
+        finally:
+            conn.execute('COMMIT')
+        return current, reset, records
+
+    def _write(self, op):
+        """Run a write operation in its own transaction, or hand it to the group committer"""
+        if self._committer is not None:
+            return self._committer.submit(op)
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = op(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def insert(self, collection, record):
+        """Append a single record to a collection"""
+        def op(conn):
+            rev = self._bump(conn, collection)
+            conn.execute(
+                'INSERT INTO records (collection, id, body, rev) VALUES (?, ?, ?, ?)',
+                (collection, str(record['id']), _dumps(record), rev))
+            return record
+        return self._write(op)
+
+    def update(self, collection, record_id, changes):
+        """Merge changes into a single record, or return None if missing
+
+        Returns ``(previous, record)`` read and written in one transaction, so
+        callers can act on the transition without racing other writers.
+        """
+        def op(conn):
+            row = conn.execute(
+                'SELECT body FROM records WHERE collection = ? AND id = ?',
+                (collection, str(record_id))).fetchone()
+            if row is None:
+                return None
+            previous = json.loads(row[0])
+            record = dict(previous)
+            record.update(changes)
+            rev = self._bump(conn, collection)
+            conn.execute(
+                'UPDATE records SET body = ?, rev = ? WHERE collection = ? AND id = ?',
+                (_dumps(record), rev, collection, str(record_id)))
+            return previous, record
+        return self._write(op)
+
+    def upsert(self, collection, record_id, mutate, default):
+        """Atomically apply ``mutate(record)`` in place, creating the record from ``default()``"""
+        def op(conn):
+            row = conn.execute(
+                'SELECT body FROM records WHERE collection = ? AND id = ?',
+                (collection, str(record_id))).fetchone()
+            record = json.loads(row[0]) if row else default()
+            mutate(record)
+            rev = self._bump(conn, collection)
+            conn.execute(
+                'INSERT INTO records (collection, id, body, rev) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (collection, id) DO UPDATE SET body = excluded.body, rev = excluded.rev',
+                (collection, str(record_id), _dumps(record), rev))
+            return record
+        return self._write(op)
+
+    def delete(self, collection, record_id, check=None):
+        """Remove a record and return it, or None if missing
+
+        ``check(record)`` runs inside the transaction and may raise to veto the
+        delete. Readers cannot see a removed row, so this marks a reset and
+        their next ``changes_since`` returns the whole collection.
+        """
+        def op(conn):
+            row = conn.execute(
+                'SELECT body FROM records WHERE collection = ? AND id = ?',
+                (collection, str(record_id))).fetchone()
+            if row is None:
+                return None
+            record = json.loads(row[0])
+            if check is not None:
+                check(record)
+            self._bump(conn, collection, reset=True)
+            conn.execute('DELETE FROM records WHERE collection = ? AND id = ?',
+                         (collection, str(record_id)))
+            return record
+        return self._write(op)
+
+    def initialize(self, collection, build):
+        """Fill a never-written collection with ``build()``, atomically and only once"""
+        def op(conn):
+            row = conn.execute('SELECT version FROM versions WHERE collection = ?',
+                               (collection,)).fetchone()
+            if row and row[0]:
+                return False
+            self._replace(conn, collection, build())
+            return True
+        return self._write(op)
+
+    def replace_all(self, collection, records):
+        """Replace the whole collection, keeping the given order"""
+        return self._write(lambda conn: self._replace(conn, collection, records))
+
+    def _replace(self, conn, collection, records):
+        rev = self._bump(conn, collection, reset=True)
+        conn.execute('DELETE FROM records WHERE collection = ?', (collection,))
+        conn.executemany(
+            'INSERT OR IGNORE INTO records (collection, id, body, rev) VALUES (?, ?, ?, ?)',
+            [(collection, str(r['id']), _dumps(r), rev) for r in records])
+
+
+def _dumps(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+
+class GroupCommitter:
+    """Background writer that commits bursts of writes in one transaction
+
+    Callers still block until their write is durable, but concurrent writes
+    arriving within ``window`` seconds share a single commit (and fsync). Each
+    operation runs under its own savepoint so one failure only fails its caller.
+    """
+
+    def __init__(self, store, window, max_batch):
+        self.store = store
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='group-committer', daemon=True)
+        self._thread.start()
+
+    def submit(self, op):
+        future = Future()
+        self._queue.put((op, future))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = self.store._connect()
+        while True:
+            batch = self._collect()
+            outcomes = []
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                for op, future in batch:
+                    conn.execute('SAVEPOINT op')
+                    try:
+                        outcomes.append((future, op(conn), None))
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO op')
+                        outcomes.append((future, None, e))
+                    conn.execute('RELEASE op')
+                conn.execute('COMMIT')
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for future, result, error in outcomes:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+
+@contextmanager
+def file_lock(filepath):
+    """Hold an exclusive cross-process lock on ``<filepath>.lock``"""
+    with open(filepath + '.lock', 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write_bytes(filepath, payload, fsync=True):
+    """Write bytes to a temp file and rename it over the target
+
+    Readers see either the old or the new file, never a partially written one.
+    With ``fsync`` the data and the rename are also flushed to disk.
+    """
+    directory = os.path.dirname(filepath) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(filepath) + '.', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    if fsync and hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def atomic_write_json(filepath, data):
+    """Durably replace a JSON file with new contents"""
+    payload = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    atomic_write_bytes(filepath, payload)
+
+
+def _readonly(self, *args, **kwargs):
+    raise TypeError('cached data is read-only, use storage.thaw() for a mutable copy')
+
+
+class FrozenDict(dict):
+    """dict that refuses in-place modification, shared safely out of the cache
+
+    copy, deepcopy and pickle give plain, mutable dicts and lists.
+    """
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return thaw(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return dict, (thaw(self),)
+
+
+class FrozenList(list):
+    """list that refuses in-place modification; still compares equal to lists"""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+    def __copy__(self):
+        return thaw(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return list, (thaw(self),)
+
+
+def freeze(value):
+    """Return a read-only deep view of parsed JSON (dicts and lists become immutable)"""
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Mutable deep copy of a value returned by ``freeze``"""
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(v) for v in value]
+    return value
+
+
+def file_signature(filepath):
+    """Identify one on-disk version of a file by inode, size and mtime"""
+    st = os.stat(filepath)
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class DataCache:
+    """Parsed-object cache keyed by file and validated against a signature"""
+
+    def __init__(self):
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, signature, loader):
+        """Return the cached value while the signature matches, else reload it"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = freeze(loader())
+        self._entries[key] = (signature, value)
+        return value
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0
+        }
+
+
+data_cache = DataCache()
+
+
+def migrate_json_files(store, data_dir=DATA_DIR):
+    """One-shot import of legacy JSON collections into the record store
+
+    A collection is only imported while it is still empty in the store. The
+    import is recorded in the ``meta`` table and the source file is left
+    untouched (it may be tracked in version control), so later starts skip
+    it without reading it again.
+    """
+    migrated = []
+    conn = store._connect()
+    for collection in sorted(RECORD_COLLECTIONS):
+        key = f'migrated:{collection}'
+        filepath = os.path.join(data_dir, collection)
+        if not os.path.exists(filepath) or store.meta(key) is not None:
+            continue
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except json.JSONDecodeError:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Re-checked under the write lock, another worker may have won
+            if conn.execute('SELECT 1 FROM meta WHERE key = ?', (key,)).fetchone() is None:
+                imported = 0
+                if conn.execute('SELECT 1 FROM records WHERE collection = ? LIMIT 1',
+                                (collection,)).fetchone() is None:
+                    store._replace(conn, collection, records)
+                    imported = len(records)
+                    migrated.append(collection)
+                conn.execute('INSERT INTO meta (key, value) VALUES (?, ?)',
+                             (key, json.dumps({'source': filepath, 'records': imported,
+                                               'at': time.time()})))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    return migrated
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(data_dir=DATA_DIR):
+    """Return the process-wide record store, migrating legacy files on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                os.makedirs(data_dir, exist_ok=True)
+                store = RecordStore(os.path.join(data_dir, DB_FILENAME),
+                                    write_behind=config.WRITE_BEHIND,
+                                    window=config.WRITE_BEHIND_WINDOW_MS / 1000.0)
+                migrate_json_files(store, data_dir)
+                _store = store
+    return _store
+
+
+if __name__ == '__main__':
+    os.makedirs(DATA_DIR, exist_ok=True)
+    done = migrate_json_files(RecordStore(os.path.join(DATA_DIR, DB_FILENAME)))
+    print('Migrated:', ', '.join(done) if done else 'nothing to migrate')
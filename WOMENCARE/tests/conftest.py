@@ -0,0 +1,58 @@
+import importlib
+import os
+import shutil
+import sys
+
+import pytest
+
+WOMENCARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, WOMENCARE_DIR)
+sys.path.insert(0, os.path.dirname(WOMENCARE_DIR))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A scratch working directory holding a copy of the seed data files"""
+    shutil.copytree(os.path.join(WOMENCARE_DIR, 'data'), tmp_path / 'data',
+                    ignore=shutil.ignore_patterns('*.db', '*.migrated', 'sessions'))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(scope='session')
+def womencare(tmp_path_factory):
+    """The app module, imported from a scratch directory so it writes no files here"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    try:
+        return importlib.import_module('app')
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(womencare, workdir, monkeypatch):
+    """Test client of the app with its store, caches and sessions in the scratch directory"""
+    import aggregates
+    import questions
+    import scheduler
+    import sessions
+    import storage
+
+    store = storage.RecordStore(str(workdir / 'data' / storage.DB_FILENAME))
+    monkeypatch.setattr(storage, '_store', store)
+    monkeypatch.setattr(questions.questions, '_store', store)
+    monkeypatch.setattr(questions.questions, '_version', -1)
+    monkeypatch.setattr(scheduler.scheduler, '_store', store)
+    monkeypatch.setattr(scheduler.scheduler, '_version', -1)
+    monkeypatch.setattr(scheduler.scheduler, '_active', {})
+    monkeypatch.setattr(aggregates.user_aggregates, '_store', store)
+    monkeypatch.setattr(aggregates.user_aggregates, '_backfilled', False)
+    monkeypatch.setattr(womencare.data_cache, '_entries', {})
+    monkeypatch.setattr(womencare.data_cache, 'hits', 0)
+    monkeypatch.setattr(womencare.data_cache, 'misses', 0)
+    monkeypatch.setattr(womencare.app, 'session_interface', sessions.ServerSideSessionInterface(
+        sessions.SQLiteSessionBackend(str(workdir / 'data' / 'sessions.db'))))
+    womencare.page_cache.invalidate()
+    storage.migrate_json_files(store, str(workdir / 'data'))
+    return womencare.app.test_client()
@@ -0,0 +1,75 @@
+import pytest
+
+from aggregates import QUESTION_ACTIVITY_LIMIT, UserAggregates
+from storage import RecordStore
+
+
+def question(question_id, email='a@example.com', status='pending', timestamp='2024-01-01T00:00:00'):
+    return {'id': question_id, 'user_email': email, 'status': status,
+            'category': 'hygiene', 'timestamp': timestamp}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RecordStore(str(tmp_path / 'store.db'))
+
+
+def test_backfills_from_existing_questions_once(store):
+    store.replace_all('questions.json', [question('q1'), question('q2', status='answered'),
+                                         question('q3', email='b@example.com')])
+    aggregates = UserAggregates(store)
+    stats = aggregates.get('a@example.com')
+    assert (stats['questions_asked'], stats['questions_answered']) == (2, 1)
+    # A question already counted by the backfill is not counted twice
+    new = question('q4')
+    store.insert('questions.json', new)
+    aggregates.record_question(new)
+    assert aggregates.get('a@example.com')['questions_asked'] == 3
+    assert UserAggregates(store).get('a@example.com')['questions_asked'] == 3
+
+
+def test_counts_follow_writes(store):
+    aggregates = UserAggregates(store)
+    asked = question('q1')
+    # The app stores a question before recording it, as here
+    store.insert('questions.json', asked)
+    aggregates.record_question(asked)
+    aggregates.record_answer(dict(asked, status='answered'), 'pending')
+    aggregates.record_answer(dict(asked, status='answered'), 'answered')
+    stats = aggregates.get('a@example.com')
+    assert (stats['questions_asked'], stats['questions_answered']) == (1, 1)
+    assert stats['recent_questions'][0]['description'] == 'Status: Answered'
+    assert aggregates.record_question(question('anon', email=None)) is None
+
+
+def test_activity_ring_is_bounded_newest_first(store):
+    aggregates = UserAggregates(store)
+    aggregates.backfill()
+    for i in range(QUESTION_ACTIVITY_LIMIT + 2):
+        aggregates.record_question(question(f'q{i}', timestamp=f'2024-01-0{i + 1}T00:00:00'))
+    ring = aggregates.get('a@example.com')['recent_questions']
+    assert [a['question_id'] for a in ring] == [f'q{i}' for i in range(QUESTION_ACTIVITY_LIMIT + 1, 1, -1)]
+
+
+def test_cycle_update_is_recorded(store):
+    aggregates = UserAggregates(store)
+    aggregates.record_cycle_update('a@example.com', {'last_updated': '2024-03-01T00:00:00'})
+    assert aggregates.get('a@example.com')['last_cycle_update'] == '2024-03-01T00:00:00'
+
+
+def test_asking_does_not_claim_an_identity(client):
+    form = {'name': 'A', 'email': 'victim@example.com', 'question': 'Question', 'category': 'hygiene'}
+    client.post('/ask-doctor', data=form)
+    client.post('/ask-doctor', data=form)
+    assert client.get('/api/dashboard-stats').get_json()['questions_asked'] == 0
+
+
+def test_concurrent_answers_count_once(client, womencare, monkeypatch):
+    asked = question('q1')
+    womencare.questions.add(asked)
+    womencare.user_aggregates.record_question(asked)
+    # Both requests read the question while it was still pending
+    monkeypatch.setattr(womencare.questions, 'get', lambda question_id: dict(asked))
+    for doctor in ('Dr. A', 'Dr. B'):
+        client.post('/answer-question/q1', data={'answer': 'Rest', 'doctor_name': doctor})
+    assert womencare.user_aggregates.get('a@example.com')['questions_answered'] == 1
@@ -0,0 +1,67 @@
+import json
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from storage import RecordStore, atomic_write_bytes, atomic_write_json, file_lock
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    path = str(tmp_path / 'data.json')
+    atomic_write_json(path, {'a': 1})
+    atomic_write_json(path, {'a': 2})
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == {'a': 2}
+    assert sorted(os.listdir(tmp_path)) == ['data.json']
+
+
+def test_failed_write_keeps_old_file(tmp_path):
+    path = str(tmp_path / 'data.json')
+    atomic_write_json(path, {'a': 1})
+    with pytest.raises(TypeError):
+        atomic_write_bytes(path, 'not bytes')
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == {'a': 1}
+    assert sorted(os.listdir(tmp_path)) == ['data.json']
+
+
+def _increment(path, times):
+    for _ in range(times):
+        with file_lock(path):
+            with open(path, encoding='utf-8') as f:
+                count = json.load(f)['count']
+            atomic_write_json(path, {'count': count + 1})
+
+
+def test_file_lock_serializes_processes(tmp_path):
+    path = str(tmp_path / 'counter.json')
+    atomic_write_json(path, {'count': 0})
+    workers = [multiprocessing.Process(target=_increment, args=(path, 25)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == {'count': 100}
+
+
+def test_group_commit_isolates_failures(tmp_path):
+    store = RecordStore(str(tmp_path / 'store.db'), write_behind=True, window=0.05)
+    store.insert('questions.json', {'id': 'taken'})
+    errors = []
+
+    def insert(record_id):
+        try:
+            store.insert('questions.json', {'id': record_id})
+        except Exception as e:
+            errors.append((record_id, e))
+
+    threads = [threading.Thread(target=insert, args=(i,)) for i in ('a', 'taken', 'b', 'c')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [record_id for record_id, _ in errors] == ['taken']
+    assert sorted(r['id'] for r in store.all('questions.json')) == ['a', 'b', 'c', 'taken']
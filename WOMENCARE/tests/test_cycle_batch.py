@@ -0,0 +1,55 @@
+import random
+from datetime import datetime, timedelta
+
+from cycle_batch import predict_cycles_batch
+
+NOW = datetime(2024, 3, 15, 10, 30)
+
+
+def random_record(rng):
+    year = rng.choice([rng.randint(1, 999), rng.randint(1000, 9999), rng.randint(2020, 2025)])
+    day = datetime(year, 1, 1) + timedelta(days=rng.randint(0, 364), minutes=rng.randint(0, 1439))
+    record = {'last_period': day.isoformat()}
+    if rng.random() < 0.8:
+        record['cycle_length'] = rng.choice([rng.randint(21, 35), rng.uniform(20, 40), 0, -400])
+    if rng.random() < 0.8:
+        record['period_length'] = rng.choice([rng.randint(2, 8), rng.uniform(2, 8), '5'])
+    return record
+
+
+def invalid_records():
+    return [{}, {'last_period': 'not a date'}, {'last_period': '2024-01-01T00:00:00+05:30'},
+            {'last_period': '9999-12-30'}, {'last_period': '2024-01-01', 'cycle_length': 'x'},
+            {'last_period': None}, 'not a dict']
+
+
+def test_matches_scalar_predictions(womencare):
+    rng = random.Random(7)
+    records = [random_record(rng) for _ in range(2000)] + invalid_records()
+    batch = predict_cycles_batch(records, now=NOW)
+    for record, prediction in zip(records, batch):
+        expected = womencare.calculate_cycle_predictions(record, NOW) if isinstance(record, dict) else {}
+        assert prediction == expected, record
+
+
+def test_early_years_use_strftime_format(womencare):
+    record = {'last_period': '0950-06-01', 'cycle_length': 28}
+    assert predict_cycles_batch([record], now=NOW)[0] == womencare.calculate_cycle_predictions(record, NOW)
+
+
+def test_forecast_covers_horizon():
+    record = {'last_period': '2024-01-01', 'cycle_length': 30}
+    prediction = predict_cycles_batch([record], horizon=3, now=NOW)[0]
+    assert [cycle['next_period'] for cycle in prediction['forecast']] == [
+        '2024-01-31', '2024-03-01', '2024-03-31']
+
+
+def test_batch_endpoint_validates_input(client):
+    ok = client.post('/api/track-cycle/batch', json={'records': [{'last_period': '2024-01-01'}, {}],
+                                                     'horizon': 2})
+    body = ok.get_json()
+    assert body['count'] == 2 and len(body['predictions'][0]['forecast']) == 2
+    assert body['predictions'][1] == {}
+    for payload in ({}, {'records': 'x'}, {'records': [], 'horizon': 0},
+                    {'records': [], 'horizon': True}, {'records': [{}] * 10001}):
+        assert client.post('/api/track-cycle/batch', json=payload).status_code == 400
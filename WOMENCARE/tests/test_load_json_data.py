@@ -0,0 +1,45 @@
+import json
+import os
+
+import pytest
+
+
+def rewrite(path, data):
+    st = os.stat(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    # Make the new version visible even on filesystems with coarse mtimes
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_unchanged_file_is_served_from_cache(client, womencare):
+    first = womencare.load_json_data('doctors.json')
+    assert womencare.load_json_data('doctors.json') is first
+    assert womencare.data_cache.stats()['hits'] == 1
+
+
+def test_changed_file_is_reloaded(client, womencare, workdir):
+    womencare.load_json_data('doctors.json')
+    rewrite(workdir / 'data' / 'doctors.json', [{'id': 9, 'name': 'Dr. New'}])
+    assert womencare.load_json_data('doctors.json') == [{'id': 9, 'name': 'Dr. New'}]
+
+
+def test_saved_data_is_visible_immediately(client, womencare):
+    womencare.load_json_data('menstrual_products.json')
+    womencare.save_json_data('menstrual_products.json', {'pads': []})
+    assert womencare.load_json_data('menstrual_products.json') == {'pads': []}
+
+
+def test_cached_data_is_read_only(client, womencare):
+    doctors = womencare.load_json_data('doctors.json')
+    with pytest.raises(TypeError):
+        doctors.append({})
+    with pytest.raises(TypeError):
+        doctors[0]['name'] = 'changed'
+
+
+def test_record_collections_follow_store_version(client, womencare):
+    before = womencare.load_json_data('questions.json')
+    womencare.save_json_data('questions.json', [{'id': 'x', 'status': 'pending'}])
+    after = womencare.load_json_data('questions.json')
+    assert after is not before and after == [{'id': 'x', 'status': 'pending'}]
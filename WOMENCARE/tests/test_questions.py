@@ -0,0 +1,119 @@
+import pytest
+
+from questions import QuestionRepository, decode_cursor, encode_cursor
+from storage import RecordStore
+
+
+def question(question_id, email='a@example.com', status='pending', urgency='normal',
+             timestamp='2024-01-01T00:00:00', **extra):
+    return dict(id=question_id, user_email=email, status=status, urgency=urgency,
+                timestamp=timestamp, category='general_health', **extra)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RecordStore(str(tmp_path / 'store.db'))
+
+
+@pytest.fixture
+def repository(store):
+    return QuestionRepository(store)
+
+
+def test_lookup_by_id_and_email(repository):
+    repository.add(question('q1'))
+    repository.add(question('q2', email='b@example.com'))
+    repository.add(question('q3'))
+    assert repository.get('q2')['user_email'] == 'b@example.com'
+    assert repository.get('missing') is None
+    assert [q['id'] for q in repository.for_user('a@example.com')] == ['q1', 'q3']
+    assert repository.for_user('nobody@example.com') == []
+
+
+def test_update_moves_between_status_indexes(repository):
+    repository.add(question('q1'))
+    repository.add(question('q2'))
+    previous, updated = repository.update('q1', {'status': 'answered', 'answer_timestamp': '2024-01-02T00:00:00'})
+    assert (previous['status'], updated['status']) == ('pending', 'answered')
+    assert [q['id'] for q in repository.with_status('pending')] == ['q2']
+    assert [q['id'] for q in repository.with_status('answered')] == ['q1']
+    assert repository.counts() == {'pending': 1, 'answered': 1}
+    assert repository.update('missing', {'status': 'answered'}) is None
+
+
+def test_writes_from_another_worker_are_picked_up(store, repository):
+    repository.add(question('q1'))
+    other = QuestionRepository(store)
+    other.add(question('q2'))
+    other.update('q1', {'user_email': 'b@example.com'})
+    assert [q['id'] for q in repository.for_user('b@example.com')] == ['q1']
+    assert repository.get('q2') is not None
+
+
+def test_wholesale_replace_resets_indexes(store, repository):
+    repository.add(question('q1'))
+    store.replace_all('questions.json', [question('q2')])
+    assert repository.get('q1') is None
+    assert [q['id'] for q in repository.with_status('pending')] == ['q2']
+
+
+def test_recent_returns_latest_oldest_first(repository):
+    for i in range(5):
+        repository.add(question(f'q{i}'))
+    assert [q['id'] for q in repository.recent(3)] == ['q2', 'q3', 'q4']
+    assert repository.recent(0) == []
+
+
+def walk(repository, status, limit):
+    pages, cursor = [], None
+    while True:
+        items, cursor = repository.page(status, cursor, limit)
+        pages.append([q['id'] for q in items])
+        if cursor is None:
+            return pages
+
+
+def test_pending_pages_by_urgency_then_age(repository):
+    for i, urgency in enumerate(['low', 'urgent', 'normal', 'urgent', 'high']):
+        repository.add(question(f'q{i}', urgency=urgency, timestamp=f'2024-01-0{i + 1}T00:00:00'))
+    assert walk(repository, 'pending', 2) == [['q1', 'q3'], ['q4', 'q2'], ['q0']]
+
+
+def test_answered_pages_newest_first(repository):
+    for i in range(5):
+        repository.add(question(f'q{i}', status='answered', answer_timestamp=f'2024-02-0{i + 1}T00:00:00'))
+    assert walk(repository, 'answered', 2) == [['q4', 'q3'], ['q2', 'q1'], ['q0']]
+
+
+def test_cursor_survives_inserts_before_it(repository):
+    for i in range(4):
+        repository.add(question(f'q{i}', timestamp=f'2024-01-0{i + 1}T00:00:00'))
+    first, cursor = repository.page('pending', None, 2)
+    repository.add(question('early', timestamp='2023-12-31T00:00:00'))
+    repository.update('q0', {'status': 'answered'})
+    items, _ = repository.page('pending', cursor, 2)
+    assert [q['id'] for q in items] == ['q2', 'q3']
+
+
+def test_invalid_cursors_raise_value_error(repository):
+    repository.add(question('q1'))
+    repository.add(question('q2', status='answered'))
+    assert decode_cursor(encode_cursor([2, 't', 'q1'])) == (2, 't', 'q1')
+    for cursor in ('not base64!', encode_cursor({'a': 1}), encode_cursor([])):
+        with pytest.raises(ValueError):
+            repository.page('pending', cursor)
+    with pytest.raises(ValueError):
+        repository.page('answered', encode_cursor([2, 't', 'q1']))
+
+
+def test_dashboard_api_pages(client):
+    for i in range(3):
+        client.post('/ask-doctor', data={'name': 'A', 'email': 'a@example.com',
+                                         'question': f'Question {i}', 'category': 'hygiene'})
+    first = client.get('/api/doctor-dashboard/questions?status=pending&limit=2').get_json()
+    assert first['counts']['pending'] == 3 and len(first['questions']) == 2
+    rest = client.get('/api/doctor-dashboard/questions?status=pending&limit=2&cursor='
+                      + first['next_cursor']).get_json()
+    assert len(rest['questions']) == 1 and rest['next_cursor'] is None
+    assert client.get('/api/doctor-dashboard/questions?cursor=bogus').status_code == 400
+    assert client.get('/doctor-dashboard?limit=2').status_code == 200
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+from flask import Flask
+
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.renders = 0
+    data = tmp_path / 'data.txt'
+    data.write_text('one')
+    cache = ResponseCache(app, compress_min_size=10)
+
+    @app.route('/page')
+    @cache.cached(data_files=[str(data)])
+    def page():
+        app.renders += 1
+        return data.read_text() * 50
+
+    app.data_file = data
+    app.page_cache = cache
+    return app
+
+
+def test_second_request_is_served_from_cache(app):
+    client = app.test_client()
+    first = client.get('/page')
+    second = client.get('/page')
+    assert first.data == second.data == b'one' * 50
+    assert app.renders == 1
+    assert first.headers['ETag'] == second.headers['ETag']
+
+
+def test_matching_etag_gets_304(app):
+    client = app.test_client()
+    etag = client.get('/page').headers['ETag']
+    response = client.get('/page', headers={'If-None-Match': etag})
+    assert response.status_code == 304 and response.data == b''
+
+
+def test_gzip_variant_has_its_own_etag(app):
+    client = app.test_client()
+    plain = client.get('/page')
+    compressed = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+
+
+def test_data_file_change_rebuilds(app):
+    client = app.test_client()
+    client.get('/page')
+    st = os.stat(app.data_file)
+    app.data_file.write_text('two')
+    os.utime(app.data_file, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert client.get('/page').data == b'two' * 50
+    assert app.renders == 2
+
+
+def test_shared_dependency_change_rebuilds(app, tmp_path):
+    manifest = tmp_path / 'manifest.json'
+    app.page_cache.depend_on(str(manifest))
+    client = app.test_client()
+    client.get('/page')
+    manifest.write_text('{}')
+    client.get('/page')
+    assert app.renders == 2
+
+
+def test_pages_with_pending_flashes_are_not_cached(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_flashes'] = [('message', 'pending')]
+    client.get('/page')
+    client.get('/page')
+    assert app.renders == 2
@@ -0,0 +1,89 @@
+from datetime import date
+
+import pytest
+
+from questions import QuestionRepository
+from scheduler import LeaseConflict, QuestionScheduler, on_duty
+from storage import RecordStore
+
+MONDAY = date(2024, 3, 11)
+TUESDAY = date(2024, 3, 12)
+
+GYNECOLOGIST = {'id': 1, 'name': 'Dr. A', 'specialization': 'Gynecologist',
+                'availability': ['Monday', 'Wednesday', 'Friday']}
+NUTRITIONIST = {'id': 2, 'name': 'Dr. B', 'specialization': 'Nutritionist & Dietitian',
+                'availability': ['Monday', 'Tuesday']}
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    store = RecordStore(str(tmp_path / 'store.db'))
+    repository = QuestionRepository(store)
+    for question_id, category, urgency, timestamp in [
+            ('q1', 'diet_nutrition', 'normal', '2024-03-01T09:00:00'),
+            ('q2', 'menstrual_health', 'normal', '2024-03-01T10:00:00'),
+            ('q3', 'general_health', 'urgent', '2024-03-02T09:00:00')]:
+        repository.add({'id': question_id, 'category': category, 'urgency': urgency,
+                        'timestamp': timestamp, 'status': 'pending', 'user_email': 'u@example.com'})
+    return QuestionScheduler(repository, store)
+
+
+def test_on_duty_follows_availability():
+    assert on_duty(GYNECOLOGIST, MONDAY)
+    assert not on_duty(GYNECOLOGIST, TUESDAY)
+    assert on_duty({'id': 3, 'name': 'Dr. C'}, TUESDAY)
+
+
+def test_next_for_orders_by_urgency_then_specialization(scheduler):
+    assert scheduler.next_for(GYNECOLOGIST, MONDAY)[0]['id'] == 'q3'
+    assert scheduler.next_for(NUTRITIONIST, MONDAY)[0]['id'] == 'q1'
+
+
+def test_next_for_returns_held_question(scheduler):
+    question, lease = scheduler.next_for(GYNECOLOGIST, MONDAY)
+    again, renewed = scheduler.next_for(GYNECOLOGIST, MONDAY)
+    assert again['id'] == question['id']
+    assert renewed['expires_at'] >= lease['expires_at']
+
+
+def test_off_duty_doctor_gets_no_new_question(scheduler):
+    assert scheduler.next_for(GYNECOLOGIST, TUESDAY) == (None, None)
+    assert scheduler.next_for(NUTRITIONIST, TUESDAY)[0]['id'] == 'q3'
+
+
+def test_claim_conflicts_and_release(scheduler):
+    scheduler.claim('q2', GYNECOLOGIST)
+    with pytest.raises(LeaseConflict):
+        scheduler.claim('q2', NUTRITIONIST)
+    with pytest.raises(LeaseConflict):
+        scheduler.release('q2', NUTRITIONIST['id'])
+    scheduler.release('q2', GYNECOLOGIST['id'])
+    assert scheduler.holder('q2') is None
+    assert scheduler.claim('q2', NUTRITIONIST)['doctor_id'] == NUTRITIONIST['id']
+
+
+def test_expired_lease_can_be_taken(scheduler):
+    scheduler.lease_seconds = -1
+    scheduler.claim('q2', GYNECOLOGIST)
+    assert scheduler.holder('q2') is None
+    assert scheduler.claim('q2', NUTRITIONIST)['doctor_id'] == NUTRITIONIST['id']
+
+
+def test_release_deletes_the_lease_everywhere(scheduler):
+    other = QuestionScheduler(scheduler.repository, scheduler.store)
+    scheduler.claim('q2', GYNECOLOGIST)
+    assert other.holder('q2')['doctor_id'] == GYNECOLOGIST['id']
+    scheduler.release('q2')
+    assert scheduler.store.count('question_leases') == 0
+    assert other.holder('q2') is None
+
+
+def test_answering_drops_the_lease_row(client, womencare, monkeypatch):
+    question = {'id': 'q1', 'category': 'hygiene', 'urgency': 'normal', 'status': 'pending',
+                'timestamp': '2024-03-01T09:00:00', 'user_email': 'u@example.com'}
+    womencare.questions.add(question)
+    # An expired claim is left behind by a doctor who never answered
+    monkeypatch.setattr(womencare.scheduler, 'lease_seconds', -1)
+    womencare.scheduler.claim('q1', GYNECOLOGIST)
+    client.post('/answer-question/q1', data={'answer': 'Rest', 'doctor_name': 'Dr. B'})
+    assert womencare.scheduler.store.count('question_leases') == 0
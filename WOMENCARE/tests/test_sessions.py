@@ -0,0 +1,94 @@
+import time
+
+import pytest
+from flask import Flask, jsonify, session
+
+from sessions import FileSessionBackend, SQLiteSessionBackend, ServerSideSessionInterface
+
+
+@pytest.fixture(params=['sqlite', 'file'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteSessionBackend(str(tmp_path / 'sessions.db'))
+    return FileSessionBackend(str(tmp_path / 'sessions'))
+
+
+def make_app(backend):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.session_interface = ServerSideSessionInterface(backend, lru_size=2)
+
+    @app.route('/set/<value>')
+    def set_value(value):
+        session['value'] = value
+        return 'ok'
+
+    @app.route('/get')
+    def get_value():
+        return jsonify(session.get('value'))
+
+    @app.route('/clear')
+    def clear():
+        session.clear()
+        return 'ok'
+
+    return app
+
+
+def test_backend_round_trip(backend):
+    first = backend.save('s' * 32, {'a': 1}, time.time() + 60)
+    assert backend.load('s' * 32)[2] == {'a': 1}
+    time.sleep(0.01)
+    assert backend.save('s' * 32, {'a': 2}, time.time() + 60) != first
+    backend.delete('s' * 32)
+    assert backend.load('s' * 32) is None and backend.version('s' * 32) is None
+
+
+def test_cleanup_drops_expired(backend):
+    backend.save('e' * 32, {}, time.time() - 1)
+    backend.save('l' * 32, {}, time.time() + 60)
+    backend.cleanup()
+    assert backend.load('e' * 32) is None
+    assert backend.load('l' * 32) is not None
+
+
+def test_cookie_carries_only_the_session_id(backend):
+    client = make_app(backend).test_client()
+    client.get('/set/secret-value')
+    cookie = client.get_cookie('session')
+    assert 'secret' not in cookie.value
+    assert backend.load(cookie.value)[2] == {'value': 'secret-value'}
+    assert client.get('/get').get_json() == 'secret-value'
+
+
+def test_writes_from_another_worker_are_seen(backend):
+    app = make_app(backend)
+    client = app.test_client()
+    client.get('/set/one')
+    sid = client.get_cookie('session').value
+    time.sleep(0.01)
+    backend.save(sid, {'value': 'two'}, time.time() + 60)
+    assert client.get('/get').get_json() == 'two'
+
+
+def test_cleared_session_is_deleted(backend):
+    client = make_app(backend).test_client()
+    client.get('/set/one')
+    sid = client.get_cookie('session').value
+    client.get('/clear')
+    assert backend.load(sid) is None
+    assert client.get('/get').get_json() is None
+
+
+def test_forged_session_id_gets_a_new_session(backend):
+    client = make_app(backend).test_client()
+    client.set_cookie('session', '../../etc/passwd')
+    client.get('/set/one')
+    assert client.get_cookie('session').value != '../../etc/passwd'
+
+
+def test_cycle_tracking_uses_server_session(client):
+    response = client.post('/api/track-cycle', json={'last_period': '2024-01-01', 'cycle_length': 30})
+    assert response.get_json()['predictions']['next_period'] == '2024-01-31'
+    assert len(client.get_cookie('session').value) < 64
+    assert client.get('/api/dashboard-stats').get_json()['cycle_tracked'] is True
@@ -0,0 +1,82 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from storage import DataCache, RecordStore, freeze, migrate_json_files, thaw
+
+QUESTIONS = [{'id': 'a', 'status': 'pending'}, {'id': 'b', 'status': 'answered'}]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RecordStore(str(tmp_path / 'store.db'))
+
+
+def test_migration_keeps_source_and_runs_once(tmp_path, store):
+    source = tmp_path / 'questions.json'
+    source.write_text(json.dumps(QUESTIONS))
+    assert migrate_json_files(store, str(tmp_path)) == ['questions.json']
+    assert source.exists()
+    assert store.meta('migrated:questions.json')['records'] == 2
+
+    store.update('questions.json', 'a', {'status': 'answered'})
+    store.replace_all('questions.json', [])
+    assert migrate_json_files(store, str(tmp_path)) == []
+    assert store.all('questions.json') == []
+
+
+def test_migration_skips_populated_collection(tmp_path, store):
+    (tmp_path / 'questions.json').write_text(json.dumps(QUESTIONS))
+    store.insert('questions.json', {'id': 'c'})
+    assert migrate_json_files(store, str(tmp_path)) == []
+    assert [r['id'] for r in store.all('questions.json')] == ['c']
+    assert store.meta('migrated:questions.json')['records'] == 0
+
+
+def test_changes_since_returns_only_new_rows(store):
+    store.replace_all('questions.json', QUESTIONS)
+    version, reset, records = store.changes_since('questions.json', -1)
+    assert reset and [r['id'] for r in records] == ['a', 'b']
+
+    store.update('questions.json', 'b', {'status': 'pending'})
+    newer, reset, records = store.changes_since('questions.json', version)
+    assert newer > version and not reset
+    assert records == [{'id': 'b', 'status': 'pending'}]
+
+
+def test_upsert_creates_then_mutates(store):
+    default = lambda: {'id': 'x', 'n': 0}
+    store.upsert('leases', 'x', lambda r: r.update(n=r['n'] + 1), default)
+    assert store.upsert('leases', 'x', lambda r: r.update(n=r['n'] + 1), default)['n'] == 2
+
+
+def test_write_behind_store(tmp_path):
+    store = RecordStore(str(tmp_path / 'wb.db'), write_behind=True, window=0.001)
+    for i in range(20):
+        store.insert('questions.json', {'id': i})
+    assert store.count('questions.json') == 20
+
+
+def test_frozen_values_are_read_only_but_copy_mutable():
+    frozen = freeze({'a': [1, {'b': 2}]})
+    with pytest.raises(TypeError):
+        frozen['c'] = 1
+    with pytest.raises(TypeError):
+        frozen['a'].append(3)
+    for copied in (copy.copy(frozen), copy.deepcopy(frozen), pickle.loads(pickle.dumps(frozen)),
+                   thaw(frozen)):
+        copied['a'][1]['b'] = 3
+        assert type(copied) is dict and type(copied['a']) is list
+    assert frozen == {'a': [1, {'b': 2}]}
+
+
+def test_data_cache_reloads_on_new_signature():
+    cache = DataCache()
+    loads = []
+    loader = lambda: loads.append(1) or {'n': len(loads)}
+    assert cache.get('k', 1, loader) == {'n': 1}
+    assert cache.get('k', 1, loader) == {'n': 1}
+    assert cache.get('k', 2, loader) == {'n': 2}
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,543 @@
+"""asyncio serving path for the completion backend
+
+Serves the completion routes of ``core.py`` on aiohttp, so upstream waits hold a
+coroutine instead of a worker thread. Needs aiohttp:
+
+    pip install aiohttp
+    python async_core.py
+
+Admission is bounded: at most ``ASYNC_MAX_CONCURRENCY`` upstream calls run at
+once, up to ``ASYNC_MAX_QUEUE`` more wait for a slot, and anything beyond that
+is turned away immediately with 429. Requests that wait longer than
+``ASYNC_QUEUE_TIMEOUT`` get 503. Both carry a Retry-After estimate.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+import aiohttp
+from aiohttp import web
+
+from client import UpstreamError, UpstreamTimeout
+from core import (BATCH_MAX_ITEMS, BATCH_MAX_PARALLELISM, BATCH_PARALLELISM, OPENROUTER_API_KEY,
+                  OPENROUTER_BASE, UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_POOL_SIZE,
+                  UPSTREAM_READ_TIMEOUT, UPSTREAM_TOTAL_TIMEOUT, completions, generate_metrics,
+                  request_params, resilient_caller, timed_upstream, upstream_collector)
+from common.metrics import Registry, aiohttp_handler, aiohttp_middleware, cache_collector
+from utils import StreamCleaner, clean_output
+
+ASYNC_MAX_CONCURRENCY = int(os.environ.get("ASYNC_MAX_CONCURRENCY", "1000"))
+ASYNC_MAX_QUEUE = int(os.environ.get("ASYNC_MAX_QUEUE", "2000"))
+ASYNC_QUEUE_TIMEOUT = float(os.environ.get("ASYNC_QUEUE_TIMEOUT", "10"))
+ASYNC_PORT = int(os.environ.get("ASYNC_PORT", "5000"))
+
+
+class Overloaded(Exception):
+    """No upstream slot could be granted; ``status`` is 429 or 503"""
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionControl:
+    """Concurrency limit with a bounded wait queue
+
+    ``async with admission.slot():`` holds one of ``limit`` slots. When all
+    slots are busy up to ``queue_size`` callers wait, for at most
+    ``queue_timeout`` seconds; callers beyond that are rejected without waiting.
+    """
+
+    def __init__(self, limit, queue_size, queue_timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(limit)
+        self._active = 0
+        self._waiting = 0
+        self._rejected = 0
+        self._timed_out = 0
+        # Moving average of how long a slot is held, for Retry-After
+        self._service_time = 1.0
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up for a new caller"""
+        backlog = (self._waiting + 1) / max(self.limit, 1)
+        return max(1, math.ceil(self._service_time * backlog))
+
+    async def hold(self):
+        """Wait for a slot and return a callable that gives it back"""
+        if self._slots.locked():
+            if self._waiting >= self.queue_size:
+                self._rejected += 1
+                raise Overloaded("Too many requests waiting", 429, self.retry_after())
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._timed_out += 1
+                raise Overloaded("Timed out waiting for an upstream slot", 503,
+                                 self.retry_after()) from None
+            finally:
+                self._waiting -= 1
+        else:
+            await self._slots.acquire()
+        self._active += 1
+        entered = time.monotonic()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._active -= 1
+                self._service_time = 0.9 * self._service_time + 0.1 * (time.monotonic() - entered)
+                self._slots.release()
+        return release
+
+    @asynccontextmanager
+    async def slot(self):
+        release = await self.hold()
+        try:
+            yield
+        finally:
+            release()
+
+    def stats(self):
+        return {"limit": self.limit, "active": self._active, "waiting": self._waiting,
+                "queue_size": self.queue_size, "rejected": self._rejected,
+                "timed_out": self._timed_out, "service_time": round(self._service_time, 3)}
+
+
+class AsyncUpstreamClient:
+    """aiohttp counterpart of client.UpstreamClient, with the same errors"""
+
+    def __init__(self, base_url, headers=None, pool_size=100, connect_timeout=5.0,
+                 read_timeout=30.0, total_timeout=60.0):
+        self.base_url = base_url.rstrip("/")
+        self.headers = dict(headers or {})
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, sock_connect=connect_timeout,
+                                             sock_read=read_timeout)
+        self._session = None
+
+    async def start(self):
+        self._session = aiohttp.ClientSession(
+            headers=self.headers, timeout=self.timeout,
+            connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60))
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def _open(self, path, payload):
+        try:
+            res = await self._session.post(f"{self.base_url}{path}", json=payload)
+        except asyncio.TimeoutError as e:
+            raise UpstreamTimeout(f"Upstream timed out: {e}") from e
+        except aiohttp.ClientError as e:
+            raise UpstreamError(f"Upstream request failed: {e}") from e
+        if res.status >= 400:
+            body = await res.read()
+            res.release()
+            raise UpstreamError(f'Upstream returned {res.status}: {body[:200].decode("utf-8", "replace")}',
+                                res.status)
+        return res
+
+    async def post_json(self, path, payload):
+        """POST a JSON payload and return the decoded JSON response"""
+        res = await self._open(path, payload)
+        try:
+            body = await res.read()
+        except asyncio.TimeoutError as e:
+            raise UpstreamTimeout(f"Upstream timed out: {e}") from e
+        except aiohttp.ClientError as e:
+            raise UpstreamError(f"Upstream request failed: {e}") from e
+        finally:
+            res.release()
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise UpstreamError(f"Upstream returned invalid JSON: {e}", res.status) from e
+
+    async def stream_events(self, path, payload):
+        """Open a streaming request and return an async iterator of SSE ``data:`` payloads"""
+        return self._events(await self._open(path, payload))
+
+    async def _events(self, res):
+        try:
+            async for line in res.content:
+                line = line.strip()
+                # Blank lines separate events, ':' lines are keep-alive comments
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    return
+                try:
+                    yield json.loads(data)
+                except ValueError as e:
+                    raise UpstreamError(f"Upstream sent an invalid event: {e}") from e
+        except asyncio.TimeoutError as e:
+            raise UpstreamTimeout(f"Upstream timed out: {e}") from e
+        except aiohttp.ClientError as e:
+            raise UpstreamError(f"Upstream request failed: {e}") from e
+        finally:
+            res.release()
+
+
+class AsyncSharedStream:
+    """Events of one upstream stream, replayed to every subscriber (see singleflight.SharedStream)"""
+
+    def __init__(self):
+        self._changed = asyncio.Condition()
+        self._items = []
+        self._started = asyncio.get_running_loop().create_future()
+        self._done = False
+        self._error = None
+
+    async def run(self, open_source):
+        try:
+            source = await open_source()
+            self._started.set_result(None)
+            async for item in source:
+                async with self._changed:
+                    self._items.append(item)
+                    self._changed.notify_all()
+        except Exception as e:
+            self._error = e
+            if not self._started.done():
+                self._started.set_exception(e)
+        finally:
+            async with self._changed:
+                self._done = True
+                self._changed.notify_all()
+
+    async def wait_started(self):
+        await asyncio.shield(self._started)
+
+    async def __aiter__(self):
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self._items) or self._done)
+                if index >= len(self._items):
+                    if self._error is not None:
+                        raise self._error
+                    return
+                item = self._items[index]
+            index += 1
+            yield item
+
+
+class AsyncSingleFlight:
+    """Coalesce concurrent identical calls onto one task (see singleflight.SingleFlight)"""
+
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self._stats = {"leaders": 0, "shared": 0}
+
+    async def call(self, key, fn):
+        task = self._calls.get(key)
+        shared = task is not None
+        self._stats["shared" if shared else "leaders"] += 1
+        if not shared:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # A waiter that disconnects must not cancel the call for the others
+        return await asyncio.shield(task), shared
+
+    def stream(self, key, open_source):
+        stream = self._streams.get(key)
+        shared = stream is not None
+        self._stats["shared" if shared else "leaders"] += 1
+        if not shared:
+            stream = self._streams[key] = AsyncSharedStream()
+            task = asyncio.ensure_future(stream.run(open_source))
+            task.add_done_callback(lambda _: self._streams.pop(key, None)
+                                   if self._streams.get(key) is stream else None)
+        return stream, shared
+
+    def stats(self):
+        return dict(self._stats, in_flight=len(self._calls) + len(self._streams))
+
+
+def sse(data, event=None):
+    """Format one server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+def overloaded_response(e):
+    return web.json_response({"error": str(e)}, status=e.status,
+                             headers={"Retry-After": str(e.retry_after)})
+
+
+async def home(request):
+    return web.json_response({"status": "Grok API aiohttp backend running"})
+
+
+async def cache_stats(request):
+    return web.json_response(request.app["completions"].stats())
+
+
+async def upstream_stats(request):
+    return web.json_response(dict(request.app["resilience"].stats(),
+                                  admission=request.app["admission"].stats()))
+
+
+async def generate(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not data or "prompt" not in data:
+        return web.json_response({"error": "Missing 'prompt' in request body"}, status=400)
+
+    model, payload, request_key, key = request_params(data)
+
+    if data.get("stream"):
+        cached = request.app["completions"].get(key) if key else None
+        return await stream_generate(request, model, payload, request_key, key, cached)
+
+    try:
+        output, model, cache_status = await complete(request.app, payload, request_key, key)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+    return web.json_response({"model": model, "output": output},
+                             headers={"X-Cache": cache_status} if cache_status else None)
+
+
+async def complete(app, payload, request_key=None, key=None):
+    """Blocking completion through the cache, coalescing, retry policy and admission control
+
+    Same contract as core.complete; every attempt, hedges included, needs
+    its own admission slot.
+    """
+    completions = app["completions"]
+    model = payload["model"]
+    cached = completions.get(key) if key else None
+    if cached is not None:
+        return cached, model, "HIT"
+
+    upstream_seconds, clean_output_seconds = app["metrics"]
+
+    async def attempt(candidate):
+        async with app["admission"].slot():
+            with timed_upstream(upstream_seconds, candidate, "blocking"):
+                return await app["upstream"].post_json("/chat/completions",
+                                                       dict(payload, model=candidate))
+
+    async def call():
+        result, used = await app["resilience"].acall(model, attempt)
+        with clean_output_seconds.time():
+            output = clean_output(result["choices"][0]["message"]["content"])
+        if key and used == model:
+            completions.set(key, output)
+        return output, used
+
+    if request_key:
+        (output, used), _ = await app["inflight"].call(request_key, call)
+    else:
+        output, used = await call()
+    return output, used, "MISS" if key else None
+
+
+async def generate_batch(request):
+    """Concurrent /generate over many items, see core.generate_batch for the body
+
+    Every item still goes through admission control, so a batch can be
+    partially rejected (as per-item errors) when the server is saturated.
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return web.json_response({"error": "Missing 'items' list in request body"}, status=400)
+    if len(items) > BATCH_MAX_ITEMS:
+        return web.json_response({"error": f"At most {BATCH_MAX_ITEMS} items per batch"}, status=400)
+    defaults = data.get("defaults") or {}
+    if not isinstance(defaults, dict):
+        return web.json_response({"error": "'defaults' must be an object"}, status=400)
+    try:
+        parallelism = int(data.get("parallelism", BATCH_PARALLELISM))
+    except (TypeError, ValueError):
+        return web.json_response({"error": "'parallelism' must be an integer"}, status=400)
+    limit = asyncio.Semaphore(max(1, min(parallelism, BATCH_MAX_PARALLELISM)))
+
+    async def run(index, item):
+        if not isinstance(item, dict) or "prompt" not in item:
+            return index, {"error": "Missing 'prompt' in item"}
+        model, payload, request_key, key = request_params(dict(defaults, **item))
+        async with limit:
+            try:
+                output, model, _ = await complete(request.app, payload, request_key, key)
+                return index, {"model": model, "output": output}
+            except Exception as e:
+                return index, {"error": str(e)}
+
+    tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(items)]
+    try:
+        if not data.get("stream"):
+            results = [dict(result, index=index) for index, result in await asyncio.gather(*tasks)]
+            return web.json_response({"results": results})
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson",
+                                               "Cache-Control": "no-cache",
+                                               "X-Accel-Buffering": "no"})
+        await response.prepare(request)
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            await response.write((json.dumps(dict(result, index=index)) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+    finally:
+        # A disconnected client should not keep the remaining items running
+        for task in tasks:
+            task.cancel()
+
+
+async def stream_generate(request, model, payload, request_key, key, cached):
+    """Relay upstream completion chunks as server-sent events, as in core.stream_generate"""
+    completions = request.app["completions"]
+    headers = {"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+               "X-Accel-Buffering": "no"}
+    if key:
+        headers["X-Cache"] = "HIT" if cached is not None else "MISS"
+
+    if cached is not None:
+        body = (sse({"output": cached}) if cached else b"") + sse({"model": model}, event="done")
+        return web.Response(body=body, headers=headers)
+
+    upstream = request.app["upstream"]
+    admission = request.app["admission"]
+
+    async def attempt(candidate):
+        # The slot is held until the upstream stream has been fully drained
+        release = await admission.hold()
+        try:
+            with timed_upstream(request.app["metrics"][0], candidate, "stream"):
+                events = await upstream.stream_events("/chat/completions",
+                                                      dict(payload, model=candidate, stream=True))
+        except BaseException:
+            release()
+            raise
+
+        async def drain():
+            try:
+                async for event in events:
+                    yield candidate, event
+            finally:
+                release()
+        return drain()
+
+    async def open_stream():
+        # Retries and fallbacks only cover opening the stream, not hedging
+        events, _ = await request.app["resilience"].acall(model, attempt, hedge=False)
+        return events
+
+    try:
+        if request_key:
+            events, _ = request.app["inflight"].stream(request_key, open_stream)
+            await events.wait_started()
+        else:
+            events = await open_stream()
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=500)
+
+    response = web.StreamResponse(headers=headers)
+    await response.prepare(request)
+    cleaner = StreamCleaner()
+    pieces = []
+    used = model
+    try:
+        async for used, event in events:
+            choices = event.get("choices") or [{}]
+            piece = cleaner.feed(choices[0].get("delta", {}).get("content") or "")
+            if piece:
+                pieces.append(piece)
+                await response.write(sse({"output": piece}))
+        cleaner.finish()
+    except (ConnectionResetError, asyncio.CancelledError):
+        raise
+    except Exception as e:
+        await response.write(sse({"error": str(e)}, event="error"))
+        return response
+    if key and used == model:
+        completions.set(key, "".join(pieces))
+    await response.write(sse({"model": used}, event="done"))
+    await response.write_eof()
+    return response
+
+
+def admission_collector(admission):
+    def collect():
+        stats = admission.stats()
+        return [
+            ("generate_admission_slots", "gauge", "Upstream slots in use and requests waiting for one",
+             [({"state": "active"}, stats["active"]), ({"state": "waiting"}, stats["waiting"])]),
+            ("generate_admission_rejections", "counter", "Requests turned away by admission control",
+             [({"status": "429"}, stats["rejected"]), ({"status": "503"}, stats["timed_out"])]),
+        ]
+    return collect
+
+
+async def on_startup(app):
+    await app["upstream"].start()
+
+
+async def on_cleanup(app):
+    await app["upstream"].close()
+
+
+def create_app(base_url=OPENROUTER_BASE, max_concurrency=ASYNC_MAX_CONCURRENCY,
+               max_queue=ASYNC_MAX_QUEUE, queue_timeout=ASYNC_QUEUE_TIMEOUT):
+    # A registry of its own, so a process importing core.py does not mix both apps
+    registry = Registry()
+    app = web.Application(middlewares=[aiohttp_middleware(registry)])
+    app["upstream"] = AsyncUpstreamClient(
+        base_url,
+        headers={
+            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+            "Content-Type": "application/json",
+        },
+        # Connections are cheap here, the admission limit is the real bound
+        pool_size=max(UPSTREAM_POOL_SIZE, max_concurrency),
+        connect_timeout=UPSTREAM_CONNECT_TIMEOUT,
+        read_timeout=UPSTREAM_READ_TIMEOUT,
+        total_timeout=UPSTREAM_TOTAL_TIMEOUT,
+    )
+    app["admission"] = AdmissionControl(max_concurrency, max_queue, queue_timeout)
+    app["inflight"] = AsyncSingleFlight()
+    app["resilience"] = resilient_caller()
+    app["metrics"] = generate_metrics(registry)
+    registry.collector(cache_collector("generate", {"completions": completions}))
+    registry.collector(upstream_collector(app["resilience"], app["inflight"]))
+    registry.collector(admission_collector(app["admission"]))
+    # Shared with the Flask app, it is thread-safe and its disk tier is one file
+    app["completions"] = completions
+    app.router.add_get("/", home)
+    app.router.add_post("/generate", generate)
+    app.router.add_post("/generate/batch", generate_batch)
+    app.router.add_get("/cache/stats", cache_stats)
+    app.router.add_get("/upstream/stats", upstream_stats)
+    app.router.add_get("/metrics", aiohttp_handler(registry))
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host="0.0.0.0", port=ASYNC_PORT)
@@ -0,0 +1,87 @@
+"""Benchmark upstream calls against a local stub completion server
+
+Compares the old one-connection-per-call ``requests.post`` with the pooled
+UpstreamClient, sequentially and from several threads:
+
+    python bench_upstream.py --requests 500 --threads 8
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from client import UpstreamClient
+
+COMPLETION = json.dumps({
+    "choices": [{"message": {"content": "Stub   completion\nfrom the local upstream."}}]
+}).encode("utf-8")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections open between requests
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run(label, call, total, threads):
+    start = time.perf_counter()
+    if threads == 1:
+        for _ in range(total):
+            call()
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda _: call(), range(total)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {total / elapsed:8.0f} req/s  {elapsed / total * 1000:6.2f} ms/req")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    server, base = start_stub()
+    payload = {"model": "stub", "messages": [{"role": "user", "content": "hi"}]}
+
+    def unpooled():
+        res = requests.post(f"{base}/chat/completions", json=payload, timeout=30)
+        res.raise_for_status()
+        return res.json()
+
+    client = UpstreamClient(base, pool_size=args.threads, http2=False)
+
+    def pooled():
+        return client.post_json("/chat/completions", payload)
+
+    for threads in (1, args.threads):
+        run(f"requests.post, {threads} thread(s)", unpooled, args.requests, threads)
+        run(f"UpstreamClient ({client.transport}), {threads} thread(s)", pooled, args.requests, threads)
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(model, prompt, max_tokens, temperature):
+    """Stable key for a completion request
+
+    Prompts that differ only in surrounding or repeated whitespace, and numbers
+    that differ only in type (``500`` vs ``500.0``), map to the same key.
+    """
+    normalized = json.dumps([
+        str(model).strip(),
+        " ".join(str(prompt).split()),
+        int(max_tokens),
+        round(float(temperature), 4),
+    ], separators=(",", ":"))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class DiskTier:
+    """SQLite table of cached completions that survives restarts"""
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS completions (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        expires REAL NOT NULL
+    )
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(self._SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, now):
+        """Return (value, expires) of an unexpired entry, or None"""
+        row = self._connect().execute(
+            "SELECT value, expires FROM completions WHERE key = ? AND expires > ?",
+            (key, now)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def set(self, key, value, expires):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO completions (key, value, expires) VALUES (?, ?, ?)",
+            (key, json.dumps(value), expires))
+
+    def purge(self, now):
+        """Delete expired entries, returns how many were removed"""
+        return self._connect().execute(
+            "DELETE FROM completions WHERE expires <= ?", (now,)).rowcount
+
+    def clear(self):
+        self._connect().execute("DELETE FROM completions")
+
+
+class CompletionCache:
+    """Bounded in-memory LRU with per-entry TTL and an optional disk tier
+
+    Memory misses fall through to the disk tier (when ``path`` is set) and
+    hits there are promoted back into memory. Entries past their TTL are
+    treated as misses and dropped.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = DiskTier(path) if path else None
+        if self.disk:
+            self.disk.purge(time.time())
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0,
+                       "evictions": 0, "expirations": 0}
+
+    def _put(self, key, value, expires):
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get(self, key):
+        """Return the cached value for a key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[0]
+                del self._entries[key]
+                self._stats["expirations"] += 1
+
+        stored = self.disk.get(key, now) if self.disk else None
+        if stored is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        self._put(key, *stored)
+        with self._lock:
+            self._stats["disk_hits"] += 1
+        return stored[0]
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        self._put(key, value, expires)
+        if self.disk:
+            self.disk.set(key, value, expires)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk:
+            self.disk.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries),
+                         max_entries=self.max_entries, ttl=self.ttl,
+                         disk=self.disk.path if self.disk else None)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
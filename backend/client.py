@@ -0,0 +1,187 @@
+import json
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# HTTP/2 is used when httpx and its h2 extra are installed, else HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class UpstreamError(Exception):
+    """Upstream call failed; ``status`` is the HTTP status when there was a response"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class UpstreamTimeout(UpstreamError):
+    """Upstream call exceeded its connect, read or total deadline"""
+
+
+class UpstreamClient:
+    """Pooled keep-alive HTTP client for the completion API, shared by all threads
+
+    One connection pool is reused across requests so only the first call to a
+    host pays for the TCP and TLS handshakes. Timeouts apply per stage:
+    ``connect_timeout`` to open a connection, ``read_timeout`` between bytes
+    and ``total_timeout`` for the whole exchange.
+    """
+
+    def __init__(self, base_url, headers=None, pool_size=20, connect_timeout=5.0,
+                 read_timeout=30.0, total_timeout=60.0, http2=True):
+        self.base_url = base_url.rstrip('/')
+        self.headers = dict(headers or {})
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.http2 = bool(http2 and httpx is not None)
+        self._local = threading.local()
+
+        if self.http2:
+            # httpx.Client is thread-safe and multiplexes requests over HTTP/2
+            self._httpx = httpx.Client(
+                http2=True,
+                headers=self.headers,
+                limits=httpx.Limits(max_connections=pool_size,
+                                    max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(connect=connect_timeout, read=read_timeout,
+                                      write=read_timeout, pool=connect_timeout))
+        else:
+            # Sessions are per thread, the adapter (and its urllib3 pool) is shared
+            self._httpx = None
+            self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size,
+                                        pool_block=False)
+
+    @property
+    def transport(self):
+        return 'httpx/http2' if self._httpx is not None else 'requests/http1.1'
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+            self._local.session = session
+        return session
+
+    def _deadline(self, total_timeout):
+        return time.monotonic() + (total_timeout or self.total_timeout)
+
+    @staticmethod
+    def _check(deadline):
+        if time.monotonic() > deadline:
+            raise UpstreamTimeout('Upstream exceeded the total timeout')
+
+    def _open(self, path, payload, deadline):
+        """Send the request; returns (status, chunk iterator, close callback)"""
+        url = f'{self.base_url}{path}'
+        try:
+            if self._httpx is not None:
+                context = self._httpx.stream('POST', url, json=payload)
+                res = context.__enter__()
+                try:
+                    self._check(deadline)
+                except BaseException:
+                    # Hand the connection back to the pool before giving up
+                    context.__exit__(*sys.exc_info())
+                    raise
+                return res.status_code, res.iter_bytes(), lambda: context.__exit__(None, None, None)
+            res = self._session().post(url, json=payload, stream=True,
+                                       timeout=(self.connect_timeout, self.read_timeout))
+            try:
+                self._check(deadline)
+            except BaseException:
+                res.close()
+                raise
+            return res.status_code, res.iter_content(chunk_size=16384), res.close
+        except UpstreamError:
+            raise
+        except Exception as e:
+            raise self._translate(e) from e
+
+    def _translate(self, error):
+        timeouts = (requests.Timeout,) + ((httpx.TimeoutException,) if httpx else ())
+        if isinstance(error, timeouts):
+            return UpstreamTimeout(f'Upstream timed out: {error}')
+        return UpstreamError(f'Upstream request failed: {error}')
+
+    def _chunks(self, chunks, deadline):
+        try:
+            for chunk in chunks:
+                self._check(deadline)
+                yield chunk
+        except UpstreamError:
+            raise
+        except Exception as e:
+            raise self._translate(e) from e
+
+    def post_json(self, path, payload, total_timeout=None):
+        """POST a JSON payload and return the decoded JSON response"""
+        deadline = self._deadline(total_timeout)
+        status, chunks, close = self._open(path, payload, deadline)
+        try:
+            body = b''.join(self._chunks(chunks, deadline))
+        finally:
+            close()
+        if status >= 400:
+            raise UpstreamError(f'Upstream returned {status}: {body[:200].decode("utf-8", "replace")}',
+                                status)
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise UpstreamError(f'Upstream returned invalid JSON: {e}', status) from e
+
+    def stream_events(self, path, payload, total_timeout=None):
+        """POST a streaming request and return an iterator of decoded SSE ``data:`` payloads
+
+        The request is sent and its status checked before this returns, so
+        connection and HTTP errors surface here rather than mid-stream.
+        """
+        deadline = self._deadline(total_timeout)
+        status, chunks, close = self._open(path, payload, deadline)
+        if status >= 400:
+            try:
+                body = b''.join(self._chunks(chunks, deadline))
+            finally:
+                close()
+            raise UpstreamError(f'Upstream returned {status}: {body[:200].decode("utf-8", "replace")}',
+                                status)
+        return self._events(chunks, deadline, close)
+
+    def _events(self, chunks, deadline, close):
+        buffer = b''
+        try:
+            for chunk in self._chunks(chunks, deadline):
+                buffer += chunk
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    line = line.strip()
+                    # Blank lines separate events, ':' lines are keep-alive comments
+                    if not line.startswith(b'data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == b'[DONE]':
+                        return
+                    try:
+                        yield json.loads(data)
+                    except ValueError as e:
+                        raise UpstreamError(f'Upstream sent an invalid event: {e}') from e
+        finally:
+            close()
+
+    def close(self):
+        if self._httpx is not None:
+            self._httpx.close()
+        else:
+            self._adapter.close()
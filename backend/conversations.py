@@ -0,0 +1,178 @@
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# Exact token counts when tiktoken is installed, else a characters/4 estimate
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+# Ids are issued by ``ConversationStore.create`` (uuid4 hex), never chosen by clients
+CONVERSATION_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# Tokens the chat format adds around every message
+MESSAGE_OVERHEAD = 4
+
+# Characters of each dropped turn kept in the running summary
+SUMMARY_SNIPPET = 160
+
+# Folded-out turns remembered per conversation; older ones are forgotten
+SUMMARY_MAX_LINES = 50
+
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def summary_line(message):
+    """One short line standing in for a turn that no longer fits"""
+    text = " ".join(message["content"].split())
+    if len(text) > SUMMARY_SNIPPET:
+        text = text[:SUMMARY_SNIPPET].rsplit(" ", 1)[0] + "..."
+    return f"- {message['role']}: {text}"
+
+
+class Conversation:
+    """History of one chat; ``summary`` holds lines for the turns folded out of it
+
+    The summary is a rolling window of the latest ``SUMMARY_MAX_LINES``
+    folded turns, so a conversation's size stays bounded however long it runs.
+    """
+
+    def __init__(self, conversation_id, system=None):
+        self.id = conversation_id
+        self.system = system
+        self.messages = []
+        self.summary = deque(maxlen=SUMMARY_MAX_LINES)
+        self.folded = 0
+        self.created = self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "system": self.system,
+            "messages": list(self.messages),
+            "summarized_turns": self.folded,
+            "created": self.created,
+            "updated": self.updated,
+        }
+
+
+class ConversationStore:
+    """Bounded in-memory conversations, least recently used evicted first
+
+    Each conversation keeps at most ``max_messages`` messages; older ones are
+    folded into its summary. Conversations idle for ``ttl`` seconds expire.
+    State is per process, so run a single worker or pin chats to one.
+    """
+
+    def __init__(self, max_conversations=1000, max_messages=100, ttl=86400):
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id):
+        """Return a live conversation, or None"""
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return None
+            if conversation.updated + self.ttl <= time.time():
+                del self._conversations[conversation_id]
+                return None
+            self._conversations.move_to_end(conversation_id)
+            return conversation
+
+    def _insert(self, conversation):
+        self._conversations[conversation.id] = conversation
+        self._conversations.move_to_end(conversation.id)
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+        return conversation
+
+    def create(self, conversation_id=None, system=None):
+        conversation = Conversation(conversation_id or uuid.uuid4().hex, system)
+        with self._lock:
+            return self._insert(conversation)
+
+    def delete(self, conversation_id):
+        with self._lock:
+            return self._conversations.pop(conversation_id, None) is not None
+
+    def append(self, conversation, role, content):
+        """Add a message, folding the oldest ones into the summary past ``max_messages``"""
+        conversation.messages.append({"role": role, "content": content})
+        overflow = len(conversation.messages) - self.max_messages
+        if overflow > 0:
+            conversation.summary.extend(summary_line(m) for m in conversation.messages[:overflow])
+            conversation.folded += overflow
+            del conversation.messages[:overflow]
+        conversation.updated = time.time()
+
+
+def summarize(lines, budget):
+    """Extractive summary from ``summary_line``s within ``budget`` tokens, newest kept first"""
+    kept = []
+    used = count_tokens("Earlier in this conversation:") + MESSAGE_OVERHEAD
+    for line in reversed(lines):
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    if not kept:
+        return None
+    return "Earlier in this conversation:\n" + "\n".join(reversed(kept))
+
+
+def build_context(conversation, budget, summary_share=0.2, pending=None):
+    """Messages to send upstream, fitted into ``budget`` prompt tokens
+
+    ``pending`` is a message not yet in the history (the turn being asked),
+    sent as the latest one. The system prompt and the latest message are
+    always sent. Earlier turns
+    are added newest first while they fit; whatever does not fit (plus the
+    conversation's rolling summary of turns folded out of the history) is
+    replaced by a short extractive summary using at most ``summary_share``
+    of the budget. The work is bounded by ``max_messages`` and
+    ``SUMMARY_MAX_LINES``, not the conversation's length. Returns
+    ``(messages, stats)``.
+    """
+    system = [{"role": "system", "content": conversation.system}] if conversation.system else []
+    history = conversation.messages + [pending] if pending else conversation.messages
+    used = sum(message_tokens(m) for m in system) + message_tokens(history[-1])
+    summary_budget = int(budget * summary_share)
+
+    kept = [history[-1]]
+    index = len(history) - 2
+    while index >= 0:
+        cost = message_tokens(history[index])
+        if used + cost > budget - summary_budget:
+            break
+        kept.append(history[index])
+        used += cost
+        index -= 1
+    kept.reverse()
+
+    dropped = list(conversation.summary) + [summary_line(m) for m in history[:index + 1]]
+    summary = summarize(dropped, summary_budget) if dropped else None
+    if summary:
+        system = system + [{"role": "system", "content": summary}]
+        used += count_tokens(summary) + MESSAGE_OVERHEAD
+
+    messages = system + kept
+    return messages, {"messages": len(messages), "tokens": used,
+                      "trimmed": conversation.folded + index + 1, "summarized": bool(summary)}
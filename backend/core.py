@@ -1,6 +1,26 @@
-from flask import Flask, request, jsonify
-import requests
-from utils import clean_output
+from flask import Flask, Response, request, jsonify, stream_with_context
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from cache import CompletionCache, cache_key
+from client import UpstreamClient, UpstreamError, UpstreamTimeout
+from conversations import CONVERSATION_ID_RE, ConversationStore, build_context
+from geo import Gazetteer
+from ngos import FACETS as NGO_FACETS, SORTS as NGO_SORTS, NgoCatalog
+from resilience import ResilientCaller
+from schemes import FACETS, SchemeCatalog
+from singleflight import SingleFlight
+from translations import TranslationCatalog
+from utils import StreamCleaner, clean_output
+
+# Shared modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.assets import serve_assets
+from common.metrics import cache_collector, instrument_flask, registry
+from common.profiling import instrument_profiler
 
 app = Flask(__name__)
 
@@ -9,6 +29,192 @@ OPENROUTER_API_KEY = "sk-or-v1-79310b274c73e0e9c87d3096ca958a36337a6722a4f589360
 OPENROUTER_BASE = "https://openrouter.ai/api/v1"
 DEFAULT_MODEL = "google/gemma-3n-e2b-it:free"
 
+# Upstream connection pool and per-stage timeouts (seconds)
+UPSTREAM_POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", "20"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_READ_TIMEOUT = float(os.environ.get("UPSTREAM_READ_TIMEOUT", "30"))
+UPSTREAM_TOTAL_TIMEOUT = float(os.environ.get("UPSTREAM_TOTAL_TIMEOUT", "60"))
+UPSTREAM_HTTP2 = os.environ.get("UPSTREAM_HTTP2", "1") == "1"
+
+# One keep-alive pool shared by every request thread
+upstream = UpstreamClient(
+    OPENROUTER_BASE,
+    headers={
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+    },
+    pool_size=UPSTREAM_POOL_SIZE,
+    connect_timeout=UPSTREAM_CONNECT_TIMEOUT,
+    read_timeout=UPSTREAM_READ_TIMEOUT,
+    total_timeout=UPSTREAM_TOTAL_TIMEOUT,
+    http2=UPSTREAM_HTTP2,
+)
+
+# Completion cache; on by default only for temperature 0, the "cache" field overrides
+GENERATE_CACHE_SIZE = int(os.environ.get("GENERATE_CACHE_SIZE", "1024"))
+GENERATE_CACHE_TTL = float(os.environ.get("GENERATE_CACHE_TTL", "3600"))
+GENERATE_CACHE_PATH = os.environ.get("GENERATE_CACHE_PATH", "")  # sqlite file for the disk tier
+
+completions = CompletionCache(GENERATE_CACHE_SIZE, GENERATE_CACHE_TTL,
+                              GENERATE_CACHE_PATH or None)
+
+# Retries, hedging and fallbacks for upstream calls
+UPSTREAM_RETRIES = int(os.environ.get("UPSTREAM_RETRIES", "2"))
+UPSTREAM_BACKOFF_BASE = float(os.environ.get("UPSTREAM_BACKOFF_BASE", "0.25"))
+UPSTREAM_BACKOFF_MAX = float(os.environ.get("UPSTREAM_BACKOFF_MAX", "4"))
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "5"))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", "30"))
+HEDGE_REQUESTS = os.environ.get("HEDGE_REQUESTS", "1") == "1"
+HEDGE_QUANTILE = float(os.environ.get("HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_DELAY = float(os.environ.get("HEDGE_MIN_DELAY", "0.5"))
+# Hedges in flight at once; further ones are skipped rather than queued
+HEDGE_MAX_CONCURRENT = int(os.environ.get("HEDGE_MAX_CONCURRENT", "4"))
+# First attempts of hedgeable calls in flight at once; beyond it calls go unhedged
+HEDGE_ATTEMPT_WORKERS = int(os.environ.get("HEDGE_ATTEMPT_WORKERS", "64"))
+# Comma-separated models tried in order when the requested one keeps failing
+FALLBACK_MODELS = [m.strip() for m in os.environ.get("FALLBACK_MODELS", "").split(",") if m.strip()]
+
+
+def resilient_caller():
+    return ResilientCaller(
+        FALLBACK_MODELS,
+        retries=UPSTREAM_RETRIES,
+        backoff_base=UPSTREAM_BACKOFF_BASE,
+        backoff_max=UPSTREAM_BACKOFF_MAX,
+        failure_threshold=BREAKER_FAILURES,
+        reset_timeout=BREAKER_RESET_TIMEOUT,
+        hedge=HEDGE_REQUESTS,
+        hedge_quantile=HEDGE_QUANTILE,
+        hedge_min_delay=HEDGE_MIN_DELAY,
+        deadline=UPSTREAM_TOTAL_TIMEOUT,
+        hedge_workers=HEDGE_MAX_CONCURRENT,
+        attempt_workers=HEDGE_ATTEMPT_WORKERS,
+    )
+
+
+resilience = resilient_caller()
+
+# Identical requests in flight at the same time share one upstream call
+inflight = SingleFlight()
+
+
+
+def upstream_collector(resilience, inflight):
+    """Scrape-time figures from the retry policy and in-flight coalescing"""
+    def collect():
+        policy = resilience.stats()
+        coalescing = inflight.stats()
+        events = ("calls", "retries", "fallbacks", "hedges", "hedge_wins", "hedges_skipped",
+                  "short_circuits", "failures")
+        return [
+            ("generate_upstream_policy_events", "counter", "Retry policy decisions by kind",
+             [({"event": event}, policy[event]) for event in events]),
+            ("generate_breaker_open", "gauge", "1 while a model's circuit breaker is open",
+             [({"model": model}, int(info["breaker"] == "open"))
+              for model, info in sorted(policy["models"].items())]),
+            ("generate_coalesced_requests", "counter", "Requests that led or joined an in-flight call",
+             [({"role": "leader"}, coalescing["leaders"]), ({"role": "follower"}, coalescing["shared"])]),
+        ]
+    return collect
+
+
+def generate_metrics(registry):
+    """Upstream and clean_output latency histograms on a registry"""
+    return (registry.histogram("generate_upstream_seconds", "Time for one upstream attempt",
+                               ("model", "mode", "outcome")),
+            registry.histogram("generate_clean_output_seconds", "Time spent in clean_output"))
+
+
+@contextmanager
+def timed_upstream(histogram, model, mode):
+    """Observe an upstream attempt, labelled ok, timeout, error or the HTTP status"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except UpstreamTimeout:
+        outcome = "timeout"
+        raise
+    except UpstreamError as e:
+        outcome = str(e.status) if e.status else "error"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, model=model, mode=mode, outcome=outcome)
+
+
+# Request timings, upstream latency and cache ratios at /metrics
+instrument_flask(app)
+upstream_seconds, clean_output_seconds = generate_metrics(registry)
+registry.collector(cache_collector("generate", {"completions": completions}))
+registry.collector(upstream_collector(resilience, inflight))
+
+# Opt-in per-request profiles: a signed X-Profile header (python -m common.profiling
+# SECRET PATH) or a sample rate; nothing is installed while both are unset
+PROFILE_SECRET = os.environ.get("PROFILE_SECRET", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_FORMAT = os.environ.get("PROFILE_FORMAT", "speedscope")  # or "collapsed"
+
+instrument_profiler(app, PROFILE_DIR, secret=PROFILE_SECRET, sample_rate=PROFILE_SAMPLE_RATE,
+                    interval=PROFILE_INTERVAL_MS / 1000, fmt=PROFILE_FORMAT)
+
+# Server-held chat history, trimmed to a prompt token budget per upstream call
+CONVERSATION_MAX = int(os.environ.get("CONVERSATION_MAX", "1000"))
+CONVERSATION_MAX_MESSAGES = int(os.environ.get("CONVERSATION_MAX_MESSAGES", "100"))
+CONVERSATION_TTL = float(os.environ.get("CONVERSATION_TTL", "86400"))
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "3000"))
+
+conversations = ConversationStore(CONVERSATION_MAX, CONVERSATION_MAX_MESSAGES, CONVERSATION_TTL)
+
+# Government schemes search, indexed once from the frontend's data file
+SCHEMES_PATH = os.environ.get("SCHEMES_PATH", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hack", "schemes.json"))
+SCHEMES_PAGE_SIZE = 20
+SCHEMES_MAX_PAGE_SIZE = 100
+
+schemes = SchemeCatalog(SCHEMES_PATH)
+
+# Origins whose pages may read the public catalog endpoints, comma-separated; "*" for any
+CORS_ORIGINS = [o.strip() for o in os.environ.get("CORS_ORIGINS", "*").split(",") if o.strip()]
+# Read-only endpoints the static frontends call, possibly from another origin
+CORS_PATHS = ("/schemes", "/ngos", "/i18n")
+
+# NGO directory, filtered with per-value bitsets instead of in the browser
+NGOS_PATH = os.environ.get("NGOS_PATH", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "ngo1", "frontend", "data", "ngos_by_state_2023.json"))
+NGOS_PAGE_SIZE = 20
+NGOS_MAX_PAGE_SIZE = 100
+NGOS_DEFAULT_RADIUS_KM = 25.0
+NGOS_MAX_RADIUS_KM = 3000.0
+
+# Per-page translation bundles for the hack frontend, from its i18n/<lang>.json files
+HACK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hack")
+I18N_PATH = os.environ.get("I18N_PATH", os.path.join(HACK_DIR, "i18n"))
+I18N_PAGES_PATH = os.environ.get("I18N_PAGES_PATH", HACK_DIR)
+
+translations = TranslationCatalog(I18N_PATH, I18N_PAGES_PATH)
+
+# Offline geocoding from the bundled city centroid table
+gazetteer = Gazetteer()
+ngos = NgoCatalog(NGOS_PATH, gazetteer)
+
+# Hashed, precompressed copies of the hack and ngo1 frontends' CSS and JSON, built with
+#   python -m common.assets backend/dist hack=hack ngo=ngo1/frontend
+ASSETS_DIR = os.environ.get("ASSETS_DIR", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "dist"))
+
+serve_assets(app, ASSETS_DIR)
+
+# /generate/batch limits
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "500"))
+BATCH_PARALLELISM = int(os.environ.get("BATCH_PARALLELISM", "8"))
+BATCH_MAX_PARALLELISM = int(os.environ.get("BATCH_MAX_PARALLELISM", "32"))
+
 @app.route("/")
 def home():
     return jsonify({"status": "Grok API Flask backend running"})
@@ -19,6 +225,32 @@ def generate():
     if not data or "prompt" not in data:
         return jsonify({"error": "Missing 'prompt' in request body"}), 400
 
+    model, payload, request_key, key = request_params(data)
+
+    if data.get("stream"):
+        cached = completions.get(key) if key else None
+        return stream_generate(model, payload, request_key, key, cached)
+
+    try:
+        output, model, cache_status = complete(payload, request_key, key)
+        response = jsonify({
+            "model": model,
+            "output": output
+        })
+        if cache_status:
+            response.headers["X-Cache"] = cache_status
+        return response
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def request_params(data):
+    """Return (model, upstream payload, coalescing key, cache key) for a /generate body
+
+    The cache key is None unless caching applies: by default only for
+    temperature 0, or as set by the body's ``cache`` field.
+    """
     prompt = data["prompt"]
     model = data.get("model", DEFAULT_MODEL)
     max_tokens = data.get("max_tokens", 500)
@@ -31,30 +263,402 @@ def generate():
         "temperature": temperature,
     }
 
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
+    try:
+        request_key = cache_key(model, prompt, max_tokens, temperature)
+    except (TypeError, ValueError):
+        request_key = None  # let upstream reject malformed parameters
+    key = request_key if data.get("cache", temperature == 0) else None
+    return model, payload, request_key, key
+
+
+def complete(payload, request_key=None, key=None):
+    """Blocking completion through the cache, in-flight coalescing and retry policy
+
+    Returns (cleaned output, model that answered, "HIT"/"MISS" or None when
+    not cacheable). Answers from a fallback model are not cached.
+    """
+    model = payload["model"]
+    cached = completions.get(key) if key else None
+    if cached is not None:
+        return cached, model, "HIT"
+
+    def attempt(candidate):
+        with timed_upstream(upstream_seconds, candidate, "blocking"):
+            return upstream.post_json("/chat/completions", dict(payload, model=candidate))
+
+    def call():
+        result, used = resilience.call(model, attempt)
+        with clean_output_seconds.time():
+            output = clean_output(result["choices"][0]["message"]["content"])
+        if key and used == model:
+            completions.set(key, output)
+        return output, used
+
+    if request_key:
+        (output, used), _ = inflight.call(request_key, call)
+    else:
+        output, used = call()
+    return output, used, "MISS" if key else None
+
+
+@app.route("/generate/batch", methods=["POST"])
+def generate_batch():
+    """Run many completions concurrently
 
+    Body: ``{"items": [{"prompt": ..., "model": ..., ...}, ...]}`` with optional
+    ``defaults`` merged into every item, ``parallelism`` and ``stream``.
+    Results come back in item order, each either ``{"model", "output"}`` or
+    ``{"error"}``. With ``stream`` they are sent as NDJSON lines, tagged with
+    their ``index``, as soon as each one completes.
+    """
+    data = request.get_json(silent=True)
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Missing 'items' list in request body"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch"}), 400
+    defaults = data.get("defaults") or {}
+    if not isinstance(defaults, dict):
+        return jsonify({"error": "'defaults' must be an object"}), 400
     try:
-        res = requests.post(
-            f"{OPENROUTER_BASE}/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=30,
-        )
-        res.raise_for_status()
-        result = res.json()
+        parallelism = int(data.get("parallelism", BATCH_PARALLELISM))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'parallelism' must be an integer"}), 400
+    parallelism = max(1, min(parallelism, BATCH_MAX_PARALLELISM, len(items)))
+
+    def run(item):
+        if not isinstance(item, dict) or "prompt" not in item:
+            return {"error": "Missing 'prompt' in item"}
+        model, payload, request_key, key = request_params(dict(defaults, **item))
+        try:
+            output, model, _ = complete(payload, request_key, key)
+            return {"model": model, "output": output}
+        except Exception as e:
+            return {"error": str(e)}
+
+    pool = ThreadPoolExecutor(parallelism, thread_name_prefix="batch")
+    futures = {pool.submit(run, item): index for index, item in enumerate(items)}
+
+    if not data.get("stream"):
+        try:
+            results = [None] * len(items)
+            for future, index in futures.items():
+                results[index] = dict(future.result(), index=index)
+        finally:
+            pool.shutdown(wait=False)
+        return jsonify({"results": results})
+
+    def lines():
+        try:
+            for future in as_completed(futures):
+                yield json.dumps(dict(future.result(), index=futures[future])) + "\n"
+        finally:
+            # A disconnected client should not keep the remaining items running
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    return Response(lines(), mimetype="application/x-ndjson",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/conversations", methods=["POST"])
+def create_conversation():
+    data = request.get_json(silent=True) or {}
+    conversation = conversations.create(system=data.get("system"))
+    return jsonify(conversation.to_dict()), 201
+
+
+@app.route("/conversations/<conversation_id>", methods=["GET", "DELETE"])
+def conversation_detail(conversation_id):
+    if request.method == "DELETE":
+        if not conversations.delete(conversation_id):
+            return jsonify({"error": "Conversation not found"}), 404
+        return "", 204
+    conversation = conversations.get(conversation_id)
+    if conversation is None:
+        return jsonify({"error": "Conversation not found"}), 404
+    return jsonify(conversation.to_dict())
+
+
+@app.route("/conversations/<conversation_id>/messages", methods=["GET", "POST"])
+def conversation_messages(conversation_id):
+    """Add a user message to a conversation and return the assistant's reply
+
+    The conversation must come from ``POST /conversations``; unknown ids
+    are a 404, so history is only reachable through the unguessable id the
+    server issued. Only as much history as fits
+    ``context_tokens`` (default CONTEXT_TOKEN_BUDGET) is sent upstream, older
+    turns are replaced by a short summary.
+    """
+    if not CONVERSATION_ID_RE.match(conversation_id):
+        return jsonify({"error": "Invalid conversation id"}), 400
+    conversation = conversations.get(conversation_id)
+    if conversation is None:
+        return jsonify({"error": "Conversation not found"}), 404
+    if request.method == "GET":
+        return jsonify({"id": conversation_id, "messages": list(conversation.messages)})
+
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get("content"), str) or not data["content"].strip():
+        return jsonify({"error": "Missing 'content' in request body"}), 400
+    try:
+        budget = int(data.get("context_tokens", CONTEXT_TOKEN_BUDGET))
+    except (TypeError, ValueError):
+        return jsonify({"error": "'context_tokens' must be an integer"}), 400
+
+    # One turn at a time per conversation, so replies stay in order
+    with conversation.lock:
+        message = {"role": "user", "content": data["content"]}
+        messages, context = build_context(conversation, budget, pending=message)
+        payload = {
+            "model": data.get("model", DEFAULT_MODEL),
+            "messages": messages,
+            "max_tokens": data.get("max_tokens", 500),
+            "temperature": data.get("temperature", 0.7),
+        }
+        try:
+            output, model, _ = complete(payload)
+        except Exception as e:
+            # The unanswered message never enters the history
+            return jsonify({"error": str(e)}), 500
+        conversations.append(conversation, "user", message["content"])
+        conversations.append(conversation, "assistant", output)
+
+    return jsonify({"id": conversation_id, "model": model, "output": output, "context": context})
+
+
+@app.after_request
+def allow_cross_origin(response):
+    """CORS headers on the public catalog endpoints, so the static pages can call them"""
+    path = request.path
+    if not any(path == prefix or path.startswith(prefix + "/") for prefix in CORS_PATHS):
+        return response
+    if "*" in CORS_ORIGINS:
+        response.headers["Access-Control-Allow-Origin"] = "*"
+    else:
+        response.vary.add("Origin")
+        origin = request.headers.get("Origin")
+        if origin in CORS_ORIGINS:
+            response.headers["Access-Control-Allow-Origin"] = origin
+    return response
+
+
+def cacheable(payload):
+    """JSON response with an ETag, answered with 304 when the client has it"""
+    response = jsonify(payload)
+    response.add_etag()
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return response.make_conditional(request)
+
+
+@app.route("/schemes")
+def search_schemes():
+    """Ranked, paginated scheme search with facet counts
+
+    Query parameters: ``q`` for text, one or more of category, target,
+    audience, source and state to filter (repeat or comma-separate values),
+    ``page``, ``page_size`` and ``full=1`` for complete records.
+    """
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        page_size = min(SCHEMES_MAX_PAGE_SIZE,
+                        max(0, int(request.args.get("page_size", SCHEMES_PAGE_SIZE))))
+    except ValueError:
+        return jsonify({"error": "'page' and 'page_size' must be integers"}), 400
+    filters = {}
+    for field in FACETS:
+        values = [v.strip() for arg in request.args.getlist(field) for v in arg.split(",")]
+        if any(values):
+            filters[field] = [v for v in values if v]
+    try:
+        index = schemes.index()
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"Schemes unavailable: {e}"}), 503
+    return cacheable(index.search(request.args.get("q", ""), filters, page, page_size,
+                                  full=request.args.get("full") == "1"))
+
+
+@app.route("/schemes/summary")
+def schemes_summary():
+    try:
+        return cacheable(schemes.index().summary())
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"Schemes unavailable: {e}"}), 503
 
-        message = result["choices"][0]["message"]["content"]
-        return jsonify({
-            "model": model,
-            "output": clean_output(message)
-        })
 
+@app.route("/schemes/<scheme_id>")
+def scheme_detail(scheme_id):
+    try:
+        scheme = schemes.index().get(scheme_id)
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"Schemes unavailable: {e}"}), 503
+    if scheme is None:
+        return jsonify({"error": "Scheme not found"}), 404
+    return cacheable(scheme)
+
+
+@app.route("/ngos")
+def search_ngos():
+    """Filtered, sorted page of NGOs with facet counts
+
+    Query parameters: ``q`` for text, one or more of state, services and
+    genderFocus to filter (repeat or comma-separate values), ``safeSpace=1``,
+    ``sort`` (name, location, state, services or distance), ``page`` and
+    ``page_size``. ``lat`` and ``lon``, or a place name in ``near``, limit
+    results to ``radius_km`` (default 25) and sort them by distance.
+    """
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        page_size = min(NGOS_MAX_PAGE_SIZE,
+                        max(0, int(request.args.get("page_size", NGOS_PAGE_SIZE))))
+    except ValueError:
+        return jsonify({"error": "'page' and 'page_size' must be integers"}), 400
+    near = None
+    if "lat" in request.args or "lon" in request.args or "near" in request.args:
+        try:
+            radius = float(request.args.get("radius_km", NGOS_DEFAULT_RADIUS_KM))
+            if "near" in request.args:
+                point = gazetteer.geocode(request.args["near"])
+                if point is None:
+                    return jsonify({"error": f"Unknown place: {request.args['near']}"}), 400
+                lat, lon = point[:2]
+            else:
+                lat, lon = float(request.args["lat"]), float(request.args["lon"])
+        except (KeyError, ValueError):
+            return jsonify({"error": "'lat', 'lon' and 'radius_km' must be numbers"}), 400
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 0 <= radius <= NGOS_MAX_RADIUS_KM):
+            return jsonify({"error": "Coordinates or radius out of range"}), 400
+        near = (lat, lon, radius)
+    sort = request.args.get("sort", "distance" if near else "name")
+    if sort not in NGO_SORTS:
+        return jsonify({"error": f"'sort' must be one of {', '.join(NGO_SORTS)}"}), 400
+    filters = {}
+    for field in NGO_FACETS:
+        values = [v.strip() for arg in request.args.getlist(field) for v in arg.split(",")]
+        if any(values):
+            filters[field] = [v for v in values if v]
+    if "safeSpace" in filters:
+        filters["safeSpace"] = [v.lower() in ("1", "true", "yes") for v in filters["safeSpace"]]
+    try:
+        index = ngos.index()
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"NGO directory unavailable: {e}"}), 503
+    return cacheable(index.search(request.args.get("q", ""), filters, page, page_size, sort,
+                                  near))
+
+
+@app.route("/ngos/<ngo_id>")
+def ngo_detail(ngo_id):
+    try:
+        ngo = ngos.index().get(ngo_id)
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"NGO directory unavailable: {e}"}), 503
+    if ngo is None:
+        return jsonify({"error": "NGO not found"}), 404
+    return cacheable(ngo)
+
+
+@app.route("/i18n")
+def translation_pages():
+    try:
+        index = translations.index()
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"Translations unavailable: {e}"}), 503
+    return cacheable({"pages": index.pages, "languages": index.languages,
+                      "default": index.default})
+
+
+@app.route("/i18n/<page>/<lang>")
+def translation_bundle(page, lang):
+    """Translations of the keys one page uses, missing ones filled from English"""
+    try:
+        bundle = translations.index().bundle(page, lang)
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"Translations unavailable: {e}"}), 503
+    if bundle is None:
+        return jsonify({"error": "Page not found"}), 404
+    body, etag = bundle
+    response = Response(body, content_type="application/json; charset=utf-8")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return response.make_conditional(request)
+
+
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(completions.stats())
+
+
+@app.route("/upstream/stats")
+def upstream_stats():
+    return jsonify(resilience.stats())
+
+
+def sse(data, event=None):
+    """Format one server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def stream_generate(model, payload, request_key=None, key=None, cached=None):
+    """Relay upstream completion chunks to the client as server-sent events
+
+    Each event carries the next piece of cleaned output, so the joined pieces
+    equal what the blocking path returns. Errors before the first byte are
+    plain JSON 500s; errors mid-stream arrive as an ``error`` event. A cached
+    completion is sent as a single event; a completed stream is cached under
+    ``key``. Concurrent streams with the same ``request_key`` share one
+    upstream stream.
+    """
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if key:
+        headers["X-Cache"] = "HIT" if cached is not None else "MISS"
+    if cached is not None:
+        events = [sse({"output": cached})] if cached else []
+        events.append(sse({"model": model}, event="done"))
+        return Response(events, mimetype="text/event-stream", headers=headers)
+
+    def attempt(candidate):
+        # Only the time to open the stream, the rest depends on the generation length
+        with timed_upstream(upstream_seconds, candidate, "stream"):
+            return upstream.stream_events("/chat/completions",
+                                          dict(payload, model=candidate, stream=True))
+
+    def open_stream():
+        # Retries and fallbacks only cover opening the stream, not hedging
+        events, used = resilience.call(model, attempt, hedge=False)
+        return ((used, event) for event in events)
+
+    try:
+        if request_key:
+            events, _ = inflight.stream(request_key, open_stream)
+            events.wait_started()
+        else:
+            events = open_stream()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    def relay():
+        cleaner = StreamCleaner()
+        pieces = []
+        try:
+            used = model
+            for used, event in events:
+                choices = event.get("choices") or [{}]
+                piece = cleaner.feed(choices[0].get("delta", {}).get("content") or "")
+                if piece:
+                    pieces.append(piece)
+                    yield sse({"output": piece})
+            cleaner.finish()
+        except Exception as e:
+            yield sse({"error": str(e)}, event="error")
+            return
+        if key and used == model:
+            completions.set(key, "".join(pieces))
+        yield sse({"model": used}, event="done")
+
+    return Response(stream_with_context(relay()), mimetype="text/event-stream",
+                    headers=headers)
+
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,111 @@
+import csv
+import math
+import os
+import re
+from collections import defaultdict
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+CENTROIDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data",
+                              "city_centroids.csv")
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _normalize(name):
+    return " ".join(re.findall(r"\w+", (name or "").lower()))
+
+
+class Gazetteer:
+    """Offline geocoder over a ``city,state,lat,lon`` centroid table
+
+    Rows with an empty city are state centroids, used when no part of a
+    location names a known city.
+    """
+
+    def __init__(self, path=CENTROIDS_PATH):
+        self.cities = {}
+        self.by_name = defaultdict(list)
+        self.states = {}
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                point = (float(row["lat"]), float(row["lon"]))
+                state = _normalize(row["state"])
+                if row["city"]:
+                    city = _normalize(row["city"])
+                    self.cities[(city, state)] = point
+                    self.by_name[city].append(point)
+                else:
+                    self.states[state] = point
+
+    def geocode(self, location, state=None):
+        """``(lat, lon, precision)`` for a free-text location, or None
+
+        ``location`` is read like "Visakhapatnam, Andhra Pradesh, India";
+        each comma (or "&") separated part is tried in order. ``precision``
+        is "city" or "state".
+        """
+        parts = [_normalize(p) for part in (location or "").split(",") for p in part.split("&")]
+        parts = [p for p in parts if p and p != "india"]
+        state = _normalize(state)
+        if not state:
+            state = next((p for p in reversed(parts) if p in self.states), "")
+        for part in parts:
+            point = self.cities.get((part, state))
+            if point is None and len(self.by_name.get(part, ())) == 1 and not state:
+                point = self.by_name[part][0]
+            if point is not None:
+                return point + ("city",)
+        if state in self.states:
+            return self.states[state] + ("state",)
+        return None
+
+
+class GridIndex:
+    """Points bucketed into ``cell`` degree squares for radius queries
+
+    A query only measures the points in cells overlapping the circle's
+    bounding box, so its cost follows the number of nearby points rather than
+    the size of the directory.
+    """
+
+    def __init__(self, points, cell=0.5):
+        self.cell = cell
+        self.cells = defaultdict(list)
+        for lat, lon, key in points:
+            self.cells[self._cell(lat, lon)].append((lat, lon, key))
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell)), int(math.floor(lon / self.cell))
+
+    def within(self, lat, lon, radius_km):
+        """``[(distance_km, key), ...]`` for points within ``radius_km``, nearest first"""
+        dlat = radius_km / KM_PER_DEGREE
+        widest = abs(lat) + dlat
+        if widest >= 90:
+            dlon = 180.0
+        else:
+            dlon = min(180.0, radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest))))
+        row0, col0 = self._cell(lat - dlat, lon - dlon)
+        row1, col1 = self._cell(lat + dlat, lon + dlon)
+
+        if (row1 - row0 + 1) * (col1 - col0 + 1) > len(self.cells):
+            candidates = list(self.cells.values())
+        else:
+            candidates = [self.cells[(row, col)]
+                          for row in range(row0, row1 + 1) for col in range(col0, col1 + 1)
+                          if (row, col) in self.cells]
+        hits = []
+        for bucket in candidates:
+            for plat, plon, key in bucket:
+                distance = haversine_km(lat, lon, plat, plon)
+                if distance <= radius_km:
+                    hits.append((distance, key))
+        hits.sort()
+        return hits
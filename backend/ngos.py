@@ -0,0 +1,232 @@
+import json
+import os
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from geo import GridIndex
+
+# Facets held as bitsets: bit ``doc`` of a value's int is set when NGO ``doc`` has it
+FACETS = ("state", "services", "genderFocus", "safeSpace")
+
+# Fields searched by the ``q`` parameter
+TEXT_FIELDS = ("name", "description", "location", "services")
+
+SORTS = ("name", "location", "state", "services", "distance")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def flatten(data):
+    """NGOs of a ``{"ngos": ...}`` file, whose ``ngos`` is a list or a dict of lists by state"""
+    ngos = data.get("ngos", data) if isinstance(data, dict) else data
+    if isinstance(ngos, list):
+        return list(ngos)
+    return [dict(ngo, state=ngo.get("state") or state)
+            for state, items in ngos.items() for ngo in items]
+
+
+# Bit positions set in each byte value, for walking a bitset a byte at a time
+_BYTE_BITS = [tuple(i for i in range(8) if b >> i & 1) for b in range(256)]
+
+
+def members(mask):
+    """Positions of the set bits of ``mask``, ascending, in one pass over its bytes"""
+    docs = []
+    for index, byte in enumerate(mask.to_bytes((mask.bit_length() + 7) // 8, "little")):
+        if byte:
+            base = index * 8
+            docs.extend(base + bit for bit in _BYTE_BITS[byte])
+    return docs
+
+
+def bitset(docs, size):
+    """Bitset with the bits in ``docs`` set, built in one pass"""
+    data = bytearray((size + 7) // 8)
+    for doc in docs:
+        data[doc >> 3] |= 1 << (doc & 7)
+    return int.from_bytes(data, "little")
+
+
+def _values(ngo, field):
+    value = ngo.get(field)
+    if isinstance(value, list):
+        return value
+    if field == "safeSpace":
+        return [bool(value)]
+    return [value] if value else []
+
+
+class NgoIndex:
+    """Per-value bitsets over a list of NGOs
+
+    Filters OR the bitsets of the values chosen within a facet and AND the
+    facets together, like the directory page's checkboxes. Facet counts are
+    disjunctive, so each option shows how many NGOs choosing it would give.
+    """
+
+    def __init__(self, ngos, gazetteer=None):
+        self.ngos = ngos
+        # Locations resolved offline to centroids, bucketed for radius queries
+        points = []
+        if gazetteer is not None:
+            for doc, ngo in enumerate(ngos):
+                point = gazetteer.geocode(ngo.get("location"), ngo.get("state"))
+                if point is not None:
+                    lat, lon, precision = point
+                    ngo["coordinates"] = {"lat": lat, "lon": lon, "precision": precision}
+                    points.append((lat, lon, doc))
+        self.grid = GridIndex(points)
+        self.all = (1 << len(ngos)) - 1
+        self.by_id = {}
+        self.facets = {field: defaultdict(int) for field in FACETS}
+        self.tokens = defaultdict(int)
+        for doc, ngo in enumerate(ngos):
+            bit = 1 << doc
+            self.by_id.setdefault(str(ngo.get("id", doc)), doc)
+            for field in FACETS:
+                for value in _values(ngo, field):
+                    self.facets[field][value] |= bit
+            for field in TEXT_FIELDS:
+                value = ngo.get(field) or ""
+                if isinstance(value, list):
+                    value = " ".join(map(str, value))
+                for token in tokenize(str(value)):
+                    self.tokens[token] |= bit
+        self.vocabulary = sorted(self.tokens)
+
+        def order(key, reverse=False):
+            ranked = sorted(range(len(ngos)), key=lambda d: key(ngos[d]), reverse=reverse)
+            rank = [0] * len(ngos)
+            for position, doc in enumerate(ranked):
+                rank[doc] = position
+            return ranked, rank
+
+        # Every sort order, as the NGOs in order and each NGO's position in it
+        self.orders = {
+            "name": order(lambda n: (n.get("name") or "").lower()),
+            "location": order(lambda n: (n.get("location") or "").lower()),
+            "state": order(lambda n: (n.get("state") or "").lower()),
+            "services": order(lambda n: len(n.get("services") or ()), reverse=True),
+        }
+
+    def _page(self, mask, total, sort, start, stop):
+        """Positions ``start:stop`` of the NGOs in ``mask`` under a precomputed sort order"""
+        ranked, rank = self.orders.get(sort, self.orders["name"])
+        if total == len(ranked):
+            return ranked[start:stop]
+        # Walking the order finds a page of a broad match after about
+        # stop * n / total NGOs; ranking the matches costs about total
+        if stop * len(ranked) <= total * total:
+            bits = mask.to_bytes((len(ranked) + 7) // 8, "little")
+            page = []
+            for doc in ranked:
+                if bits[doc >> 3] >> (doc & 7) & 1:
+                    page.append(doc)
+                    if len(page) == stop:
+                        break
+            return page[start:]
+        return heapq.nsmallest(stop, members(mask), key=rank.__getitem__)[start:]
+
+    def _text(self, query):
+        """Bitset of NGOs with a word starting with every query term"""
+        mask = self.all
+        for token in tokenize(query):
+            start = bisect_left(self.vocabulary, token)
+            end = bisect_left(self.vocabulary, token + "\uffff")
+            matches = 0
+            for term in self.vocabulary[start:end]:
+                matches |= self.tokens[term]
+            mask &= matches
+            if not mask:
+                break
+        return mask
+
+    def _filtered(self, mask, filters, skip=None):
+        for field, values in filters.items():
+            if field == skip:
+                continue
+            allowed = 0
+            for value in values:
+                allowed |= self.facets[field].get(value, 0)
+            mask &= allowed
+        return mask
+
+    def search(self, query="", filters=None, page=1, page_size=20, sort="name", near=None):
+        """Filtered, sorted page of NGOs plus facet counts
+
+        ``filters`` maps a facet to a list of accepted values (any of them
+        matches). ``near`` is ``(lat, lon, radius_km)`` to keep only NGOs
+        within the radius; results then carry ``distance_km`` and can be
+        sorted by distance. Returns a dict with ``total``, ``results`` and
+        ``facets``.
+        """
+        filters = {f: v for f, v in (filters or {}).items() if f in FACETS and v}
+        matched = self._text(query) if query else self.all
+        distances = {}
+        if near is not None:
+            for distance, doc in self.grid.within(*near):
+                distances[doc] = distance
+            matched &= bitset(distances, len(self.ngos))
+        elif sort == "distance":
+            sort = "name"
+        mask = self._filtered(matched, filters)
+
+        total = mask.bit_count()
+        start = (page - 1) * page_size
+        results = []
+        if page_size and start < total:
+            stop = min(start + page_size, total)
+            if sort == "distance":
+                docs = heapq.nsmallest(stop, members(mask), key=lambda d: (distances[d], d))
+                docs = docs[start:]
+            else:
+                docs = self._page(mask, total, sort, start, stop)
+            for doc in docs:
+                ngo = self.ngos[doc]
+                if near is not None:
+                    ngo = dict(ngo, distance_km=round(distances[doc], 2))
+                results.append(ngo)
+
+        facets = {}
+        for field in FACETS:
+            base = self._filtered(matched, filters, skip=field)
+            counts = [[value, (base & bits).bit_count()]
+                      for value, bits in self.facets[field].items()]
+            facets[field] = sorted((item for item in counts if item[1]),
+                                   key=lambda item: (-item[1], str(item[0])))
+
+        return {"total": total, "page": page, "page_size": page_size,
+                "sort": sort if sort in SORTS else "name",
+                "results": results, "facets": facets}
+
+    def get(self, ngo_id):
+        doc = self.by_id.get(ngo_id)
+        return None if doc is None else self.ngos[doc]
+
+
+class NgoCatalog:
+    """Loads the NGO directory file once and rebuilds the index only when it changes"""
+
+    def __init__(self, path, gazetteer=None):
+        self.path = path
+        self.gazetteer = gazetteer
+        self._lock = threading.Lock()
+        self._signature = None
+        self._index = None
+
+    def index(self):
+        st = os.stat(self.path)
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if signature != self._signature:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._index = NgoIndex(flatten(json.load(f)), self.gazetteer)
+                self._signature = signature
+            return self._index
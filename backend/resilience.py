@@ -0,0 +1,347 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from client import UpstreamError, UpstreamTimeout
+
+
+class CircuitOpen(UpstreamError):
+    """Every candidate model's breaker is open, nothing was sent upstream"""
+
+    def __init__(self, models):
+        super().__init__(f"Upstream unavailable for {', '.join(models)}", 503)
+
+
+def is_retryable(error):
+    """Timeouts, connection failures, 429 and 5xx are worth another attempt"""
+    if isinstance(error, UpstreamTimeout):
+        return True
+    if isinstance(error, UpstreamError):
+        return error.status is None or error.status == 429 or error.status >= 500
+    return False
+
+
+class LatencyTracker:
+    """Recent successful call latencies, for picking the hedge delay"""
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q):
+        """Latency at quantile ``q``, or None until there are enough samples"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Closed, open after ``failure_threshold`` consecutive failures, half-open after ``reset_timeout``
+
+    While half-open a single probe call is let through; its outcome closes
+    the breaker again or re-opens it for another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_neutral(self):
+        """The call failed for reasons unrelated to the upstream, end any probe"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class ResilientCaller:
+    """Retries, hedging, per-model circuit breakers and a model fallback chain
+
+    ``call(model, fn)`` runs ``fn(model)`` and returns ``(result, model used)``.
+    Each model is tried up to ``retries + 1`` times with full-jitter exponential
+    backoff before falling through to the next model in ``fallbacks``; models
+    whose breaker is open are skipped. With ``hedge`` a second, identical
+    attempt is started when the first has not finished after the model's
+    ``hedge_quantile`` latency, counted from when the first attempt began.
+    Nothing is retried once ``deadline`` seconds have passed.
+
+    The caller returns whichever attempt succeeds first. Blocking hedgeable
+    calls run their first attempt on a pool of ``attempt_workers`` threads
+    and hedges on ``hedge_workers`` more; when either is full the call runs
+    on the calling thread or goes unhedged, so nothing queues behind real
+    calls. A losing thread cannot be stopped and finishes in the background;
+    a losing async attempt is cancelled.
+    """
+
+    def __init__(self, fallbacks=(), retries=2, backoff_base=0.25, backoff_max=4.0,
+                 failure_threshold=5, reset_timeout=30.0, hedge=True, hedge_quantile=0.95,
+                 hedge_min_delay=0.5, deadline=60.0, hedge_workers=4, attempt_workers=64):
+        self.fallbacks = list(fallbacks)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.deadline = deadline
+        self.hedge_workers = hedge_workers
+        self.attempt_workers = attempt_workers
+        self._breakers = {}
+        self._latency = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._attempt_slots = threading.BoundedSemaphore(attempt_workers)
+        self._hedge_slots = threading.BoundedSemaphore(hedge_workers)
+        self._stats = {"calls": 0, "retries": 0, "fallbacks": 0, "hedges": 0,
+                       "hedge_wins": 0, "hedges_skipped": 0, "short_circuits": 0,
+                       "failures": 0}
+
+    def breaker(self, model):
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[model]
+
+    def _tracker(self, model):
+        with self._lock:
+            if model not in self._latency:
+                self._latency[model] = LatencyTracker()
+            return self._latency[model]
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def candidates(self, model):
+        """The requested model followed by the fallbacks, without repeats"""
+        return list(dict.fromkeys([model] + self.fallbacks))
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def hedge_delay(self, model):
+        delay = self._tracker(model).quantile(self.hedge_quantile)
+        return None if delay is None else max(delay, self.hedge_min_delay)
+
+    def _attempts(self, model, start):
+        """Yield (model, seconds to back off first) for each attempt to make
+
+        The caller reports each outcome with ``send``: None for success ends the
+        schedule, a retryable exception moves on to the next attempt and any
+        other exception is raised. Raises the last error once attempts, models
+        or the deadline run out.
+        """
+        last_error = None
+        for index, candidate in enumerate(self.candidates(model)):
+            for attempt in range(self.retries + 1):
+                if time.monotonic() - start > self.deadline:
+                    break
+                breaker = self.breaker(candidate)
+                if not breaker.allow():
+                    self._count("short_circuits")
+                    break
+                if attempt:
+                    self._count("retries")
+                elif index:
+                    self._count("fallbacks")
+                error = yield candidate, self.backoff(attempt - 1) if attempt else 0
+                if error is None:
+                    breaker.record_success()
+                    return
+                if not isinstance(error, UpstreamError):
+                    breaker.record_neutral()
+                    raise error
+                if not is_retryable(error):
+                    # The model answered, the request itself was refused
+                    breaker.record_success()
+                    raise error
+                last_error = error
+                breaker.record_failure()
+        self._count("failures")
+        raise last_error or CircuitOpen(self.candidates(model))
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # One thread per slot, so a submitted attempt never waits in a queue
+                self._pool = ThreadPoolExecutor(self.attempt_workers + self.hedge_workers,
+                                                thread_name_prefix="attempt")
+            return self._pool
+
+    def _timed(self, fn, model):
+        start = time.monotonic()
+        result = fn(model)
+        self._tracker(model).record(time.monotonic() - start)
+        return result
+
+    def _submit(self, slots, fn, model):
+        """Start ``fn(model)`` on the pool if ``slots`` has room, else return None"""
+        if not slots.acquire(blocking=False):
+            return None
+
+        def run():
+            try:
+                return self._timed(fn, model)
+            finally:
+                slots.release()
+
+        return self._executor().submit(run)
+
+    def _hedged(self, fn, model):
+        delay = self.hedge_delay(model) if self.hedge else None
+        if delay is None:
+            return self._timed(fn, model)
+        first = self._submit(self._attempt_slots, fn, model)
+        if first is None:
+            self._count("hedges_skipped")
+            return self._timed(fn, model)
+        if wait([first], timeout=delay).done:
+            return first.result()
+        second = self._submit(self._hedge_slots, fn, model)
+        if second is None:
+            self._count("hedges_skipped")
+            return first.result()
+        self._count("hedges")
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # If both finished together, prefer the first attempt's answer
+            for future in sorted(done, key=lambda f: f is second):
+                if future.exception() is None:
+                    if future is second:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, model, fn, hedge=True):
+        """Run ``fn(model)`` under the policy; returns (result, model that answered)"""
+        self._count("calls")
+        schedule = self._attempts(model, time.monotonic())
+        candidate, pause = next(schedule)
+        while True:
+            time.sleep(pause)
+            try:
+                result = self._hedged(fn, candidate) if hedge else fn(candidate)
+            except Exception as e:
+                candidate, pause = schedule.send(e)
+                continue
+            try:
+                schedule.send(None)
+            except StopIteration:
+                pass
+            return result, candidate
+
+    async def _ahedged(self, fn, model):
+        async def timed():
+            start = time.monotonic()
+            result = await fn(model)
+            self._tracker(model).record(time.monotonic() - start)
+            return result
+
+        delay = self.hedge_delay(model) if self.hedge else None
+        if delay is None:
+            return await timed()
+        first = asyncio.ensure_future(timed())
+        done, _ = await asyncio.wait([first], timeout=delay)
+        if done:
+            return first.result()
+        self._count("hedges")
+        second = asyncio.ensure_future(timed())
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Unlike threads, the losing attempt can be cancelled
+            for task in pending:
+                task.cancel()
+
+    async def acall(self, model, fn, hedge=True):
+        """Async ``call``: ``fn(model)`` returns an awaitable"""
+        self._count("calls")
+        schedule = self._attempts(model, time.monotonic())
+        candidate, pause = next(schedule)
+        while True:
+            await asyncio.sleep(pause)
+            try:
+                result = await (self._ahedged(fn, candidate) if hedge else fn(candidate))
+            except Exception as e:
+                candidate, pause = schedule.send(e)
+                continue
+            try:
+                schedule.send(None)
+            except StopIteration:
+                pass
+            return result, candidate
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            breakers = dict(self._breakers)
+            latency = dict(self._latency)
+        stats["models"] = {
+            model: {"breaker": breakers[model].state if model in breakers else "closed",
+                    "p50": latency[model].quantile(0.5) if model in latency else None,
+                    "p95": latency[model].quantile(0.95) if model in latency else None}
+            for model in set(breakers) | set(latency)
+        }
+        return stats
@@ -0,0 +1,199 @@
+import json
+import math
+import os
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+FACETS = ("category", "target", "audience", "source", "state")
+
+# Relative weight of a term match in each searchable field
+FIELD_WEIGHTS = {"name": 3.0, "benefits": 1.5, "description": 1.0, "eligibility": 1.0}
+
+# Fields returned in search results; the full record is at /schemes/<id>
+SUMMARY_FIELDS = ("id", "name", "department", "category", "categoryIcon", "target",
+                  "audience", "source", "state", "description", "officialWebsite")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the to with".split())
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def flatten(data):
+    """Schemes of the ``{"central": [...], "states": {state: [...]}}`` file as one list
+
+    Each scheme gets its ``state`` (None for central schemes) and a stable
+    ``id`` slug.
+    """
+    schemes = [dict(s, state=None) for s in data.get("central", [])]
+    for state, items in data.get("states", {}).items():
+        schemes.extend(dict(s, state=state) for s in items)
+    seen = Counter()
+    for scheme in schemes:
+        base = _slug(f"{scheme['state'] or 'central'} {scheme.get('name', '')}")
+        seen[base] += 1
+        scheme["id"] = base if seen[base] == 1 else f"{base}-{seen[base]}"
+    return schemes
+
+
+class SchemeIndex:
+    """Inverted full-text index and facet postings over a list of schemes
+
+    Text matches are ranked with BM25 over the weighted fields in
+    FIELD_WEIGHTS; the last query term also matches as a prefix so results
+    update while typing. Facet counts are disjunctive: the counts for one
+    facet ignore that facet's own filter, so every option shows how many
+    results choosing it would give.
+    """
+
+    def __init__(self, schemes):
+        self.schemes = schemes
+        self.by_id = {s["id"]: i for i, s in enumerate(schemes)}
+        self.postings = defaultdict(dict)
+        self.lengths = []
+        for doc, scheme in enumerate(schemes):
+            frequencies = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                value = scheme.get(field) or ""
+                if isinstance(value, list):
+                    value = " ".join(map(str, value))
+                for token in tokenize(str(value)):
+                    frequencies[token] += weight
+            for token, frequency in frequencies.items():
+                self.postings[token][doc] = frequency
+            self.lengths.append(sum(frequencies.values()))
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        self.vocabulary = sorted(self.postings)
+
+        self.facets = {field: defaultdict(set) for field in FACETS}
+        for doc, scheme in enumerate(schemes):
+            for field in FACETS:
+                value = scheme.get(field)
+                if value:
+                    self.facets[field][value].add(doc)
+
+    def _expand(self, token):
+        """Vocabulary terms starting with ``token``"""
+        start = bisect_left(self.vocabulary, token)
+        end = bisect_left(self.vocabulary, token + "\uffff")
+        return self.vocabulary[start:end]
+
+    def _scores(self, query):
+        """Return {doc: score} for documents matching every query term, or None for no query"""
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        total = len(self.schemes)
+        scores = None
+        for position, token in enumerate(tokens):
+            terms = [token]
+            if position == len(tokens) - 1:
+                terms = self._expand(token) or terms
+            term_scores = defaultdict(float)
+            for term in terms:
+                postings = self.postings.get(term, {})
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                # Prefix expansions count for less than the exact term
+                boost = 1.0 if term == token else 0.5
+                for doc, frequency in postings.items():
+                    norm = K1 * (1 - B + B * self.lengths[doc] / self.average_length)
+                    term_scores[doc] += boost * idf * frequency * (K1 + 1) / (frequency + norm)
+            if scores is None:
+                scores = dict(term_scores)
+            else:
+                scores = {doc: score + term_scores[doc]
+                          for doc, score in scores.items() if doc in term_scores}
+            if not scores:
+                return {}
+        return scores
+
+    def _filtered(self, docs, filters, skip=None):
+        for field, values in filters.items():
+            if field == skip or not values:
+                continue
+            allowed = set().union(*(self.facets[field].get(v, ()) for v in values))
+            docs = docs & allowed
+        return docs
+
+    def search(self, query="", filters=None, page=1, page_size=20, full=False):
+        """Ranked, filtered page of schemes plus facet counts
+
+        ``filters`` maps a facet to a list of accepted values (any of them
+        matches). Returns a dict with ``total``, ``results`` and ``facets``.
+        """
+        filters = {f: v for f, v in (filters or {}).items() if f in FACETS and v}
+        scores = self._scores(query)
+        matched = set(range(len(self.schemes))) if scores is None else set(scores)
+
+        docs = self._filtered(matched, filters)
+        if scores is None:
+            ranked = sorted(docs)
+        else:
+            ranked = sorted(docs, key=lambda d: (-scores[d], d))
+
+        start = (page - 1) * page_size
+        results = []
+        for doc in ranked[start:start + page_size]:
+            scheme = self.schemes[doc]
+            item = dict(scheme) if full else {f: scheme.get(f) for f in SUMMARY_FIELDS}
+            if scores is not None:
+                item["score"] = round(scores[doc], 4)
+            results.append(item)
+
+        facets = {}
+        for field in FACETS:
+            base = self._filtered(matched, filters, skip=field)
+            counts = {value: len(base & members) for value, members in self.facets[field].items()}
+            facets[field] = sorted(([v, n] for v, n in counts.items() if n),
+                                   key=lambda item: (-item[1], item[0]))
+
+        return {"total": len(ranked), "page": page, "page_size": page_size,
+                "results": results, "facets": facets}
+
+    def get(self, scheme_id):
+        doc = self.by_id.get(scheme_id)
+        return None if doc is None else self.schemes[doc]
+
+    def summary(self):
+        """Counts for dashboards that only need totals"""
+        return {
+            "total": len(self.schemes),
+            "central": sum(1 for s in self.schemes if s["state"] is None),
+            "states": len(self.facets["state"]),
+            "by_category": {v: len(d) for v, d in sorted(self.facets["category"].items())},
+        }
+
+
+class SchemeCatalog:
+    """Loads schemes.json once and rebuilds the index only when the file changes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._index = None
+
+    def index(self):
+        st = os.stat(self.path)
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if signature != self._signature:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._index = SchemeIndex(flatten(json.load(f)))
+                self._signature = signature
+            return self._index
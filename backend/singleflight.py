@@ -0,0 +1,117 @@
+import threading
+from concurrent.futures import Future
+
+
+class SharedStream:
+    """Items of one upstream stream, replayed to every subscriber
+
+    A background thread drains the source into a buffer; each iteration over
+    the stream starts from the first item, so late subscribers catch up before
+    following live. A failure of the source is raised to every subscriber.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._items = []
+        self._started = False
+        self._done = False
+        self._error = None
+
+    def _run(self, open_source, on_done):
+        try:
+            source = open_source()
+            with self._cond:
+                self._started = True
+                self._cond.notify_all()
+            for item in source:
+                with self._cond:
+                    self._items.append(item)
+                    self._cond.notify_all()
+        except Exception as e:
+            with self._cond:
+                self._error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+            on_done()
+
+    def wait_started(self):
+        """Block until the source is open, re-raising the error if it failed to open"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._started or self._done)
+            if not self._started:
+                raise self._error
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: index < len(self._items) or self._done)
+                if index >= len(self._items):
+                    if self._error is not None:
+                        raise self._error
+                    return
+                item = self._items[index]
+            index += 1
+            yield item
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls onto one execution
+
+    The first caller for a key runs the work; callers arriving while it is in
+    flight wait for and share its outcome, result or exception. Once the call
+    finishes the key is forgotten, so later callers start a fresh one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self._stats = {"leaders": 0, "shared": 0}
+
+    def call(self, key, fn):
+        """Return (result of ``fn()``, whether it was shared with an earlier caller)"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            self._stats["leaders" if leader else "shared"] += 1
+
+        if leader:
+            try:
+                future.set_result(fn())
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+        return future.result(), not leader
+
+    def stream(self, key, open_source):
+        """Return (SharedStream over ``open_source()``, whether it was shared)
+
+        ``open_source`` runs on a background thread so the upstream stream keeps
+        draining for the other subscribers if the first one disconnects.
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            leader = stream is None
+            if leader:
+                stream = self._streams[key] = SharedStream()
+            self._stats["leaders" if leader else "shared"] += 1
+
+        if leader:
+            def forget():
+                with self._lock:
+                    if self._streams.get(key) is stream:
+                        del self._streams[key]
+
+            threading.Thread(target=stream._run, args=(open_source, forget), daemon=True).start()
+        return stream, not leader
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls) + len(self._streams))
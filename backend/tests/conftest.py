@@ -0,0 +1,58 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(BACKEND_DIR))
+
+
+class FakeUpstream:
+    """Stands in for UpstreamClient, answering every call with ``reply``"""
+
+    def __init__(self, reply="Hello  there\nworld", chunks=None):
+        self.reply = reply
+        self.chunks = chunks or ["Hello ", " there", "\nwor", "ld"]
+        self.calls = []
+        self.error = None
+
+    def post_json(self, path, payload, total_timeout=None):
+        self.calls.append(payload)
+        if self.error is not None:
+            raise self.error
+        return {"choices": [{"message": {"content": self.reply}}]}
+
+    def stream_events(self, path, payload, total_timeout=None):
+        self.calls.append(payload)
+        if self.error is not None:
+            raise self.error
+        return iter([{"choices": [{"delta": {"content": chunk}}]} for chunk in self.chunks])
+
+
+@pytest.fixture(scope="session")
+def core():
+    return importlib.import_module("core")
+
+
+@pytest.fixture
+def upstream(core, monkeypatch):
+    """The Flask app's upstream replaced by a FakeUpstream, with fresh caches and policy"""
+    from cache import CompletionCache
+    from conversations import ConversationStore
+    from singleflight import SingleFlight
+
+    fake = FakeUpstream()
+    monkeypatch.setattr(core, "upstream", fake)
+    monkeypatch.setattr(core, "completions", CompletionCache())
+    monkeypatch.setattr(core, "inflight", SingleFlight())
+    monkeypatch.setattr(core, "conversations", ConversationStore())
+    monkeypatch.setattr(core, "resilience", core.resilient_caller())
+    monkeypatch.setattr(core.resilience, "backoff", lambda attempt: 0)
+    return fake
+
+
+@pytest.fixture
+def client(core, upstream):
+    return core.app.test_client()
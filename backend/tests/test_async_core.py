@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+from aiohttp.test_utils import TestClient, TestServer
+
+from async_core import AdmissionControl, Overloaded, create_app
+
+
+class FakeAsyncUpstream:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def post_json(self, path, payload):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"choices": [{"message": {"content": f"echo {payload['messages'][0]['content']}"}}]}
+
+    async def stream_events(self, path, payload):
+        self.calls += 1
+
+        async def events():
+            for piece in ("one ", " two"):
+                yield {"choices": [{"delta": {"content": piece}}]}
+        return events()
+
+
+def serve(test, delay=0.0, **limits):
+    """Run ``test(client, fake upstream)`` against a fresh async app"""
+    async def main():
+        app = create_app(**limits)
+        upstream = app["upstream"] = FakeAsyncUpstream(delay)
+        app["resilience"].hedge = False
+        async with TestClient(TestServer(app)) as client:
+            await test(client, upstream)
+    asyncio.run(main())
+
+
+def test_admission_rejects_beyond_queue():
+    async def main():
+        admission = AdmissionControl(limit=1, queue_size=1, queue_timeout=5)
+        release = await admission.hold()
+        waiter = asyncio.ensure_future(admission.hold())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as info:
+            await admission.hold()
+        assert info.value.status == 429 and info.value.retry_after >= 1
+        release()
+        (await waiter)()
+        assert admission.stats()["active"] == 0
+    asyncio.run(main())
+
+
+def test_admission_times_out_waiting():
+    async def main():
+        admission = AdmissionControl(limit=1, queue_size=5, queue_timeout=0.05)
+        await admission.hold()
+        with pytest.raises(Overloaded) as info:
+            await admission.hold()
+        assert info.value.status == 503 and admission.stats()["timed_out"] == 1
+    asyncio.run(main())
+
+
+def test_generate_and_stream():
+    async def test(client, upstream):
+        response = await client.post("/generate", json={"prompt": "hi"})
+        assert (await response.json())["output"] == "echo hi"
+        response = await client.post("/generate", json={"prompt": "hi", "stream": True})
+        body = await response.text()
+        assert 'data: {"output": "one"}' in body and "event: done" in body
+        assert (await client.post("/generate", json={})).status == 400
+    serve(test)
+
+
+def test_saturated_server_answers_429_with_retry_after():
+    async def test(client, upstream):
+        responses = await asyncio.gather(*[
+            client.post("/generate", json={"prompt": f"p{i}"}) for i in range(4)])
+        statuses = sorted(r.status for r in responses)
+        assert statuses == [200, 200, 429, 429]
+        rejected = next(r for r in responses if r.status == 429)
+        assert int(rejected.headers["Retry-After"]) >= 1
+    serve(test, delay=0.2, max_concurrency=1, max_queue=1, queue_timeout=5)
+
+
+def test_cache_counts_each_lookup_once():
+    async def test(client, upstream):
+        # The completion cache is shared with the Flask app, compare deltas
+        before = await (await client.get("/cache/stats")).json()
+        for _ in range(2):
+            await client.post("/generate", json={"prompt": "async cache", "temperature": 0})
+        after = await (await client.get("/cache/stats")).json()
+        assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (1, 1)
+        assert upstream.calls == 1
+    serve(test)
+
+
+def test_batch_runs_items_concurrently():
+    async def test(client, upstream):
+        response = await client.post("/generate/batch", json={
+            "items": [{"prompt": f"p{i}"} for i in range(5)] + ["bad"], "parallelism": 5})
+        results = (await response.json())["results"]
+        assert [r.get("output") for r in results[:5]] == [f"echo p{i}" for i in range(5)]
+        assert "error" in results[5] and [r["index"] for r in results] == list(range(6))
+    serve(test, delay=0.1)
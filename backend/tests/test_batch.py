@@ -0,0 +1,48 @@
+import json
+import threading
+import time
+
+
+def test_results_come_back_in_item_order(client, upstream):
+    response = client.post("/generate/batch", json={
+        "items": [{"prompt": "a"}, {"prompt": "b", "model": "other"}, {"nope": 1}],
+        "defaults": {"max_tokens": 50}})
+    results = response.get_json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[1]["model"] == "other" and "error" in results[2]
+    assert {c["max_tokens"] for c in upstream.calls} == {50}
+
+
+def test_items_run_concurrently(client, upstream):
+    reply = upstream.post_json
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow(path, payload, total_timeout=None):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.1)
+        with lock:
+            active[0] -= 1
+        return reply(path, payload, total_timeout)
+
+    upstream.post_json = slow
+    client.post("/generate/batch", json={"items": [{"prompt": str(i)} for i in range(8)],
+                                         "parallelism": 4})
+    assert peak[0] == 4
+
+
+def test_stream_sends_ndjson_lines(client, upstream):
+    response = client.post("/generate/batch", json={"items": [{"prompt": "a"}, {"prompt": "b"}],
+                                                    "stream": True})
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1]
+
+
+def test_invalid_batches_are_rejected(client, core):
+    for body in ({}, {"items": []}, {"items": [{"prompt": "a"}], "defaults": ["x"]},
+                 {"items": [{"prompt": "a"}], "parallelism": "many"},
+                 {"items": [{"prompt": "a"}] * (core.BATCH_MAX_ITEMS + 1)}):
+        assert client.post("/generate/batch", json=body).status_code == 400
@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from client import UpstreamClient, UpstreamError, UpstreamTimeout
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if self.path == '/json':
+            body = json.dumps({'echo': payload}).encode('utf-8')
+            status = 200
+        elif self.path == '/events':
+            body = b': keep-alive\n\ndata: {"n": 1}\n\ndata: {"n": 2}\n\ndata: [DONE]\n\n'
+            status = 200
+        else:
+            body, status = b'missing', 404
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def client(server):
+    client = UpstreamClient(server, http2=False)
+    yield client
+    client.close()
+
+
+def test_post_json(client):
+    assert client.post_json('/json', {'a': 1}) == {'echo': {'a': 1}}
+
+
+def test_error_status(client):
+    with pytest.raises(UpstreamError) as info:
+        client.post_json('/nope', {})
+    assert info.value.status == 404
+
+
+def test_stream_events(client):
+    assert list(client.stream_events('/events', {})) == [{'n': 1}, {'n': 2}]
+
+
+def test_connection_error_is_translated():
+    client = UpstreamClient('http://127.0.0.1:9', http2=False, connect_timeout=0.5)
+    with pytest.raises(UpstreamError):
+        client.post_json('/json', {})
+
+
+def test_deadline_after_response_closes_it(client, monkeypatch):
+    closed = []
+
+    class Response:
+        status_code = 200
+
+        def close(self):
+            closed.append(True)
+
+    class Session:
+        def post(self, *args, **kwargs):
+            return Response()
+
+    monkeypatch.setattr(client, '_session', Session)
+    with pytest.raises(UpstreamTimeout):
+        client._open('/json', {}, time.monotonic() - 1)
+    assert closed == [True]
+
+
+def test_deadline_after_response_exits_stream(client, monkeypatch):
+    exits = []
+
+    class Stream:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            exits.append(exc_info[0])
+
+    class Httpx:
+        def stream(self, *args, **kwargs):
+            return Stream()
+
+    monkeypatch.setattr(client, '_httpx', Httpx())
+    with pytest.raises(UpstreamTimeout):
+        client._open('/json', {}, time.monotonic() - 1)
+    assert exits == [UpstreamTimeout]
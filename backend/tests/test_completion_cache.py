@@ -0,0 +1,57 @@
+from cache import CompletionCache, cache_key
+
+
+def test_key_normalizes_whitespace_and_number_types():
+    assert cache_key("m", " hello   world ", 500, 0) == cache_key("m", "hello world", 500.0, 0.0)
+    assert cache_key("m", "hello", 500, 0) != cache_key("m", "hello", 500, 0.5)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = CompletionCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_miss():
+    cache = CompletionCache()
+    cache.set("a", 1, ttl=-1)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    CompletionCache(path=path).set("a", "answer")
+    restarted = CompletionCache(path=path)
+    assert restarted.get("a") == "answer"
+    assert restarted.get("a") == "answer"
+    stats = restarted.stats()
+    assert (stats["disk_hits"], stats["hits"]) == (1, 1)
+
+
+def test_temperature_zero_is_cached(client, upstream):
+    first = client.post("/generate", json={"prompt": "hi", "temperature": 0})
+    second = client.post("/generate", json={"prompt": " hi ", "temperature": 0})
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+    assert first.get_json() == second.get_json()
+    assert len(upstream.calls) == 1
+    stats = client.get("/cache/stats").get_json()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+
+def test_sampled_requests_bypass_cache_unless_asked(client, upstream):
+    client.post("/generate", json={"prompt": "hi"})
+    response = client.post("/generate", json={"prompt": "hi"})
+    assert "X-Cache" not in response.headers and len(upstream.calls) == 2
+    client.post("/generate", json={"prompt": "hi", "cache": True})
+    assert client.post("/generate", json={"prompt": "hi", "cache": True}).headers["X-Cache"] == "HIT"
+
+
+def test_completed_stream_is_cached(client, upstream):
+    client.post("/generate", json={"prompt": "hi", "temperature": 0, "stream": True}).get_data()
+    response = client.post("/generate", json={"prompt": "hi", "temperature": 0})
+    assert response.headers["X-Cache"] == "HIT" and len(upstream.calls) == 1
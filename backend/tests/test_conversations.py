@@ -0,0 +1,100 @@
+from conversations import SUMMARY_MAX_LINES, ConversationStore, build_context, message_tokens
+
+
+def filled(store, turns, words=40):
+    conversation = store.create(system="Be brief.")
+    for turn in range(turns):
+        store.append(conversation, "user" if turn % 2 == 0 else "assistant",
+                     f"turn {turn} " + "word " * words)
+    return conversation
+
+
+def test_context_fits_budget_and_keeps_latest():
+    store = ConversationStore()
+    conversation = filled(store, 30)
+    messages, stats = build_context(conversation, 400)
+    assert stats["tokens"] <= 400 and stats["summarized"] and stats["trimmed"] > 0
+    assert messages[0] == {"role": "system", "content": "Be brief."}
+    assert messages[-1] == conversation.messages[-1]
+    assert messages[1]["content"].startswith("Earlier in this conversation:")
+
+
+def test_short_conversation_is_sent_whole():
+    store = ConversationStore()
+    conversation = filled(store, 3, words=2)
+    messages, stats = build_context(conversation, 3000)
+    assert messages[1:] == conversation.messages
+    assert stats["trimmed"] == 0 and not stats["summarized"]
+    assert stats["tokens"] == sum(message_tokens(m) for m in messages)
+
+
+def test_history_and_summary_stay_bounded():
+    store = ConversationStore(max_messages=10)
+    conversation = filled(store, 5000, words=5)
+    assert len(conversation.messages) == 10
+    assert len(conversation.summary) == SUMMARY_MAX_LINES
+    assert conversation.to_dict()["summarized_turns"] == 4990
+    _, stats = build_context(conversation, 200)
+    assert stats["trimmed"] >= 4990 and stats["tokens"] <= 200
+
+
+def test_lru_eviction_and_ttl():
+    store = ConversationStore(max_conversations=2, ttl=60)
+    first = store.create("a")
+    store.create("b")
+    store.get("a")
+    store.create("c")
+    assert store.get("b") is None and store.get("a") is first
+    expired = ConversationStore(ttl=-1)
+    expired.create("x")
+    assert expired.get("x") is None
+
+
+def new_conversation(client):
+    response = client.post("/conversations", json={})
+    assert response.status_code == 201
+    return f"/conversations/{response.get_json()['id']}"
+
+
+def test_messages_route_keeps_history(client, upstream):
+    url = new_conversation(client)
+    first = client.post(f"{url}/messages", json={"content": "hello"}).get_json()
+    client.post(f"{url}/messages", json={"content": "again"})
+    assert first["context"]["messages"] == 1
+    assert [m["content"] for m in upstream.calls[-1]["messages"]] == [
+        "hello", first["output"], "again"]
+    history = client.get(f"{url}/messages").get_json()["messages"]
+    assert [m["role"] for m in history] == ["user", "assistant", "user", "assistant"]
+    assert client.post("/conversations/bad id!/messages", json={"content": "x"}).status_code == 400
+    assert client.delete(url).status_code == 204
+    assert client.get(url).status_code == 404
+
+
+def test_unknown_ids_are_not_created(client, upstream):
+    for conversation_id, status in (("chat", 400), ("0" * 32, 404)):
+        url = f"/conversations/{conversation_id}/messages"
+        assert client.post(url, json={"content": "hi"}).status_code == status
+        assert client.get(url).status_code == status
+    assert upstream.calls == []
+
+
+def test_failed_turn_is_not_kept(client, upstream):
+    from client import UpstreamError
+
+    url = new_conversation(client)
+    upstream.error = UpstreamError("bad", 400)
+    assert client.post(f"{url}/messages", json={"content": "hi"}).status_code == 500
+    assert client.get(f"{url}/messages").get_json()["messages"] == []
+
+
+def test_failed_turn_leaves_a_full_history_untouched(client, upstream, core):
+    from client import UpstreamError
+
+    url = new_conversation(client)
+    conversation = core.conversations.get(url.rsplit("/", 1)[1])
+    for turn in range(core.conversations.max_messages):
+        core.conversations.append(conversation, "user", f"turn {turn}")
+    before = (list(conversation.messages), list(conversation.summary), conversation.folded)
+    upstream.error = UpstreamError("bad", 400)
+    assert client.post(f"{url}/messages", json={"content": "hi"}).status_code == 500
+    assert (conversation.messages, list(conversation.summary), conversation.folded) == before
@@ -0,0 +1,61 @@
+import json
+import random
+
+import pytest
+
+from geo import Gazetteer, GridIndex, haversine_km
+from ngos import NgoCatalog, NgoIndex
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return Gazetteer()
+
+
+def test_haversine_known_distance():
+    # Mumbai to Pune is about 120 km as the crow flies
+    assert 115 < haversine_km(19.0760, 72.8777, 18.5204, 73.8567) < 125
+    assert haversine_km(10, 20, 10, 20) == 0
+
+
+def test_geocode_city_then_state(gazetteer):
+    assert gazetteer.geocode("Andheri, Mumbai, Maharashtra, India") == (19.0760, 72.8777, "city")
+    assert gazetteer.geocode("Some village", "Kerala") == (10.8505, 76.2711, "state")
+    assert gazetteer.geocode("Nowhere at all") is None
+
+
+def test_grid_matches_brute_force():
+    rng = random.Random(5)
+    points = [(rng.uniform(8, 35), rng.uniform(68, 97), key) for key in range(2000)]
+    grid = GridIndex(points)
+    for _ in range(20):
+        lat, lon, radius = rng.uniform(8, 35), rng.uniform(68, 97), rng.choice([5, 50, 400])
+        expected = sorted((haversine_km(lat, lon, plat, plon), key)
+                          for plat, plon, key in points if haversine_km(lat, lon, plat, plon) <= radius)
+        assert grid.within(lat, lon, radius) == expected
+
+
+def test_radius_search_sorts_by_distance(gazetteer):
+    ngos = [{"id": "mumbai", "name": "A", "location": "Mumbai"},
+            {"id": "thane", "name": "B", "location": "Thane, Maharashtra"},
+            {"id": "pune", "name": "C", "location": "Pune"},
+            {"id": "unknown", "name": "D", "location": "Atlantis"}]
+    index = NgoIndex(ngos, gazetteer)
+    result = index.search(near=(19.0760, 72.8777, 50), sort="distance")
+    assert [n["id"] for n in result["results"]] == ["mumbai", "thane"]
+    assert result["results"][0]["distance_km"] == 0
+    assert index.search(near=(19.0760, 72.8777, 200), sort="name")["total"] == 3
+    assert "coordinates" not in ngos[3]
+
+
+def test_near_route(client, core, tmp_path, monkeypatch):
+    path = tmp_path / "ngos.json"
+    path.write_text(json.dumps({"ngos": [{"id": 1, "name": "A", "location": "Pune"},
+                                         {"id": 2, "name": "B", "location": "Agra"}]}))
+    monkeypatch.setattr(core, "ngos", NgoCatalog(str(path), core.gazetteer))
+    body = client.get("/ngos?near=Mumbai&radius_km=200").get_json()
+    assert [n["id"] for n in body["results"]] == [1] and body["sort"] == "distance"
+    assert client.get("/ngos?lat=18.52&lon=73.85").get_json()["total"] == 1
+    assert client.get("/ngos?near=Atlantis").status_code == 400
+    assert client.get("/ngos?lat=100&lon=0").status_code == 400
+    assert client.get("/ngos?lat=x&lon=0").status_code == 400
@@ -0,0 +1,101 @@
+import json
+import random
+
+import pytest
+
+from ngos import NgoCatalog, NgoIndex, bitset, flatten, members
+
+STATES = ["Kerala", "Assam", "Goa", "Bihar"]
+SERVICES = ["legal aid", "shelter", "counselling", "health"]
+
+
+def random_ngos(count, seed=3):
+    rng = random.Random(seed)
+    return [{"id": doc, "name": f"{rng.choice(['Asha', 'Sakhi', 'Mahila', 'Nari'])} {doc}",
+             "location": rng.choice(["north", "south", ""]), "state": rng.choice(STATES),
+             "services": rng.sample(SERVICES, rng.randint(0, 3)),
+             "genderFocus": rng.choice(["women", "all"]), "safeSpace": rng.random() < 0.5}
+            for doc in range(count)]
+
+
+def brute_force(ngos, filters, sort, query=""):
+    def keep(ngo):
+        for field, values in filters.items():
+            have = ngo[field] if isinstance(ngo[field], list) else [ngo[field]]
+            if not set(have) & set(values):
+                return False
+        return not query or query in ngo["name"].lower()
+
+    keys = {"name": lambda d: ngos[d]["name"].lower(), "location": lambda d: ngos[d]["location"],
+            "state": lambda d: ngos[d]["state"].lower(), "services": lambda d: -len(ngos[d]["services"])}
+    return sorted((d for d, ngo in enumerate(ngos) if keep(ngo)), key=lambda d: (keys[sort](d), d))
+
+
+def test_bitset_helpers_round_trip():
+    docs = [0, 7, 8, 63, 64, 1000]
+    assert members(bitset(docs, 1001)) == docs
+    assert members(0) == []
+
+
+@pytest.mark.parametrize("sort", ["name", "location", "state", "services"])
+def test_pages_match_brute_force(sort):
+    ngos = random_ngos(500)
+    index = NgoIndex(ngos)
+    for filters in ({}, {"state": ["Kerala"]}, {"state": ["Goa", "Bihar"], "services": ["shelter"]},
+                    {"safeSpace": [True], "genderFocus": ["women"]}):
+        expected = brute_force(ngos, filters, sort)
+        for page, page_size in ((1, 20), (3, 7), (50, 10)):
+            result = index.search(filters=filters, page=page, page_size=page_size, sort=sort)
+            start = (page - 1) * page_size
+            assert result["total"] == len(expected)
+            assert [n["id"] for n in result["results"]] == expected[start:start + page_size]
+
+
+def test_text_query_matches_word_prefixes():
+    ngos = random_ngos(200)
+    index = NgoIndex(ngos)
+    result = index.search("sakh", page_size=200)
+    assert [n["id"] for n in result["results"]] == brute_force(ngos, {}, "name", "sakhi")
+
+
+def test_facet_counts_ignore_their_own_filter():
+    ngos = random_ngos(300)
+    result = NgoIndex(ngos).search(filters={"state": ["Kerala"], "services": ["shelter"]})
+    counts = dict(map(tuple, result["facets"]["state"]))
+    for state in STATES:
+        expected = len(brute_force(ngos, {"state": [state], "services": ["shelter"]}, "name"))
+        assert counts.get(state, 0) == expected
+
+
+def test_flatten_and_catalog(tmp_path):
+    path = tmp_path / "ngos.json"
+    path.write_text(json.dumps({"ngos": {"Goa": [{"id": "a", "name": "Asha"}]}}))
+    assert flatten(json.loads(path.read_text())) == [{"id": "a", "name": "Asha", "state": "Goa"}]
+    catalog = NgoCatalog(str(path))
+    assert catalog.index() is catalog.index()
+    assert catalog.index().get("a")["state"] == "Goa" and catalog.index().get("b") is None
+
+
+def test_routes(client, core, tmp_path, monkeypatch):
+    path = tmp_path / "ngos.json"
+    path.write_text(json.dumps({"ngos": random_ngos(50)}))
+    monkeypatch.setattr(core, "ngos", NgoCatalog(str(path)))
+    body = client.get("/ngos?state=Kerala,Goa&sort=state&page_size=5").get_json()
+    assert len(body["results"]) == min(5, body["total"])
+    assert client.get("/ngos?page_size=1000").get_json()["page_size"] == core.NGOS_MAX_PAGE_SIZE
+    assert client.get("/ngos?sort=bogus").status_code == 400
+    assert client.get("/ngos/3").get_json()["id"] == 3
+    assert client.get("/ngos/999").status_code == 404
+
+
+def test_directory_page_queries(client):
+    # What ngo.html sends: an empty page for the filter options, then filtered pages
+    options = client.get("/ngos?page_size=0")
+    assert options.headers["Access-Control-Allow-Origin"] == "*"
+    facets = options.get_json()["facets"]
+    shelters = [service for service, _ in facets["services"] if "shelter" in service.lower()]
+    body = client.get(f"/ngos?page=1&page_size=6&sort=name&services={','.join(shelters)}"
+                      "&genderFocus=women&safeSpace=1").get_json()
+    assert 0 < body["total"] and len(body["results"]) <= 6
+    assert all(ngo["safeSpace"] and "women" in ngo["genderFocus"] and set(shelters) & set(ngo["services"])
+               for ngo in body["results"])
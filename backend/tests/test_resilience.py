@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from client import UpstreamError, UpstreamTimeout
+from resilience import CircuitBreaker, CircuitOpen, ResilientCaller, is_retryable
+
+
+def caller(**options):
+    return ResilientCaller(**dict({"backoff_base": 0, "hedge_min_delay": 0.05}, **options))
+
+
+def warm(caller, model, seconds=0.01):
+    """Give the model enough latency samples to pick a hedge delay"""
+    for _ in range(20):
+        caller._tracker(model).record(seconds)
+
+
+def test_retryable_errors():
+    assert is_retryable(UpstreamTimeout("slow"))
+    assert is_retryable(UpstreamError("down", 503)) and is_retryable(UpstreamError("busy", 429))
+    assert is_retryable(UpstreamError("no response"))
+    assert not is_retryable(UpstreamError("bad", 400)) and not is_retryable(ValueError())
+
+
+def test_breaker_opens_and_probes_once():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_retries_then_falls_back():
+    attempts = []
+
+    def fn(model):
+        attempts.append(model)
+        if model == "primary":
+            raise UpstreamError("down", 502)
+        return "ok"
+
+    policy = caller(fallbacks=["backup"], retries=1, hedge=False)
+    assert policy.call("primary", fn) == ("ok", "backup")
+    assert attempts == ["primary", "primary", "backup"]
+    assert policy.stats()["retries"] == 1 and policy.stats()["fallbacks"] == 1
+
+
+def test_client_errors_are_not_retried():
+    policy = caller(retries=3, hedge=False)
+    calls = []
+
+    def fn(model):
+        calls.append(model)
+        raise UpstreamError("bad request", 400)
+
+    with pytest.raises(UpstreamError):
+        policy.call("m", fn)
+    assert len(calls) == 1 and policy.breaker("m").state == "closed"
+
+
+def test_open_breakers_short_circuit():
+    policy = caller(retries=0, failure_threshold=1, hedge=False)
+
+    def fn(model):
+        raise UpstreamTimeout("slow")
+
+    with pytest.raises(UpstreamTimeout):
+        policy.call("m", fn)
+    with pytest.raises(CircuitOpen):
+        policy.call("m", fn)
+
+
+def test_unhedged_calls_run_on_caller_thread():
+    policy = caller()
+    threads = []
+    policy.call("m", lambda model: threads.append(threading.current_thread()))
+    assert threads == [threading.current_thread()]
+
+
+def test_fast_hedge_answers_before_a_slow_first_attempt():
+    policy = caller()
+    warm(policy, "m")
+    calls = []
+
+    def fn(model):
+        calls.append(model)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return "first"
+        return "hedged"
+
+    start = time.monotonic()
+    assert policy.call("m", fn) == ("hedged", "m")
+    assert time.monotonic() - start < 0.3
+    assert policy.stats()["hedge_wins"] == 1
+
+
+def test_first_attempt_finishing_first_is_not_a_hedge_win():
+    policy = caller()
+    warm(policy, "m")
+    calls = []
+
+    def fn(model):
+        calls.append(model)
+        attempt = len(calls)
+        time.sleep(0.1 if attempt == 1 else 0.4)
+        return f"attempt {attempt}"
+
+    assert policy.call("m", fn) == ("attempt 1", "m")
+    stats = policy.stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 0)
+
+
+def test_hedge_rescues_a_slow_failing_first_attempt():
+    policy = caller(retries=0)
+    warm(policy, "m")
+    calls = []
+
+    def fn(model):
+        calls.append(threading.current_thread())
+        if len(calls) == 1:
+            time.sleep(0.2)
+            raise UpstreamTimeout("slow")
+        return "hedged"
+
+    assert policy.call("m", fn) == ("hedged", "m")
+    stats = policy.stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+
+
+def test_hedges_beyond_the_pool_are_skipped():
+    policy = caller(hedge_workers=1)
+    warm(policy, "m")
+
+    def fn(model):
+        time.sleep(0.15)
+        return "ok"
+
+    threads = [threading.Thread(target=policy.call, args=("m", fn)) for _ in range(4)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start < 0.5
+    stats = policy.stats()
+    assert stats["hedges"] + stats["hedges_skipped"] == 4 and stats["hedges_skipped"] >= 1
+
+
+def test_async_hedge_wins_and_cancels_loser():
+    policy = caller()
+    warm(policy, "m")
+    attempts, cancelled = [], []
+
+    async def fn(model):
+        attempts.append(model)
+        try:
+            await asyncio.sleep(0.3 if len(attempts) == 1 else 0)
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+        return "ok"
+
+    async def main():
+        result = await policy.acall("m", fn)
+        await asyncio.sleep(0)
+        return result
+
+    start = time.monotonic()
+    assert asyncio.run(main()) == ("ok", "m")
+    assert time.monotonic() - start < 0.25
+    assert policy.stats()["hedge_wins"] == 1 and cancelled == ["m"]
+
+
+def test_upstream_stats_route(client, upstream):
+    client.post("/generate", json={"prompt": "hi"})
+    assert client.get("/upstream/stats").get_json()["calls"] == 1
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from schemes import SchemeCatalog, SchemeIndex, flatten
+
+DATA = {
+    "central": [
+        {"name": "Maternity Benefit Scheme", "category": "health", "target": "women",
+         "benefits": "Cash support for pregnant women", "description": "Maternity cash transfer"},
+        {"name": "Girl Education Grant", "category": "education", "target": "girls",
+         "description": "Scholarships for school education"},
+    ],
+    "states": {
+        "Kerala": [{"name": "Mother Care", "category": "health", "target": "women",
+                    "description": "Free checkups during pregnancy"}],
+        "Assam": [{"name": "Mother Care", "category": "health", "target": "women",
+                   "description": "Nutrition kits"}],
+    },
+}
+
+
+@pytest.fixture
+def index():
+    return SchemeIndex(flatten(DATA))
+
+
+def test_flatten_assigns_state_and_unique_ids():
+    schemes = flatten(DATA)
+    assert [s["state"] for s in schemes] == [None, None, "Kerala", "Assam"]
+    assert [s["id"] for s in schemes][2:] == ["kerala-mother-care", "assam-mother-care"]
+
+
+def test_ranked_search_prefers_name_matches(index):
+    results = index.search("maternity")["results"]
+    assert results[0]["name"] == "Maternity Benefit Scheme" and results[0]["score"] > 0
+
+
+def test_last_term_matches_as_prefix(index):
+    assert [r["name"] for r in index.search("scholar")["results"]] == ["Girl Education Grant"]
+    assert index.search("pregnan")["total"] == 2
+
+
+def test_every_term_must_match(index):
+    assert index.search("mother nutrition")["total"] == 1
+    assert index.search("maternity nothing")["total"] == 0
+
+
+def test_facet_counts_are_disjunctive(index):
+    result = index.search(filters={"category": ["health"]})
+    assert result["total"] == 3
+    assert dict(map(tuple, result["facets"]["category"])) == {"health": 3, "education": 1}
+    assert dict(map(tuple, result["facets"]["state"])) == {"Kerala": 1, "Assam": 1}
+
+
+def test_pages_and_full_records(index):
+    page = index.search(page=2, page_size=3)
+    assert page["total"] == 4 and len(page["results"]) == 1
+    assert "benefits" not in index.search("maternity")["results"][0]
+    assert "benefits" in index.search("maternity", full=True)["results"][0]
+
+
+def test_catalog_reindexes_on_change(tmp_path):
+    path = tmp_path / "schemes.json"
+    path.write_text(json.dumps(DATA))
+    catalog = SchemeCatalog(str(path))
+    first = catalog.index()
+    assert catalog.index() is first
+    path.write_text(json.dumps({"central": DATA["central"]}))
+    assert catalog.index().summary()["total"] == 2
+
+
+def test_routes(client, core, tmp_path, monkeypatch):
+    path = tmp_path / "schemes.json"
+    path.write_text(json.dumps(DATA))
+    monkeypatch.setattr(core, "schemes", SchemeCatalog(str(path)))
+    response = client.get("/schemes?q=mother&state=Kerala,Assam&page_size=1")
+    body = response.get_json()
+    assert body["total"] == 2 and len(body["results"]) == 1
+    assert client.get("/schemes", headers={"If-None-Match": client.get("/schemes").headers["ETag"]}
+                      ).status_code == 304
+    assert client.get("/schemes/kerala-mother-care").get_json()["state"] == "Kerala"
+    assert client.get("/schemes/missing").status_code == 404
+    assert client.get("/schemes?page=x").status_code == 400
+    assert client.get("/schemes/summary").get_json()["states"] == 2
+
+
+def test_catalog_allows_cross_origin_reads(client, core, monkeypatch):
+    assert client.get("/schemes/summary").headers["Access-Control-Allow-Origin"] == "*"
+    assert "Access-Control-Allow-Origin" not in client.get("/cache/stats").headers
+    monkeypatch.setattr(core, "CORS_ORIGINS", ["https://hack.example"])
+    allowed = client.get("/schemes", headers={"Origin": "https://hack.example"})
+    assert allowed.headers["Access-Control-Allow-Origin"] == "https://hack.example"
+    assert "Origin" in allowed.headers["Vary"]
+    other = client.get("/schemes", headers={"Origin": "https://elsewhere.example"})
+    assert "Access-Control-Allow-Origin" not in other.headers
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def run_together(count, target):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(index):
+        barrier.wait()
+        results[index] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "answer"
+
+    results = run_together(8, lambda: flight.call("key", slow))
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert {result for result, _ in results} == {"answer"}
+    assert flight.stats() == {"leaders": 1, "shared": 7, "in_flight": 0}
+
+
+def test_errors_are_shared_and_key_is_forgotten():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.call("key", fail)
+    assert flight.call("key", lambda: 1) == (1, False)
+
+
+def test_stream_is_replayed_to_late_subscribers():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def source():
+        yield 1
+        release.wait(1)
+        yield 2
+
+    first, shared = flight.stream("key", source)
+    first.wait_started()
+    second, joined = flight.stream("key", source)
+    release.set()
+    assert (shared, joined) == (False, True)
+    assert list(first) == list(second) == [1, 2]
+
+
+def test_stream_open_failure_reaches_subscribers():
+    flight = SingleFlight()
+
+    def source():
+        raise ConnectionError("refused")
+
+    stream, _ = flight.stream("key", source)
+    with pytest.raises(ConnectionError):
+        stream.wait_started()
+
+
+def test_identical_generate_requests_coalesce(client, upstream):
+    reply = upstream.post_json
+
+    def slow(path, payload, total_timeout=None):
+        time.sleep(0.2)
+        return reply(path, payload, total_timeout)
+
+    upstream.post_json = slow
+    results = run_together(4, lambda: client.post("/generate", json={"prompt": "same"}).get_json())
+    assert len(upstream.calls) == 1
+    assert all(result == results[0] for result in results)
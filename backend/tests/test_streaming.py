@@ -0,0 +1,55 @@
+import json
+
+from client import UpstreamError
+from utils import StreamCleaner, clean_output
+
+
+def events(response):
+    parsed = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        if block:
+            lines = dict(line.split(": ", 1) for line in block.split("\n"))
+            parsed.append((lines.get("event"), json.loads(lines["data"])))
+    return parsed
+
+
+def test_stream_cleaner_matches_clean_output():
+    text = "  one \n\n two\t three  "
+    for size in range(1, len(text) + 1):
+        cleaner = StreamCleaner()
+        pieces = [cleaner.feed(text[i:i + size]) for i in range(0, len(text), size)]
+        assert "".join(pieces) + cleaner.finish() == clean_output(text)
+
+
+def test_stream_relays_cleaned_pieces(client, upstream):
+    response = client.post("/generate", json={"prompt": "hi", "stream": True})
+    assert response.mimetype == "text/event-stream"
+    received = events(response)
+    assert received[-1] == ("done", {"model": upstream.calls[0]["model"]})
+    output = "".join(data["output"] for event, data in received[:-1])
+    assert output == clean_output("".join(upstream.chunks))
+    assert upstream.calls[0]["stream"] is True
+
+
+def test_stream_matches_blocking_output(client, upstream):
+    upstream.reply = "".join(upstream.chunks)
+    blocking = client.post("/generate", json={"prompt": "hi"}).get_json()["output"]
+    streamed = events(client.post("/generate", json={"prompt": "hi", "stream": True}))
+    assert "".join(d["output"] for e, d in streamed if e is None) == blocking
+
+
+def test_error_before_first_byte_is_json(client, upstream):
+    upstream.error = UpstreamError("bad request", 400)
+    response = client.post("/generate", json={"prompt": "hi", "stream": True})
+    assert response.status_code == 500 and "bad request" in response.get_json()["error"]
+
+
+def test_error_mid_stream_is_an_event(client, upstream):
+    def broken(path, payload, total_timeout=None):
+        yield {"choices": [{"delta": {"content": "partial"}}]}
+        raise UpstreamError("connection reset")
+
+    upstream.stream_events = broken
+    received = events(client.post("/generate", json={"prompt": "hi", "stream": True}))
+    assert received[0] == (None, {"output": "partial"})
+    assert received[-1][0] == "error"
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+from translations import TranslationCatalog, TranslationIndex, page_keys
+
+PAGE = '<h1 data-i18n="title"></h1><input data-i18n-placeholder=\'search\'><p data-i18n="only_en">'
+
+
+@pytest.fixture
+def site(tmp_path):
+    i18n = tmp_path / "i18n"
+    i18n.mkdir()
+    (i18n / "en.json").write_text(json.dumps({"title": "Home", "search": "Search",
+                                              "only_en": "English only", "unused": "x"}))
+    (i18n / "hi.json").write_text(json.dumps({"title": "घर", "search": "खोजें"}, ensure_ascii=False),
+                                  encoding="utf-8")
+    (tmp_path / "index.html").write_text(PAGE)
+    (tmp_path / "plain.html").write_text("<p>No keys</p>")
+    return tmp_path
+
+
+def test_page_keys():
+    assert page_keys(PAGE) == ["only_en", "search", "title"]
+
+
+def test_bundle_holds_only_page_keys_with_fallback():
+    index = TranslationIndex({"en": {"a": "A", "b": "B", "c": "C"}, "hi": {"a": "अ"}},
+                             {"page": ["a", "b"]})
+    bundle = json.loads(index.bundle("page", "hi")[0])
+    assert bundle["messages"] == {"a": "अ", "b": "B"} and bundle["fallback"] == ["b"]
+    assert index.bundle("missing", "hi") is None
+
+
+def test_language_resolution():
+    index = TranslationIndex({"en": {}, "hi": {}}, {})
+    assert index.resolve("hi") == "hi" and index.resolve("HI-in") == "hi"
+    assert index.resolve("fr") == "en" and index.resolve(None) == "en"
+
+
+def test_etag_changes_only_with_content():
+    first = TranslationIndex({"en": {"a": "A"}}, {"p": ["a"]}).bundle("p", "en")
+    same = TranslationIndex({"en": {"a": "A", "b": "B"}}, {"p": ["a"]}).bundle("p", "en")
+    changed = TranslationIndex({"en": {"a": "Z"}}, {"p": ["a"]}).bundle("p", "en")
+    assert first == same and first[1] != changed[1]
+
+
+def test_catalog_reindexes_when_a_file_changes(site):
+    catalog = TranslationCatalog(str(site / "i18n"), str(site))
+    index = catalog.index()
+    assert index.pages == ["index"] and catalog.index() is index
+    path = site / "i18n" / "hi.json"
+    st = os.stat(path)
+    path.write_text(json.dumps({"title": "मुखपृष्ठ"}, ensure_ascii=False), encoding="utf-8")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert json.loads(catalog.index().bundle("index", "hi")[0])["messages"]["title"] == "मुखपृष्ठ"
+
+
+def test_routes(client, core, site, monkeypatch):
+    monkeypatch.setattr(core, "translations", TranslationCatalog(str(site / "i18n"), str(site)))
+    assert client.get("/i18n").get_json() == {"pages": ["index"], "languages": ["en", "hi"],
+                                              "default": "en"}
+    response = client.get("/i18n/index/hi-IN")
+    assert response.get_json()["lang"] == "hi" and response.get_json()["fallback"] == ["only_en"]
+    cached = client.get("/i18n/index/hi", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+    assert client.get("/i18n/plain/en").status_code == 404
+
+
+def test_hack_pages_have_bundles(client):
+    # index.html and dash.html load their bundle, possibly from another origin
+    for page in ("index", "dash"):
+        response = client.get(f"/i18n/{page}/hi")
+        assert response.headers["Access-Control-Allow-Origin"] == "*"
+        assert "nav.home" in response.get_json()["messages"]
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+# data-i18n="key", data-i18n-placeholder="key" and the like
+_KEY_RE = re.compile(r"""data-i18n(?:-[\w-]+)?\s*=\s*["']([^"']+)["']""")
+
+
+def page_keys(html):
+    """Translation keys referenced by a page's data-i18n attributes"""
+    return sorted(set(_KEY_RE.findall(html)))
+
+
+class TranslationIndex:
+    """Per-page translation bundles, built once for every (page, lang) pair
+
+    A bundle holds only the keys its page uses. Keys missing from a language
+    are filled from the default language, and listed in ``fallback``.
+    """
+
+    def __init__(self, languages, pages, default="en"):
+        self.default = default
+        self.languages = sorted(languages)
+        self.pages = sorted(pages)
+        base = languages.get(default, {})
+        self._bundles = {}
+        for page, keys in pages.items():
+            for lang, messages in languages.items():
+                resolved, fallback = {}, []
+                for key in keys:
+                    if key in messages:
+                        resolved[key] = messages[key]
+                    elif key in base:
+                        resolved[key] = base[key]
+                        fallback.append(key)
+                payload = {"page": page, "lang": lang, "messages": resolved, "fallback": fallback}
+                body = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")
+                self._bundles[(page, lang)] = (body, hashlib.sha256(body).hexdigest()[:16])
+
+    def resolve(self, lang):
+        """Closest available language: exact, then the base of "hi-IN", then the default"""
+        lang = (lang or "").lower()
+        if lang in self.languages:
+            return lang
+        base = lang.split("-")[0].split("_")[0]
+        return base if base in self.languages else self.default
+
+    def bundle(self, page, lang):
+        """``(json bytes, etag)`` for a page in a language, or None for an unknown page"""
+        return self._bundles.get((page, self.resolve(lang)))
+
+
+class TranslationCatalog:
+    """Indexes ``<lang>.json`` files and the pages using them, re-indexing when either changes"""
+
+    def __init__(self, directory, pages_directory, default="en"):
+        self.directory = directory
+        self.pages_directory = pages_directory
+        self.default = default
+        self._lock = threading.Lock()
+        self._signature = None
+        self._index = None
+
+    def _files(self):
+        languages = sorted(e.path for e in os.scandir(self.directory)
+                           if e.is_file() and e.name.endswith(".json"))
+        pages = sorted(e.path for e in os.scandir(self.pages_directory)
+                       if e.is_file() and e.name.endswith(".html"))
+        return languages, pages
+
+    def index(self):
+        languages, pages = self._files()
+        signature = tuple((path, st.st_size, st.st_mtime_ns)
+                          for path, st in ((p, os.stat(p)) for p in languages + pages))
+        with self._lock:
+            if signature != self._signature:
+                messages = {}
+                for path in languages:
+                    with open(path, "r", encoding="utf-8") as f:
+                        messages[os.path.basename(path)[:-len(".json")].lower()] = json.load(f)
+                keys = {}
+                for path in pages:
+                    with open(path, "r", encoding="utf-8") as f:
+                        used = page_keys(f.read())
+                    if used:
+                        keys[os.path.basename(path)[:-len(".html")]] = used
+                self._index = TranslationIndex(messages, keys, self.default)
+                self._signature = signature
+            return self._index
@@ -1,6 +1,37 @@
+from itertools import groupby
+
+
 def clean_output(text):
     # Replace newlines with space
     cleaned = text.replace('\n', ' ').strip()
     # Optional: collapse multiple spaces into one
     cleaned = ' '.join(cleaned.split())
-    return cleaned
\ No newline at end of file
+    return cleaned
+
+
+class StreamCleaner:
+    # Incremental clean_output: feed chunks as they arrive and the joined
+    # output equals clean_output() of the whole text, even when a run of
+    # whitespace is split across chunk boundaries.
+    def __init__(self):
+        self.started = False
+        self.pending_space = False
+
+    def feed(self, text):
+        out = []
+        for is_space, run in groupby(text, str.isspace):
+            if is_space:
+                # Leading whitespace is dropped, inner runs become one space
+                self.pending_space = self.started
+            else:
+                if self.pending_space:
+                    out.append(' ')
+                    self.pending_space = False
+                out.append(''.join(run))
+                self.started = True
+        return ''.join(out)
+
+    def finish(self):
+        # Trailing whitespace is stripped, so nothing is left to flush
+        self.pending_space = False
+        return ''
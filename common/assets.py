@@ -0,0 +1,237 @@
+"""Precompressed, content-hashed static assets
+
+The build step copies matching files into an output directory under names
+carrying a hash of their content, writes ``.gz`` and (with the brotli
+package installed) ``.br`` variants next to them, and records everything in
+``manifest.json``:
+
+    python -m common.assets WOMENCARE/dist WOMENCARE/static
+    python -m common.assets backend/dist hack=hack ngo=ngo1/frontend
+
+``serve_assets`` serves a build directory from a Flask app, sending the
+variant the client accepts straight from disk. A hashed name never changes
+content, so it is cached as immutable; templates get it from ``asset_url``.
+"""
+import fnmatch
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_PATTERNS = ('*.css', '*.js', '*.json', '*.svg', '*.html', '*.txt')
+
+# Below this a compressed variant saves less than its headers cost
+MIN_COMPRESS_SIZE = 256
+
+HASH_LENGTH = 12
+MANIFEST = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Earlier builds whose hashed files stay servable; older ones are deleted
+KEEP_BUILDS = 3
+
+# Preferred first when the client accepts several equally
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def hashed_name(name, digest):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{digest[:HASH_LENGTH]}{ext}'
+
+
+def build(output, sources, patterns=DEFAULT_PATTERNS, keep_builds=KEEP_BUILDS):
+    """Write hashed and compressed copies of matching files and return the manifest
+
+    ``sources`` maps a URL prefix ('' for none) to a source directory. Files
+    from the last ``keep_builds`` builds are left in place and listed under
+    ``retired``, so pages cached with old names still find their assets;
+    older ones are deleted with their compressed variants.
+    """
+    try:
+        with open(os.path.join(output, MANIFEST), 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = {}
+    assets = {}
+    for prefix, source in sources.items():
+        for root, dirs, files in os.walk(source):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for filename in sorted(files):
+                if not any(fnmatch.fnmatch(filename, p) for p in patterns):
+                    continue
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, source).replace(os.sep, '/')
+                if prefix:
+                    name = f'{prefix}/{name}'
+                with open(path, 'rb') as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()
+                target = hashed_name(name, digest)
+                entry = {'file': target, 'hash': digest[:HASH_LENGTH], 'size': len(data),
+                         'encodings': {}}
+                _write(os.path.join(output, target), data)
+                if len(data) >= MIN_COMPRESS_SIZE:
+                    variants = {'gzip': gzip.compress(data, 9, mtime=0)}
+                    if brotli is not None:
+                        variants['br'] = brotli.compress(data, quality=11)
+                    for encoding, suffix in ENCODINGS:
+                        body = variants.get(encoding)
+                        if body is not None and len(body) < len(data):
+                            _write(os.path.join(output, target + suffix), body)
+                            entry['encodings'][encoding] = len(body)
+                assets[name] = entry
+    number = previous.get('build', 0) + 1
+    current = {entry['file'] for entry in assets.values()}
+    retired = {}
+    # Entries remember the build that replaced them, from which their age is counted
+    earlier = [dict(entry, retired_in=number) for entry in previous.get('assets', {}).values()]
+    earlier += [dict(entry, retired_in=entry.get('retired_in', number))
+                for entry in previous.get('retired', {}).values()]
+    for entry in earlier:
+        if entry['file'] in current or entry['file'] in retired:
+            continue
+        path = os.path.join(output, entry['file'])
+        if number - entry['retired_in'] < keep_builds:
+            if os.path.exists(path):
+                retired[entry['file']] = entry
+            continue
+        for suffix in ('',) + tuple(dict(ENCODINGS).values()):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+    manifest = {'build': number, 'assets': assets, 'retired': retired}
+    _write(os.path.join(output, MANIFEST),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def negotiate(accept_encoding, available):
+    """Best of the ``available`` encodings for an Accept-Encoding header, None for identity"""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip():
+            accepted[coding.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding, _ in ENCODINGS:
+        if encoding in available:
+            quality = accepted.get(encoding, accepted.get('*', 0.0))
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+    return best
+
+
+class Manifest:
+    """A build directory's manifest.json, reread only when the file changes"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._data = ({}, {})
+
+    def load(self):
+        """``(assets by logical name, assets by hashed file)``, empty before a build"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return ({}, {})
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if signature != self._signature:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                assets = manifest['assets']
+                files = dict(manifest.get('retired', {}))
+                files.update((entry['file'], entry) for entry in assets.values())
+                self._data = (assets, files)
+                self._signature = signature
+            return self._data
+
+
+def serve_assets(app, directory, url_prefix='/assets', endpoint='assets'):
+    """Serve a build directory under ``url_prefix`` and add an ``asset_url`` template global
+
+    Hashed names are cached for a year as immutable; logical names are
+    served too, revalidated by ETag. Either way the client gets the
+    smallest variant it accepts, sent with ``send_file`` so servers that
+    support ``wsgi.file_wrapper`` can use sendfile. Before a build,
+    ``asset_url`` falls back to the app's static folder.
+    """
+    from flask import abort, request, send_file, url_for
+
+    directory = os.path.abspath(directory)
+    manifest = Manifest(directory)
+    suffixes = dict(ENCODINGS)
+
+    def asset(filename):
+        assets, files = manifest.load()
+        entry = files.get(filename)
+        immutable = entry is not None
+        if not immutable:
+            entry = assets.get(filename)
+        if entry is None:
+            abort(404)
+        encoding = negotiate(request.headers.get('Accept-Encoding'), entry['encodings'])
+        path = os.path.join(directory, entry['file'] + suffixes.get(encoding, ''))
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_file(path, mimetype=mimetype, conditional=True,
+                             download_name=os.path.basename(filename),
+                             etag=f"{entry['hash']}-{encoding or 'identity'}")
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE if immutable else 'no-cache'
+        return response
+
+    def asset_url(name):
+        entry = manifest.load()[0].get(name)
+        if entry is not None:
+            return url_for(endpoint, filename=entry['file'])
+        if app.has_static_folder:
+            return url_for('static', filename=name)
+        return url_for(endpoint, filename=name)
+
+    app.add_url_rule(f'{url_prefix}/<path:filename>', endpoint, asset)
+    app.add_template_global(asset_url, 'asset_url')
+    return manifest
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.exit('usage: python -m common.assets OUTPUT [PREFIX=]SOURCE...')
+    sources = {}
+    for arg in sys.argv[2:]:
+        prefix, _, source = arg.rpartition('=')
+        sources[prefix] = source
+    for name, entry in sorted(build(sys.argv[1], sources)['assets'].items()):
+        sizes = ''.join(f', {e} {n}' for e, n in sorted(entry['encodings'].items()))
+        print(f"{name} -> {entry['file']} ({entry['size']} bytes{sizes})")
+    if brotli is None:
+        print('brotli is not installed, only gzip variants were written', file=sys.stderr)
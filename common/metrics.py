@@ -0,0 +1,268 @@
+"""In-process metrics shared by the Flask and aiohttp apps, rendered in Prometheus text format
+
+Recording is a dictionary lookup, a bisect and a few integer increments under
+a per-metric lock, so it is cheap enough for every request. Values that
+other components already count (cache hits and the like) are read only when
+``/metrics`` is scraped, through collectors.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; spans sub-millisecond cache hits up to slow upstream completions
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _header(name, kind, documentation):
+    # Counter samples carry the _total suffix, their family name must match
+    name = name + '_total' if kind == 'counter' else name
+    return f'# HELP {name} {documentation}', f'# TYPE {name} {kind}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f'{self.name}_total{_labels(self.labelnames, key)} {_number(value)}'
+
+
+class Histogram:
+    """Bucketed observations per label combination"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf) followed by the sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        bounds = self.buckets + (float('inf'),)
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, values):
+                cumulative += count
+                yield (f'{self.name}_bucket{_labels(self.labelnames, key, [("le", _number(bound))])} '
+                       f'{cumulative}')
+            yield f'{self.name}_sum{_labels(self.labelnames, key)} {_number(values[-1])}'
+            yield f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}'
+
+
+class Registry:
+    """Named metrics plus collectors evaluated at scrape time
+
+    A collector is a callable returning ``(name, kind, documentation,
+    [(labels dict, value), ...])`` tuples, for figures kept elsewhere.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, fn):
+        """Register a scrape-time collector; usable as a decorator"""
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(_header(metric.name, metric.kind, metric.documentation))
+            lines.extend(metric.samples())
+        for collect in collectors:
+            for name, kind, documentation, samples in collect():
+                lines.extend(_header(name, kind, documentation))
+                suffix = '_total' if kind == 'counter' else ''
+                for labels, value in samples:
+                    lines.append(f'{name}{suffix}{_labels(labels.keys(), labels.values())} '
+                                 f'{_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def cache_collector(prefix, caches):
+    """Collector for objects with a ``stats()`` dict holding hits/misses (and optionally evictions)
+
+    ``caches`` maps a cache label to the object, or to a zero-argument
+    callable returning its stats.
+    """
+    def collect():
+        stats = {name: (cache() if callable(cache) else cache.stats())
+                 for name, cache in caches.items()}
+        families = []
+        for field, kind, documentation in (
+                ('hits', 'counter', 'Cache lookups served from the cache'),
+                ('misses', 'counter', 'Cache lookups that had to be computed'),
+                ('evictions', 'counter', 'Entries dropped to stay within the size bound'),
+                ('hit_ratio', 'gauge', 'Hits over lookups since start')):
+            samples = [({'cache': name}, s[field]) for name, s in stats.items() if field in s]
+            if samples:
+                families.append((f'{prefix}_cache_{field}', kind, documentation, samples))
+        return families
+    return collect
+
+
+registry = Registry()
+
+
+def instrument_flask(app, registry=registry, endpoint='/metrics'):
+    """Time requests and template renders of a Flask app and serve ``endpoint``
+
+    Requests are labelled by route template, not path, to keep the number of
+    series bounded. Streamed responses are timed up to their first byte.
+    """
+    from flask import Response, before_render_template, g, request, template_rendered
+
+    requests = registry.histogram(
+        'http_request_duration_seconds', 'Time to handle an HTTP request',
+        ('method', 'route', 'status'))
+    renders = registry.histogram(
+        'flask_template_render_seconds', 'Time to render a Jinja template', ('template',))
+
+    def _render_started(sender, template, context, **extra):
+        g.setdefault('_metrics_renders', []).append(time.perf_counter())
+
+    def _render_finished(sender, template, context, **extra):
+        starts = g.get('_metrics_renders')
+        if starts:
+            renders.observe(time.perf_counter() - starts.pop(), template=template.name)
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            requests.observe(time.perf_counter() - start, method=request.method,
+                             route=rule, status=response.status_code)
+        return response
+
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule(endpoint, 'metrics', metrics)
+    return registry
+
+
+def aiohttp_middleware(registry=registry):
+    """aiohttp middleware timing every request by route template"""
+    from aiohttp import web
+
+    requests = registry.histogram(
+        'http_request_duration_seconds', 'Time to handle an HTTP request',
+        ('method', 'route', 'status'))
+
+    @web.middleware
+    async def middleware(request, handler):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            resource = request.match_info.route.resource
+            route = resource.canonical if resource is not None else 'unmatched'
+            requests.observe(time.perf_counter() - start, method=request.method,
+                             route=route, status=status)
+
+    return middleware
+
+
+def aiohttp_handler(registry=registry):
+    from aiohttp import web
+
+    async def metrics(request):
+        return web.Response(body=registry.render().encode('utf-8'),
+                            headers={'Content-Type': CONTENT_TYPE})
+    return metrics
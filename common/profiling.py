@@ -0,0 +1,190 @@
+"""Opt-in sampling profiler for single Flask requests
+
+A request is profiled when it carries a valid signed ``X-Profile`` header or
+is picked by the sample rate. While it runs, a background thread records the
+request thread's Python stack every ``interval`` seconds; the samples are
+written as collapsed stacks (for flamegraph.pl / inferno) or a speedscope
+file. Without a secret and a sample rate nothing is installed at all.
+
+Create a header value for a path, valid for ten minutes:
+
+    python -m common.profiling SECRET /dashboard
+"""
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+HEADER = 'X-Profile'
+
+
+def sign(secret, path, ttl=600):
+    """Header value allowing one path to be profiled until ``ttl`` seconds from now"""
+    expires = int(time.time() + ttl)
+    digest = hmac.new(secret.encode('utf-8'), f'{expires}:{path}'.encode('utf-8'),
+                      hashlib.sha256).hexdigest()
+    return f'{expires}.{digest}'
+
+
+def verify(secret, path, value):
+    """True when ``value`` was produced by ``sign`` for this path and has not expired"""
+    expires, _, digest = (value or '').partition('.')
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(secret.encode('utf-8'), f'{expires}:{path}'.encode('utf-8'),
+                        hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+
+class StackSampler:
+    """Samples the stack of one thread from a background thread"""
+
+    def __init__(self, thread_id, interval=0.005, root=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root = root
+        self.samples = Counter()
+        self.started = self.stopped = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._names = {}
+
+    def _name(self, code):
+        name = self._names.get(code)
+        if name is None:
+            filename = code.co_filename
+            if self.root and filename.startswith(self.root):
+                filename = os.path.relpath(filename, self.root)
+            elif 'site-packages' in filename:
+                filename = filename.split('site-packages' + os.sep, 1)[-1]
+            name = self._names[code] = f'{code.co_name} ({filename}:{code.co_firstlineno})'
+        return name
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.samples[tuple(stack)] += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+        return self.samples
+
+
+def collapsed(samples):
+    """Brendan Gregg's folded format, one ``root;child;leaf count`` line per stack"""
+    return ''.join(f"{';'.join(stack)} {count}\n"
+                   for stack, count in sorted(samples.items()))
+
+
+def speedscope(samples, interval, name):
+    """speedscope's sampled-profile JSON document"""
+    frames, index = [], {}
+    stacks, weights = [], []
+    for stack, count in samples.items():
+        indices = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({'name': frame})
+            indices.append(index[frame])
+        stacks.append(indices)
+        weights.append(count * interval)
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': stacks,
+            'weights': weights,
+        }],
+        'name': name,
+        'exporter': 'common.profiling',
+    }
+
+
+def write_profile(directory, sampler, label, fmt='speedscope'):
+    """Write a finished sampler's profile and return the file name"""
+    os.makedirs(directory, exist_ok=True)
+    slug = ''.join(c if c.isalnum() else '_' for c in label).strip('_') or 'request'
+    stem = f'{time.strftime("%Y%m%d-%H%M%S")}-{slug}-{uuid.uuid4().hex[:8]}'
+    if fmt == 'collapsed':
+        filename, body = stem + '.folded', collapsed(sampler.samples)
+    else:
+        filename = stem + '.speedscope.json'
+        body = json.dumps(speedscope(sampler.samples, sampler.interval, label))
+    with open(os.path.join(directory, filename), 'w', encoding='utf-8') as f:
+        f.write(body)
+    return filename
+
+
+def instrument_profiler(app, directory, secret=None, sample_rate=0.0, interval=0.005,
+                        fmt='speedscope'):
+    """Profile requests picked by a signed header or ``sample_rate``
+
+    Returns False, installing nothing, when neither is configured. A profiled
+    response names its file in an ``X-Profile-File`` header.
+    """
+    if not secret and not sample_rate:
+        return False
+
+    from flask import g, request
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    @app.before_request
+    def _start_profile():
+        header = request.headers.get(HEADER)
+        wanted = (header is not None and secret and verify(secret, request.path, header)) \
+            or (sample_rate and random.random() < sample_rate)
+        if wanted:
+            g._profiler = StackSampler(threading.get_ident(), interval, root).start()
+
+    def _finish():
+        sampler = g.pop('_profiler', None)
+        if sampler is None:
+            return None
+        sampler.stop()
+        return write_profile(directory, sampler, f'{request.method} {request.path}', fmt)
+
+    @app.after_request
+    def _stop_profile(response):
+        filename = _finish()
+        if filename:
+            response.headers['X-Profile-File'] = filename
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc):
+        # after_request is skipped when the view raised
+        _finish()
+
+    return True
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('usage: python -m common.profiling SECRET PATH')
+    print(f'{HEADER}: {sign(sys.argv[1], sys.argv[2])}')
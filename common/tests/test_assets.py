@@ -0,0 +1,109 @@
+import gzip
+import json
+import os
+
+import pytest
+from flask import Flask, render_template_string
+
+from common.assets import MANIFEST, brotli, build, negotiate, serve_assets
+
+CSS = 'body { color: #333; }\n' * 40
+
+
+@pytest.fixture
+def dist(tmp_path):
+    source = tmp_path / 'static'
+    (source / 'css').mkdir(parents=True)
+    (source / 'css' / 'site.css').write_text(CSS)
+    (source / 'tiny.js').write_text('x=1')
+    (source / 'logo.png').write_bytes(b'\x89PNG')
+    output = tmp_path / 'dist'
+    build(str(output), {'': str(source)})
+    return output
+
+
+def app_for(directory):
+    app = Flask(__name__)
+    serve_assets(app, str(directory))
+    return app
+
+
+def test_build_writes_hashed_and_compressed_copies(dist):
+    with open(dist / MANIFEST, encoding='utf-8') as f:
+        assets = json.load(f)['assets']
+    assert sorted(assets) == ['css/site.css', 'tiny.js']
+    entry = assets['css/site.css']
+    assert entry['file'] == f"css/site.{entry['hash']}.css"
+    with open(dist / (entry['file'] + '.gz'), 'rb') as f:
+        assert gzip.decompress(f.read()).decode() == CSS
+    # Too small to be worth compressing
+    assert assets['tiny.js']['encodings'] == {}
+
+
+def test_negotiate():
+    both = {'br': 1, 'gzip': 1}
+    assert negotiate('gzip, deflate, br', both) == 'br'
+    assert negotiate('gzip;q=1, br;q=0.5', both) == 'gzip'
+    assert negotiate('br;q=0', {'br': 1}) is None
+    assert negotiate('*', {'gzip': 1}) == 'gzip'
+    assert negotiate(None, both) is None
+
+
+def test_hashed_url_is_immutable_and_compressed(dist):
+    app = app_for(dist)
+    with app.test_request_context():
+        url = render_template_string("{{ asset_url('css/site.css') }}")
+    client = app.test_client()
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert response.mimetype == 'text/css'
+    assert gzip.decompress(response.data).decode() == CSS
+    again = client.get(url, headers={'Accept-Encoding': 'gzip',
+                                     'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_logical_name_is_revalidated(dist):
+    client = app_for(dist).test_client()
+    response = client.get('/assets/css/site.css')
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert response.data.decode() == CSS and 'Content-Encoding' not in response.headers
+    assert client.get('/assets/logo.png').status_code == 404
+
+
+def test_asset_url_falls_back_before_a_build(tmp_path):
+    app = app_for(tmp_path / 'missing')
+    with app.test_request_context():
+        assert render_template_string("{{ asset_url('css/site.css') }}") == '/static/css/site.css'
+
+
+def test_rebuild_changes_url(dist, tmp_path):
+    app = app_for(dist)
+    with app.test_request_context():
+        before = render_template_string("{{ asset_url('css/site.css') }}")
+    (tmp_path / 'static' / 'css' / 'site.css').write_text(CSS + 'a{}\n')
+    build(str(dist), {'': str(tmp_path / 'static')})
+    with app.test_request_context():
+        after = render_template_string("{{ asset_url('css/site.css') }}")
+    assert after != before
+    # Pages cached with the old name still find it
+    assert app.test_client().get(before).status_code == 200
+    assert os.path.exists(dist / before.split('/assets/', 1)[1])
+
+
+def test_only_recent_builds_are_kept(dist, tmp_path):
+    css = tmp_path / 'static' / 'css' / 'site.css'
+    files = []
+    for version in range(5):
+        css.write_text(CSS + f'a{{z-index:{version}}}\n')
+        files.append(build(str(dist), {'': str(tmp_path / 'static')}, keep_builds=2)
+                     ['assets']['css/site.css']['file'])
+    with open(dist / MANIFEST, encoding='utf-8') as f:
+        manifest = json.load(f)
+    kept = sorted(entry['file'] for entry in manifest['retired'].values()
+                  if entry['file'].startswith('css/'))
+    assert kept == sorted(files[2:4])
+    suffixes = ('', '.gz', '.br') if brotli else ('', '.gz')
+    on_disk = sorted(str(p.relative_to(dist)) for p in (dist / 'css').iterdir())
+    assert on_disk == sorted(f + suffix for f in files[2:] for suffix in suffixes)
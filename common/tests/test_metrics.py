@@ -0,0 +1,60 @@
+from flask import Flask
+
+from common.metrics import Registry, cache_collector, instrument_flask
+
+
+def test_counter_and_histogram_render():
+    registry = Registry()
+    counter = registry.counter('jobs', 'Jobs run', ('kind',))
+    counter.inc(kind='a')
+    counter.inc(2, kind='a')
+    histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    text = registry.render()
+    assert '# TYPE jobs_total counter' in text
+    assert 'jobs_total{kind="a"} 3' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert 'latency_seconds_count 2' in text and 'latency_seconds_sum 0.55' in text
+
+
+def test_same_name_returns_the_same_metric():
+    registry = Registry()
+    assert registry.counter('jobs', 'Jobs') is registry.counter('jobs', 'Jobs')
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter('jobs', 'Jobs', ('kind',)).inc(kind='a"b\nc')
+    assert 'jobs_total{kind="a\\"b\\nc"} 1' in registry.render()
+
+
+def test_cache_collector_reads_stats_at_scrape_time():
+    stats = {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+    registry = Registry()
+    registry.collector(cache_collector('app', {'data': lambda: stats}))
+    stats['hits'] = 3
+    text = registry.render()
+    assert 'app_cache_hits_total{cache="data"} 3' in text
+    assert 'app_cache_hit_ratio{cache="data"} 0.5' in text
+    assert 'evictions' not in text
+
+
+def test_flask_requests_are_labelled_by_route():
+    app = Flask(__name__)
+    registry = Registry()
+    instrument_flask(app, registry)
+
+    @app.route('/items/<int:item>')
+    def item(item):
+        return 'ok'
+
+    client = app.test_client()
+    client.get('/items/1')
+    client.get('/items/2')
+    client.get('/missing')
+    text = client.get('/metrics').get_data(as_text=True)
+    assert ('http_request_duration_seconds_count'
+            '{method="GET",route="/items/<int:item>",status="200"} 2') in text
+    assert 'route="unmatched",status="404"' in text
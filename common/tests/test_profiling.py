@@ -0,0 +1,66 @@
+import json
+import time
+from collections import Counter
+
+from flask import Flask
+
+from common.profiling import HEADER, collapsed, instrument_profiler, sign, speedscope, verify
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def profiled_app(tmp_path, fmt='speedscope', **options):
+    app = Flask(__name__)
+
+    @app.route('/work')
+    def work():
+        busy(0.05)
+        return 'done'
+
+    installed = instrument_profiler(app, str(tmp_path), interval=0.002, fmt=fmt, **options)
+    return app, installed
+
+
+def test_signature_is_bound_to_path_and_expiry():
+    value = sign('secret', '/work')
+    assert verify('secret', '/work', value)
+    assert not verify('secret', '/other', value)
+    assert not verify('other', '/work', value)
+    assert not verify('secret', '/work', sign('secret', '/work', ttl=-1))
+    assert not verify('secret', '/work', None)
+
+
+def test_nothing_installed_without_configuration(tmp_path):
+    app, installed = profiled_app(tmp_path)
+    assert installed is False
+    assert not app.before_request_funcs
+
+
+def test_signed_request_writes_speedscope_profile(tmp_path):
+    app, _ = profiled_app(tmp_path, secret='secret')
+    client = app.test_client()
+    assert 'X-Profile-File' not in client.get('/work').headers
+    response = client.get('/work', headers={HEADER: sign('secret', '/work')})
+    with open(tmp_path / response.headers['X-Profile-File'], encoding='utf-8') as f:
+        profile = json.load(f)
+    names = [frame['name'] for frame in profile['shared']['frames']]
+    assert any(name.startswith('busy ') for name in names)
+    assert profile['profiles'][0]['samples']
+
+
+def test_sampled_request_writes_collapsed_stacks(tmp_path):
+    app, _ = profiled_app(tmp_path, fmt='collapsed', sample_rate=1.0)
+    filename = app.test_client().get('/work').headers['X-Profile-File']
+    assert filename.endswith('.folded')
+    assert 'busy (' in (tmp_path / filename).read_text()
+
+
+def test_output_formats():
+    samples = Counter({('main', 'leaf'): 3, ('main',): 1})
+    assert collapsed(samples) == 'main 1\nmain;leaf 3\n'
+    profile = speedscope(samples, 0.01, 'test')['profiles'][0]
+    assert profile['endValue'] == 0.04 and len(profile['samples']) == 2
@@ -0,0 +1,15 @@
+// Backend API access for the static pages.
+// The backend's base URL comes from <meta name="api-base" content="https://...">;
+// left empty, requests go to the origin serving the page.
+(function(){
+    const meta = document.querySelector('meta[name="api-base"]');
+    const base = ((meta && meta.content) || '').replace(/\/+$/, '');
+
+    window.apiUrl = (path) => base + path;
+
+    // GET a JSON endpoint; rejects on network errors and non-2xx answers
+    window.apiJSON = (path) => fetch(base + path).then(r => {
+        if(!r.ok) throw new Error(`HTTP ${r.status}`);
+        return r.json();
+    });
+})();
@@ -3,6 +3,18 @@ let ngoData = null;
 let filteredNGOs = [];
 const itemsPerPage = 6;
 let currentPage = 1;
+let totalNGOs = 0;
+// Pages come from the backend's /ngos search; the local JSON is filtered only when it is unreachable
+let useApi = true;
+let latestRequest = 0;
+// Every service value in the directory, to turn category tabs into a services filter
+let knownServices = [];
+
+const categoryMapping = {
+    'housing': ['shelter', 'housing'],
+    'healthcare': ['healthcare', 'health'],
+    'legal': ['legal']
+};
 
 // Utility function to flatten state-based NGO data into array
 function flattenNGOData(data) {
@@ -13,37 +25,45 @@ function flattenNGOData(data) {
     return flattened;
 }
 
-// Load NGO data
+// Load the filter options, from the API's facets or else from the local JSON
 async function loadNGOData() {
     try {
-        // Use a relative path from the HTML page. If the page is served from the folder
-        // `ngo1/frontend/`, the JSON lives in `data/` relative to that.
-        const response = await fetch('./data/ngos_by_state_2023.json');
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        ngoData = await response.json();
-        console.log('NGO data loaded:', ngoData);
-        filteredNGOs = flattenNGOData(ngoData);
-        updateResults();
-        populateStateSelect();
-        updateServiceFilters();
-        updateCategoryTabs();
+        // An empty page still carries every state and service with its count
+        const facets = (await apiJSON('/ngos?page_size=0')).facets;
+        knownServices = facets.services.map(([service]) => service);
+        populateStateSelect(facets.state.map(([state]) => state));
+        updateServiceFilters(knownServices);
     } catch (error) {
-        console.error('Error loading NGO data:', error);
-        const rc = document.getElementById('resultsCount');
-        if (rc) rc.textContent = 'Error loading NGOs: ' + error.message;
+        console.warn('NGO API unavailable, filtering the local directory:', error);
+        useApi = false;
+    }
+    if (!useApi) {
+        try {
+            // Use a relative path from the HTML page. If the page is served from the folder
+            // `ngo1/frontend/`, the JSON lives in `data/` relative to that.
+            const response = await fetch('./data/ngos_by_state_2023.json');
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            ngoData = await response.json();
+            populateStateSelect(Object.keys(ngoData.ngos || {}));
+            updateServiceFilters(ngoData.metadata.serviceTypes);
+        } catch (error) {
+            console.error('Error loading NGO data:', error);
+            const rc = document.getElementById('resultsCount');
+            if (rc) rc.textContent = 'Error loading NGOs: ' + error.message;
+            return;
+        }
     }
+    updateCategoryTabs();
+    updateResults();
 }
 
 // Populate state select with available states
-function populateStateSelect() {
+function populateStateSelect(dataStates) {
     const stateSelect = document.querySelector('.filter-content select');
     if (!stateSelect) return;
 
-    // Gather states from JSON
-    const dataStates = Object.keys(ngoData.ngos || {});
-
     // Gather any existing hard-coded options (except the empty "All States")
     const existingOptions = Array.from(stateSelect.options)
         .map(o => o.value)
@@ -66,8 +86,7 @@ function populateStateSelect() {
 }
 
 // Update service filter checkboxes based on available services
-function updateServiceFilters() {
-    const services = ngoData.metadata.serviceTypes;
+function updateServiceFilters(services) {
     const filterGroup = document.getElementById('services-options');
     if (!filterGroup) return;
     filterGroup.innerHTML = '';
@@ -80,25 +99,72 @@ function updateServiceFilters() {
             <input type="checkbox" id="filter-${serviceId}" checked>
             <label for="filter-${serviceId}">${service}</label>
         `;
+        const checkbox = div.querySelector('input');
+        checkbox.value = service;
+        checkbox.addEventListener('change', () => {
+            currentPage = 1;
+            updateResults();
+        });
         filterGroup.appendChild(div);
     });
 }
 
-// Filter NGOs based on current filters
-function filterNGOs() {
-    if (!ngoData) return [];
+// Values of the checked boxes in a container; null when all or none are checked, which filters nothing
+function checkedSubset(container) {
+    if (!container) return null;
+    const boxes = Array.from(container.querySelectorAll('input[type="checkbox"]'));
+    const checked = boxes.filter(cb => cb.checked).map(cb => cb.value);
+    return checked.length && checked.length < boxes.length ? checked : null;
+}
 
-    const searchText = document.getElementById('searchInput').value.toLowerCase();
+function inCategory(service, category) {
+    return categoryMapping[category].some(cat => service.toLowerCase().includes(cat));
+}
+
+// Current state of the search box, filters, category tab and sort order
+function currentFilters() {
     const stateSel = document.querySelector('.filter-content select');
-    const selectedState = stateSel ? stateSel.value : '';
-    const selectedGenders = Array.from(document.querySelectorAll('.filter-group:nth-of-type(2) input[type="checkbox"]:checked'))
-        .map(cb => cb.id.replace('filter-', ''));
-    const servicesContainer = document.getElementById('services-options');
-    const selectedServices = servicesContainer ? Array.from(servicesContainer.querySelectorAll('input[type="checkbox"]:checked')).map(cb => cb.id.replace('filter-', '')) : [];
     const safeSpaceEl = document.getElementById('filter-safespace');
-    const safeSpaceOnly = safeSpaceEl ? safeSpaceEl.checked : false;
     const activeTab = document.querySelector('.category-tab.active');
-    const activeCategory = activeTab ? activeTab.dataset.category : 'all';
+    const sortByEl = document.getElementById('sortBy');
+    return {
+        query: document.getElementById('searchInput').value.trim(),
+        state: stateSel ? stateSel.value : '',
+        genders: checkedSubset(document.getElementById('gender-options')),
+        services: checkedSubset(document.getElementById('services-options')),
+        category: activeTab ? activeTab.dataset.category : 'all',
+        safeSpaceOnly: safeSpaceEl ? safeSpaceEl.checked : false,
+        sort: sortByEl && sortByEl.value ? sortByEl.value : 'name'
+    };
+}
+
+// Fetch the current page of matching NGOs from the API
+async function fetchNGOPage(filters) {
+    const params = new URLSearchParams({page: currentPage, page_size: itemsPerPage, sort: filters.sort});
+    if (filters.query) params.set('q', filters.query);
+    if (filters.state) params.set('state', filters.state);
+    if (filters.genders) params.set('genderFocus', filters.genders.join(','));
+    let services = filters.services;
+    if (filters.category !== 'all') {
+        const inTab = knownServices.filter(service => inCategory(service, filters.category));
+        services = services ? services.filter(service => inTab.includes(service)) : inTab;
+        if (!services.length) return {total: 0, results: []};
+    }
+    if (services) params.set('services', services.join(','));
+    if (filters.safeSpaceOnly) params.set('safeSpace', '1');
+    return apiJSON(`/ngos?${params}`);
+}
+
+// Filter the local NGO data, when the API is unavailable
+function filterNGOs(filters) {
+    if (!ngoData) return [];
+
+    const searchText = filters.query.toLowerCase();
+    const selectedState = filters.state;
+    const selectedGenders = filters.genders || [];
+    const selectedServices = filters.services || [];
+    const safeSpaceOnly = filters.safeSpaceOnly;
+    const activeCategory = filters.category;
 
     let filtered = flattenNGOData(ngoData);
 
@@ -129,19 +195,14 @@ function filterNGOs() {
     }
 
     // Filter by services and category
+    if (selectedServices.length) {
+        filtered = filtered.filter(ngo =>
+            ngo.services.some(service => selectedServices.includes(service))
+        );
+    }
     if (activeCategory !== 'all') {
-        const categoryMapping = {
-            'housing': ['shelter', 'housing'],
-            'healthcare': ['healthcare', 'health'],
-            'legal': ['legal']
-        };
-        
         filtered = filtered.filter(ngo =>
-            ngo.services.some(service =>
-                categoryMapping[activeCategory].some(cat =>
-                    service.toLowerCase().includes(cat)
-                )
-            )
+            ngo.services.some(service => inCategory(service, activeCategory))
         );
     }
 
@@ -150,6 +211,20 @@ function filterNGOs() {
         filtered = filtered.filter(ngo => ngo.safeSpace);
     }
 
+    // Same orders as the API: most services first for 'services'
+    filtered.sort((a, b) => {
+        switch (filters.sort) {
+            case 'location':
+                return a.location.localeCompare(b.location);
+            case 'state':
+                return a.state.localeCompare(b.state);
+            case 'services':
+                return b.services.length - a.services.length;
+            default:
+                return a.name.localeCompare(b.name);
+        }
+    });
+
     return filtered;
 }
 
@@ -201,7 +276,7 @@ function renderNGOCard(ngo) {
 
 // Update pagination controls
 function updatePagination() {
-    const totalPages = Math.ceil(filteredNGOs.length / itemsPerPage);
+    const totalPages = Math.ceil(totalNGOs / itemsPerPage);
     const pagination = document.getElementById('pagination');
     pagination.innerHTML = '';
 
@@ -245,22 +320,40 @@ function updatePagination() {
 }
 
 // Update results display
-function updateResults() {
-    filteredNGOs = filterNGOs();
+async function updateResults() {
+    const filters = currentFilters();
+    const request = ++latestRequest;
     const ngoGrid = document.getElementById('ngoGrid');
     const resultsCount = document.getElementById('resultsCount');
+    let pageNGOs;
+
+    if (useApi) {
+        let page;
+        try {
+            page = await fetchNGOPage(filters);
+        } catch (error) {
+            if (request !== latestRequest) return;
+            console.error('Error searching NGOs:', error);
+            if (resultsCount) resultsCount.textContent = 'Error loading NGOs: ' + error.message;
+            return;
+        }
+        // A slower answer to an earlier search must not overwrite a newer one
+        if (request !== latestRequest) return;
+        totalNGOs = page.total;
+        pageNGOs = page.results;
+    } else {
+        filteredNGOs = filterNGOs(filters);
+        totalNGOs = filteredNGOs.length;
+        const start = (currentPage - 1) * itemsPerPage;
+        pageNGOs = filteredNGOs.slice(start, start + itemsPerPage);
+    }
     
     // Update results count
-    if (resultsCount) resultsCount.textContent = `${filteredNGOs.length} NGOs found`;
+    if (resultsCount) resultsCount.textContent = `${totalNGOs} NGOs found`;
     
     // Clear existing cards
     ngoGrid.innerHTML = '';
     
-    // Calculate pagination
-    const start = (currentPage - 1) * itemsPerPage;
-    const end = start + itemsPerPage;
-    const pageNGOs = filteredNGOs.slice(start, end);
-    
     // Render NGO cards
     pageNGOs.forEach(ngo => {
         ngoGrid.appendChild(renderNGOCard(ngo));
@@ -306,33 +399,26 @@ document.addEventListener('DOMContentLoaded', () => {
         updateResults();
     });
     
-    // Gender and service filters
-    document.querySelectorAll('.filter-options input[type="checkbox"]').forEach(checkbox => {
+    // Gender and safe space filters; service checkboxes get theirs when created
+    document.querySelectorAll('#gender-options input[type="checkbox"], #filter-safespace').forEach(checkbox => {
         checkbox.addEventListener('change', () => {
             currentPage = 1;
             updateResults();
         });
     });
+
+    const applyBtn = document.getElementById('applyFiltersBtn');
+    if (applyBtn) {
+        applyBtn.addEventListener('click', () => {
+            currentPage = 1;
+            updateResults();
+        });
+    }
     
     // Sort options
     const sortByEl = document.getElementById('sortBy');
     if (sortByEl) {
-        sortByEl.addEventListener('change', (e) => {
-        const sortBy = e.target.value;
-        filteredNGOs.sort((a, b) => {
-            switch (sortBy) {
-                case 'name':
-                    return a.name.localeCompare(b.name);
-                case 'location':
-                    return a.location.localeCompare(b.location);
-                case 'state':
-                    return a.state.localeCompare(b.state);
-                case 'services':
-                    return a.services[0].localeCompare(b.services[0]);
-                default:
-                    return 0;
-            }
-        });
+        sortByEl.addEventListener('change', () => {
         currentPage = 1;
         updateResults();
         });
@@ -346,7 +432,7 @@ document.addEventListener('DOMContentLoaded', () => {
         document.getElementById('searchInput').value = '';
         const stateSel = document.querySelector('.filter-content select');
         if (stateSel) stateSel.value = '';
-        document.querySelectorAll('.filter-options input[type="checkbox"]').forEach(cb => cb.checked = true);
+        document.querySelectorAll('.filter-content input[type="checkbox"]').forEach(cb => cb.checked = true);
         const sortByEl2 = document.getElementById('sortBy');
         if (sortByEl2) sortByEl2.value = 'name';
         const allTab = document.querySelector('.category-tab[data-category="all"]');